@@ -0,0 +1,142 @@
+"""Messages counted per second by the n-word counter.
+
+Compares reading whitelist.txt per message, the str.count loop with the
+whitelist loaded once, the single-pass Matcher, and what the cog runs:
+the prefilter and the matcher build_matcher picks. Then shows how the
+loop and the Matcher scale with the number of words when every message
+has a hit, and what the count cache saves on raid traffic.
+
+USAGE: cd bot, then python -m benchmarks.count_throughput [messages]
+"""
+import os
+import random
+import string
+import sys
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.count_cache import CountCache
+from utils.matcher import HARD_RS_LIST, NWORDS_LIST, Matcher, build_matcher
+from utils.normalize import normalize
+from utils.whitelist import Whitelist
+
+WHITELIST_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "whitelist.txt")
+WORDS = NWORDS_LIST + HARD_RS_LIST
+# Share of messages that contain an n-word
+HIT_EVERY = 20
+# Word list sizes for the scaling run
+SCALES = (9, 90, 900)
+# Copypastas making up most of a raid, and the share of raid messages that are copies
+COPYPASTAS = 20
+RAID_REPEATS = 0.95
+
+
+def messages(count: int, hit_every: int = HIT_EVERY, words=WORDS) -> list[str]:
+    """Return chat-like messages, every hit_every-th containing a counted word"""
+    rng = random.Random(0)
+    filler = ["hello", "what", "is", "up", "the", "game", "tonight", "lol",
+              "snigger", "nice", "ok", "see", "you", "later"]
+    result = []
+    for i in range(count):
+        picked = rng.choices(filler, k=rng.randint(3, 20))
+        if i % hit_every == 0:
+            picked.insert(rng.randrange(len(picked) + 1), rng.choice(words))
+        result.append(" ".join(picked))
+    return result
+
+
+def loop_count(msg: str, words: list[str], whitelist) -> int:
+    """The str.count loop count_nwords ran before the Matcher"""
+    total = 0
+    for word in whitelist:
+        if word in msg:
+            total -= 1
+    for n_word in words:
+        total += msg.count(n_word)
+    return total if total >= 0 else 0
+
+
+def raid(count: int) -> list[str]:
+    """Return messages that are mostly copies of a few long copypastas"""
+    rng = random.Random(2)
+    pastas = [" ".join(messages(15, 3)) for _ in range(COPYPASTAS)]
+    chatter = messages(count)
+    return [rng.choice(pastas) if rng.random() < RAID_REPEATS else chatter[i]
+            for i in range(count)]
+
+
+def cached(cache: CountCache, count):
+    """Wrap count so it is looked up in cache by the raw message first"""
+    def lookup(msg: str) -> int:
+        key = cache.key(msg)
+        result = cache.get(key)
+        if result is None:
+            result = count(normalize(msg))
+            cache.put(key, result)
+        return result
+    return lookup
+
+
+def read_per_message() -> list[str]:
+    """Whitelist as the counter first got it, from disk on every call"""
+    with open(WHITELIST_PATH, "r") as f:
+        return f.read().splitlines()
+
+
+def measure(batch: list[str], count) -> tuple[float, int]:
+    """Return messages per second and the total count over batch"""
+    started = time.perf_counter()
+    total = sum(count(normalize(msg)) for msg in batch)
+    return len(batch) / (time.perf_counter() - started), total
+
+
+def main(size: int) -> None:
+    batch = messages(size)
+    whitelist = Whitelist(WHITELIST_PATH)
+    matcher = Matcher(WORDS, whitelist.words)
+    picked = build_matcher(WORDS, whitelist.words)
+    runs = [
+        ("read per message", lambda msg: loop_count(msg, WORDS, read_per_message())),
+        ("loaded once", lambda msg: loop_count(msg, WORDS, whitelist.words)),
+        ("matcher", matcher.count),
+        ("cog path", lambda msg: picked.count(msg) if picked.might_match(msg) else 0),
+    ]
+    print(f"{size:,} messages, 1 in {HIT_EVERY} with a hit")
+    expected = None
+    for name, count in runs:
+        rate, total = measure(batch, count)
+        assert expected is None or total == expected, f"{name} counts differ"
+        expected = total
+        print(f"  {name + ':':19} {rate:12,.0f} msg/s")
+
+    print(f"{size // 10:,} messages, all with a hit")
+    rng = random.Random(1)
+    for scale in SCALES:
+        words = WORDS + ["".join(rng.choices(string.ascii_lowercase, k=7))
+                         for _ in range(scale - len(WORDS))]
+        batch = messages(size // 10, 1)
+        matcher = Matcher(words, whitelist.words)
+        loop_rate, expected = measure(batch, lambda msg: loop_count(msg, words, whitelist.words))
+        matcher_rate, total = measure(batch, matcher.count)
+        assert total == expected, "matcher counts differ"
+        print(f"  {scale:4} words: loop {loop_rate:10,.0f} msg/s, "
+              f"matcher {matcher_rate:10,.0f} msg/s")
+
+    print(f"{size:,} raid messages, {RAID_REPEATS:.0%} copies of {COPYPASTAS} copypastas")
+    batch = raid(size)
+    matcher = Matcher(WORDS, whitelist.words)
+    uncached_rate, expected = measure(batch, matcher.count)
+    cache = CountCache()
+    started = time.perf_counter()
+    total = sum(map(cached(cache, matcher.count), batch))
+    cached_rate = len(batch) / (time.perf_counter() - started)
+    assert total == expected, "cached counts differ"
+    print(f"  uncached: {uncached_rate:10,.0f} msg/s")
+    print(f"  cached:   {cached_rate:10,.0f} msg/s ({cache.hit_rate:.1%} hit rate)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,72 @@
+"""Memory used by resident member records, dicts versus MemberRecord.
+
+USAGE: cd bot, then python -m benchmarks.member_memory [members]
+"""
+import gc
+import os
+import sys
+import tracemalloc
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.storage.records import MemberRecord
+
+# Share of members that have been voted on
+VOTED_EVERY = 100
+
+
+def member_dicts(count: int) -> list[dict]:
+    """Return member dicts shaped like a decoded bot_database.json"""
+    return [
+        {
+            "id": 200000000000000000 + i,
+            "name": f"user{i}",
+            "nword_count": i % 1000,
+            "is_black": False,
+            "has_pass": False,
+            "passes": 0,
+            "voters": [100000000000000000 + i] if i % VOTED_EVERY == 0 else []
+        }
+        for i in range(count)
+    ]
+
+
+def member_records(count: int) -> tuple[list[MemberRecord], dict[int, list[int]]]:
+    """Return the same members as records plus voter lists keyed by member id"""
+    records = [
+        MemberRecord(200000000000000000 + i, f"user{i}", i % 1000)
+        for i in range(count)
+    ]
+    voters = {
+        200000000000000000 + i: [100000000000000000 + i]
+        for i in range(0, count, VOTED_EVERY)
+    }
+    return records, voters
+
+
+def measure(build) -> tuple[int, object]:
+    """Return bytes allocated by build() that are still alive, and its result"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, result
+
+
+def main(count: int) -> None:
+    dict_size, members = measure(lambda: member_dicts(count))
+
+    record_size, (records, voters) = measure(lambda: member_records(count))
+    back = [record.to_dict(voters.get(record.id, [])) for record in records]
+    assert back == members, "conversion does not round-trip"
+
+    print(f"{count:,} members")
+    print(f"  dicts:         {dict_size / 2 ** 20:8.1f} MiB ({dict_size / count:.0f} B/member)")
+    print(f"  MemberRecord:  {record_size / 2 ** 20:8.1f} MiB ({record_size / count:.0f} B/member)")
+    print(f"  reduction:     {1 - record_size / dict_size:8.1%}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
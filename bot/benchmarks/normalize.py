@@ -0,0 +1,62 @@
+"""Cost of normalizing a message, per-message table versus the prebuilt one.
+
+USAGE: cd bot, then python -m benchmarks.normalize [messages]
+"""
+import os
+import random
+import string
+import sys
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.normalize import normalize
+
+# Invisible, look-alike and accented characters salted into messages
+DISGUISES = ["\u200b", "\u200d", "\ufeff", "\u00a0", "а", "і", "ｎ", "ｇ", "é", "ñ"]
+
+
+def messages(count: int, disguised: bool) -> list[str]:
+    """Return chat-like messages, optionally salted with disguised characters"""
+    rng = random.Random(0)
+    words = ["hello", "what", "is", "up", "the", "game", "tonight", "lol",
+             "nice", "ok", "see", "you", "later", "Anyone", "THERE"]
+    result = []
+    for _ in range(count):
+        msg = " ".join(rng.choices(words, k=rng.randint(3, 20)))
+        if disguised:
+            chars = list(msg)
+            for _ in range(3):
+                chars.insert(rng.randrange(len(chars) + 1), rng.choice(DISGUISES))
+            msg = "".join(chars)
+        result.append(msg)
+    return result
+
+
+def per_message(msg: str) -> str:
+    """Normalization as count_nwords first did it, building its table each call"""
+    return msg.lower().strip().translate(
+        {ord(char): "" for char in string.whitespace})
+
+
+def measure(batch: list[str], fold) -> float:
+    """Return nanoseconds per message spent in fold"""
+    started = time.perf_counter_ns()
+    for msg in batch:
+        fold(msg)
+    return (time.perf_counter_ns() - started) / len(batch)
+
+
+def main(count: int) -> None:
+    print(f"{count:,} messages")
+    for name, disguised in (("ascii", False), ("disguised", True)):
+        batch = messages(count, disguised)
+        before = measure(batch, per_message)
+        after = measure(batch, normalize)
+        print(f"  {name + ':':11} per-message table {before:6.0f} ns, "
+              f"prebuilt table {after:6.0f} ns")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
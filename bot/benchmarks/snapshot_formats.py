@@ -0,0 +1,83 @@
+"""Snapshot size and parse time for each snapshot format.
+
+USAGE: cd bot, then python -m benchmarks.snapshot_formats [members] [guilds]
+"""
+import json
+import os
+import random
+import sys
+import time
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.storage import snapshot
+
+
+def database(members: int, guilds: int) -> dict:
+    """Return a database with members spread unevenly over guilds"""
+    rng = random.Random(42)
+    weights = [1 / (rank + 1) for rank in range(guilds)]
+    sizes = [0] * guilds
+    for guild in rng.choices(range(guilds), weights, k=members):
+        sizes[guild] += 1
+    member_id = 200000000000000000
+    data = {"guilds": [], "journal_seq": 0}
+    for guild, size in enumerate(sizes):
+        members_list = []
+        for _ in range(size):
+            member_id += rng.randrange(1, 1000)
+            members_list.append({
+                "id": member_id,
+                "name": f"user{member_id % 10 ** 8}",
+                "nword_count": int(rng.paretovariate(1.2)) - 1,
+                "is_black": rng.random() < 0.02,
+                "has_pass": rng.random() < 0.01,
+                "passes": 0,
+                "voters": sorted(rng.sample(range(10 ** 17, 10 ** 17 + 10 ** 6), rng.randrange(1, 6)))
+                if rng.random() < 0.02 else []
+            })
+        data["guilds"].append({
+            "guild_id": 900000000000000000 + guild,
+            "guild_name": f"Guild {guild}",
+            "members": members_list,
+            "settings": [{"name": "Send Message", "int_name": "send_message", "value": True}]
+        })
+    return data
+
+
+def best_of(func, runs: int = 3) -> float:
+    """Return the fastest of a few timed runs in seconds"""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(members: int, guilds: int) -> None:
+    data = database(members, guilds)
+    legacy = json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+    encoded = {
+        "json indent=2 (before)": (legacy, lambda raw: json.loads(raw)),
+        "json compact": (snapshot.encode_json(data), lambda raw: snapshot.decode_json(raw)),
+        "binary": (snapshot.encode_binary(data), snapshot.decode_binary),
+    }
+    if snapshot.orjson is not None:
+        encoded["json compact + orjson"] = (
+            snapshot.encode_json(data, fast_json=True),
+            lambda raw: snapshot.decode_json(raw, fast_json=True))
+
+    assert snapshot.decode_binary(encoded["binary"][0])["guilds"] == data["guilds"]
+
+    print(f"{members:,} members in {guilds:,} guilds")
+    print(f"  {'format':<24}{'size':>12}{'parse':>10}")
+    for name, (raw, decode) in encoded.items():
+        seconds = best_of(lambda: decode(raw))
+        print(f"  {name:<24}{len(raw) / 2 ** 20:>8.1f} MiB{seconds:>9.2f}s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 2_000)
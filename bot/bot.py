@@ -15,6 +15,8 @@ from pathlib import Path
 import discord
 from discord.ext import commands, tasks
 
+from utils.database import Database
+
 # Fetch bot token.
 with Path("config.json").open() as f:
     config = load(f)
@@ -25,12 +27,38 @@ TOKEN = config["DISCORD_TOKEN"]
 if TOKEN == "":
     TOKEN = os.environ.get("DISCORD_TOKEN")
 
+# Storage backend, journal compaction and increment batching for the database.
+Database.configure(
+    backend=config.get("DATABASE_BACKEND", "json"),
+    flush_interval=config.get("DATABASE_FLUSH_INTERVAL", 30),
+    compact_threshold=config.get("DATABASE_COMPACT_THRESHOLD", 1024 * 1024),
+    increment_flush_ms=config.get("DATABASE_INCREMENT_FLUSH_MS", 250),
+    increment_flush_ops=config.get("DATABASE_INCREMENT_FLUSH_OPS", 1000),
+    snapshot_format=config.get("DATABASE_SNAPSHOT_FORMAT", "json"),
+    fast_json=config.get("DATABASE_FAST_JSON", False),
+    snapshot_keep=config.get("DATABASE_SNAPSHOT_KEEP", 3),
+    shutdown_timeout=config.get("DATABASE_SHUTDOWN_TIMEOUT", 4),
+    read_view_interval=config.get("DATABASE_READ_VIEW_INTERVAL", 5)
+)
+
+
+class NWordCounterBot(discord.Bot):
+    """Bot that persists the resident database on shutdown"""
+
+    async def close(self):
+        """Stop counting and persist pending database writes before disconnecting"""
+        try:
+            await Database.shutdown()
+        finally:
+            await super().close()
+
+
 intents = discord.Intents.default()
 intents.members = True
 intents.message_content = True
 intents.presences = False
 
-bot = discord.Bot(
+bot = NWordCounterBot(
     intents=intents,
     owner_ids=[354783154126716938, 691896247052927006, 234248229426823168, 454696684556124160]
 )
@@ -70,6 +98,9 @@ async def on_ready():
     logger.info(
         f"Running on {platform.system()} {platform.release()} ({os.name})")
 
+    # Load database into memory and start write-behind flushing.
+    await Database.start()
+
     await bot.change_presence(activity=discord.Activity(type=discord.ActivityType.watching, name=f"over your messages"))
     # status_loop.start()
 
@@ -3,6 +3,8 @@ import os
 import discord
 import logging
 
+from utils.database import Database
+
 
 class Developer(discord.Cog):
     def __init__(self, bot):
@@ -97,6 +99,54 @@ class Developer(discord.Cog):
         view = self._prepare_callback(extensions, ctx, self.bot)
         await ctx.respond(view=view, ephemeral=True, delete_after=30)
 
+    @dev.command(
+        name="checkdb",
+        description="(Bot dev only) Check and rebuild the database's n-word totals")
+    async def checkdb(self, ctx):
+        """(Bot dev only) Check and rebuild the database's n-word totals"""
+        await ctx.defer(ephemeral=True)
+        if await Database.check_aggregates():
+            await ctx.respond("Database totals are consistent.", ephemeral=True)
+        else:
+            await ctx.respond("Database totals were inconsistent and have been rebuilt.",
+                              ephemeral=True)
+
+    @dev.command(
+        name="whitelist",
+        description="(Bot dev only) Reload the n-word whitelist from disk")
+    async def whitelist(self, ctx):
+        """(Bot dev only) Reload the n-word whitelist from disk"""
+        counter = self.bot.get_cog("NWordCounter")
+        if counter is None:
+            await ctx.respond("The NWordCounter cog is not loaded.", ephemeral=True)
+            return
+        try:
+            count = counter.whitelist.reload()
+        except OSError as e:
+            await ctx.respond(f"Failed to reload the whitelist:\n{e}", ephemeral=True)
+            logging.error(f"Failed to reload the whitelist:\n{e}")
+            return
+        await ctx.respond(f"Reloaded {count} whitelisted words.", ephemeral=True)
+
+    @dev.command(
+        name="ingest",
+        description="(Bot dev only) Show count cache hits and what each ingestion stage let through")
+    async def ingest(self, ctx):
+        """(Bot dev only) Show count cache hits and what each ingestion stage let through"""
+        counter = self.bot.get_cog("NWordCounter")
+        if counter is None:
+            await ctx.respond("The NWordCounter cog is not loaded.", ephemeral=True)
+            return
+        lines = [
+            f"{stage.name}: {stage.hits:,} passed, {stage.misses:,} dropped"
+            + (f" ({stage.misses / stage.seen:.1%})" if stage.seen else "")
+            for stage in counter.ingest.stages()
+        ]
+        counts = counter.counts
+        lines.insert(0, f"cache: {counts.hits:,} hits, {counts.misses:,} misses "
+                        f"({counts.hit_rate:.1%} hit rate, {len(counts):,}/{counts.size:,} entries)")
+        await ctx.respond("\n".join(lines), ephemeral=True)
+
     @dev.command(
         name="logs",
         description="(Bot dev only) Get the bot's most recent logs")
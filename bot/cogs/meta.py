@@ -49,12 +49,17 @@ class Meta(commands.Cog):
                 ephemeral=True, delete_after=5)
             return
 
-        top_members = await self.db.get_member_list(ctx.guild.id)
-        server_nword_total = await self.db.get_nword_server_total(ctx.guild.id)
+        guild_view = await self.db.get_guild_view(ctx.guild.id)
+        global_view = await self.db.get_global_view()
+        top_members = guild_view.top_members[:limit]
+        server_nword_total = guild_view.nword_count
+        # The views are cached apart, so the global total can lag this guild's.
+        global_nword_total = max(global_view.nword_count, server_nword_total)
+        share = max(server_nword_total, 0) / global_nword_total * 100 if global_nword_total > 0 else 0
         embed_data = {
             "title": f"Top users in {ctx.guild.name}",
             "description": f"I have seen **{server_nword_total}** n-words in this server!\n"
-                           f"That's **{round(server_nword_total / await self.db.get_global_nword_count() * 100, 3)}%**"
+                           f"That's **{round(share, 3)}%**"
                            f" of all n-words!",
             "url": "https://bit.ly/3JmG6cD",
             "color": HEX_OG_BLURPLE
@@ -81,10 +86,11 @@ class Meta(commands.Cog):
                 ephemeral=True, delete_after=5)
             return
 
-        top_members = await self.db.get_all_time_counts(limit)
+        global_view = await self.db.get_global_view()
+        top_members = global_view.top_members[:limit]
         embed_data = {
             "title": "Top users globally",
-            "description": f"I have seen the N-word used **{await self.db.get_global_nword_count():,}** times"
+            "description": f"I have seen the N-word used **{global_view.nword_count:,}** times"
                            f" globally!",
             "url": "https://bit.ly/3JmG6cD",
             "color": HEX_OG_BLURPLE
@@ -110,7 +116,7 @@ class Meta(commands.Cog):
                 ephemeral=True, delete_after=5)
             return
 
-        top_servers = await self.db.get_all_time_servers(limit)
+        top_servers = (await self.db.get_global_view()).top_guilds[:limit]
         embed_data = {
             "title": "Top guilds globally",
             "description": f"",
@@ -130,10 +136,12 @@ class Meta(commands.Cog):
     async def info(self, ctx: discord.ApplicationContext):
         """Get info about the bot"""
         await ctx.defer()
+        guild_view = await self.db.get_guild_view(ctx.guild.id)
+        total_documents = (await self.db.get_global_view()).total_documents
         embed = discord.Embed(
             title="N-Word Counter",
             description=f"A bot that counts n-word usage in your server\nFun fact: I have seen the n-word used "
-                        f"{await self.db.get_nword_server_total(ctx.guild.id)} times!",
+                        f"{guild_view.nword_count} times!",
             color=await generate_color(ctx.author.avatar.url)
         )
         embed.add_field(
@@ -158,7 +166,7 @@ class Meta(commands.Cog):
             inline=False)
         embed.add_field(
             name="Database size",
-            value=f"{await self.db.get_total_documents()} document{'s' if await self.db.get_total_documents() > 1 else ''}",
+            value=f"{total_documents} document{'s' if total_documents > 1 else ''}",
             inline=False
         )
         embed.add_field(
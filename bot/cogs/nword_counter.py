@@ -1,28 +1,19 @@
 """Cog for n-word counting and storing logic"""
 import re
-import string
+import logging
 import discord
 from discord import option
 from discord.ext import commands
+from utils.count_cache import CountCache
 from utils.database import Database
 from utils.discord import convert_color, generate_message_embed
+from utils.matcher import HARD_RS_LIST, NWORDS_LIST, LoopMatcher, build_matcher
+from utils.normalize import normalize
+from utils.pipeline import IngestStats
+from utils.whitelist import Whitelist
 
-# Create the n-word lists from ASCII, so I don't have to type it.
-NWORDS_LIST = [
-    (chr(110) + chr(105) + chr(103) + chr(103) + chr(97)),
-    (chr(47) + chr(92) + chr(47) + chr(105) + chr(103) + chr(103) + chr(97)),
-    (chr(124) + chr(92) + chr(47) + chr(105) + chr(103) + chr(103) + chr(97)),
-    (chr(109) + chr(117) + chr(114) + chr(122) + chr(121) + chr(110)),
-    (chr(99) + chr(122) + chr(97) + chr(114) + chr(110) + chr(117) + chr(99) + chr(104)),
-    (chr(99) + chr(122) + chr(97) + chr(114) + chr(110) + chr(117) + chr(104))
-]
-HARD_RS_LIST = [
-    (chr(110) + chr(105) + chr(103) + chr(103) + chr(101) + chr(114)),
-    (chr(47) + chr(92) + chr(47) + chr(105) + chr(103) + chr(103) + chr(101) +
-     chr(114)),
-    (chr(124) + chr(92) + chr(47) + chr(105) + chr(103) + chr(103) + chr(101) +
-     chr(114))
-]
+# Cached in place of a count for messages the prefilter dropped
+PREFILTERED = -1
 
 
 class NWordCounter(commands.Cog):
@@ -36,24 +27,48 @@ class NWordCounter(commands.Cog):
 
         self.sacred_n_words = NWORDS_LIST
         self.sacred_hard_r_words = HARD_RS_LIST
+        # I swear all the words in whitelist.txt are actual words
+        self.whitelist = Whitelist("whitelist.txt")
+        self._matcher: LoopMatcher | None = None
+        self._matcher_version = None
+        # Messages go through these in order, each one dropping most of the rest.
+        self.ingest = IngestStats("prefilter", "counter", "storage")
+        # Raids repeat the same text, those copies are answered from here.
+        self.counts = CountCache()
+
+    @property
+    def matcher(self) -> LoopMatcher:
+        """Return the matcher for the current word lists and whitelist"""
+        words = self.whitelist.words
+        if self._matcher is None or self._matcher_version != self.whitelist.version:
+            # Built aside and swapped in whole, like the whitelist itself.
+            self._matcher = build_matcher(
+                self.sacred_n_words + self.sacred_hard_r_words, words)
+            self._matcher_version = self.whitelist.version
+            self.counts.clear()
+        return self._matcher
 
     def count_nwords(self, msg: str) -> int:
         """Return occurrences of n-words in a given message"""
-        count = 0
-        msg = msg.lower().strip().translate(
-            {ord(char): "" for char in string.whitespace})
-        # I swear all the words in whitelist.txt are actual words
-        with open("whitelist.txt", "r") as f:
-            whitelist = f.read().splitlines()
-        for word in whitelist:
-            if word in msg:
-                count -= 1  # subtract 1 from count if word is in message
-        for n_word in self.sacred_n_words:
-            count += msg.count(n_word)
-        for hard_r in self.sacred_hard_r_words:
-            count += msg.count(hard_r)
-        # Return count if count is positive, else return 0
-        return count if count >= 0 else 0
+        # Fetched first: a new matcher empties the cache.
+        matcher = self.matcher
+        key = self.counts.key(msg)
+        cached = self.counts.get(key)
+        if cached is not None:
+            # Replay the stages so their totals still cover every message.
+            if self.ingest.record("prefilter", cached != PREFILTERED):
+                self.ingest.record("counter", cached > 0)
+            return max(cached, 0)
+        # Spacing, invisible characters and look-alike letters can't hide a word.
+        text = normalize(msg)
+        if not self.ingest.record("prefilter", matcher.might_match(text)):
+            self.counts.put(key, PREFILTERED)
+            return 0
+        # Each whitelisted word in the message takes one off, never below 0.
+        count = matcher.count(text)
+        self.ingest.record("counter", count > 0)
+        self.counts.put(key, count)
+        return count
 
     async def is_black(self, guild_id, author_id) -> bool:
         """Check if user is verified to be black"""
@@ -94,14 +109,7 @@ class NWordCounter(commands.Cog):
                 f"**{message.author.display_name.title()}** we've moved to slash commands! Use `/` to get started.",
                 color=convert_color("#ff2222")), delete_after=10)
 
-        # Ensure guild has its own place in the database.
-        if not await self.db.guild_in_database(guild.id):
-            await self.db.create_database(guild.id, guild.name)
-
-        # Get settings for guild.
-        guild_settings = await self.db.get_guild_settings(guild.id)
-
-        # Bot reaction to any n-word occurrence.
+        # Bot reaction to any n-word occurrence, before touching storage.
         num_nwords = self.count_nwords(msg)
 
         # No n-words found.
@@ -109,25 +117,38 @@ class NWordCounter(commands.Cog):
             return
 
         if message.webhook_id and has_message_perms:  # Ignore webhooks.
+            self.ingest.record("storage", False)
             await message.reply(
                 content="Not a person, I won't count this.",
                 delete_after=30
             )
             return
+        if not self.ingest.record("storage", self.db.accepting_writes()):  # Shutting down.
+            return
 
-        if not await self.db.member_in_database(guild.id, author.id):
-            await self.db.create_member(guild.id, author.id, author.name)
-
-        await self.db.increment_nword_count(guild.id, author.id, num_nwords)
+        # Count n-words, creating the guild and member if they are missing,
+        # and fetch member flags and guild settings, all at once.
+        member, guild_settings = await self.db.record_message(
+            guild.id, guild.name, author.id, author.name, num_nwords)
 
         # Don't react to someone already verified.
-        if await self.is_black(guild.id, author.id):
+        if member["is_black"]:
             return
 
         # Mitigate ratelimiting, usually this amount is just spam.
         if num_nwords >= 50:
             return
 
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        """Take back votes cast by a member who left the guild"""
+        if member.bot:
+            return
+        vote_threshold = self.get_guild_vote_threshold(member.guild)
+        purged = await self.db.purge_votes(member.guild.id, member.id, vote_threshold)
+        if purged:
+            logging.info(f"Removed {purged} votes cast by {member.id} who left {member.guild.id}")
+
     def get_id_from_mention(self, mention: str) -> int:
         """Extract user ID from mention string"""
         # STORED IN DB AS INTEGER, NOT STRING.
@@ -166,9 +187,12 @@ class NWordCounter(commands.Cog):
 
         # Fetch n-word count of user if they have a count.
         nword_count = await self.get_member_nword_count(ctx.guild.id, user.id)
+        message = f"**{user.display_name}** has said the n-word **{nword_count:,}** time{'' if nword_count == 1 else 's'}"
+        guild_rank, global_rank = await self.db.get_member_rank(ctx.guild.id, user.id)
+        if guild_rank is not None:
+            message += f"\nRank **#{guild_rank:,}** in this server, **#{global_rank:,}** globally"
         await ctx.respond(embed=await generate_message_embed(
-            f"**{user.display_name}** has said the n-word **{nword_count:,}** time{'' if nword_count == 1 else 's'}",
-            type="info", ctx=ctx), ephemeral=True, delete_after=30)
+            message, type="info", ctx=ctx), ephemeral=True, delete_after=30)
 
     def get_vote_threshold(self, member_count: int) -> int:
         """Return votes required to verify based on server member count"""
@@ -185,16 +209,20 @@ class NWordCounter(commands.Cog):
         else:
             return 10
 
+    def get_guild_vote_threshold(self, guild: discord.Guild) -> int:
+        """Return votes required to verify in a guild, not counting bots"""
+        # Use guild.members to get a list of members in the server and remove any bots.
+        member_count = len(
+            [member for member in guild.members if not member.bot])
+        return self.get_vote_threshold(member_count)
+
     def user_voted_for(self, voter_id: int, member: dict) -> bool:
         """Return whether the user voted for the member"""
         if member is None:
             return False
 
-        voter_list = member["voters"]
-        if voter_id in voter_list:
-            return True
-
-        return False
+        # Voters are a set, so this is a constant time check.
+        return voter_id in member["voters"]
 
     @commands.slash_command(
         name="vote",
@@ -261,30 +289,30 @@ class NWordCounter(commands.Cog):
         if user.id == ctx.author.id:
             return "You can't vote/unvote for yourself bozo", "error"
 
-        # Create member if not already in database.
-        user_d = await self.db.member_in_database(ctx.guild.id, user.id)
-        if not user_d:
-            await self.db.create_member(ctx.guild.id, user.id, user.name)
-
-        # Use ctx.guild.members to get a list of members in the server and remove any bots.
-        member_count = len(
-            [member for member in ctx.guild.members if not member.bot])
-        vote_threshold = self.get_vote_threshold(member_count)
-        votes = len(user_d["voters"])
-
-        # Check whether user has a vote casted on them already.
-        if type == "vote":
-            if self.user_voted_for(ctx.author.id, user_d):
-                msg = self.get_vote_return_msgs(type, votes, vote_threshold)
-                return msg["already_performed_msg"], "error"
-        else:
-            if not self.user_voted_for(ctx.author.id, user_d):
-                msg = self.get_vote_return_msgs(type, votes, vote_threshold)
-                return msg["already_performed_msg"], "error"
-
-        # Perform and let know result.
-        voted = await self.db.cast_vote(
-            type, ctx.guild.id, vote_threshold, ctx.author.id, user.id)
+        # Check and cast the vote as one step so concurrent votes see each other.
+        async with self.db.transaction(ctx.guild.id):
+            # Create member if not already in database.
+            user_d = await self.db.member_in_database(ctx.guild.id, user.id)
+            if not user_d:
+                await self.db.create_member(ctx.guild.id, user.id, user.name)
+                user_d = await self.db.member_in_database(ctx.guild.id, user.id)
+
+            vote_threshold = self.get_guild_vote_threshold(ctx.guild)
+            votes = len(user_d["voters"])
+
+            # Check whether user has a vote casted on them already.
+            if type == "vote":
+                if self.user_voted_for(ctx.author.id, user_d):
+                    msg = self.get_vote_return_msgs(type, votes, vote_threshold)
+                    return msg["already_performed_msg"], "error"
+            else:
+                if not self.user_voted_for(ctx.author.id, user_d):
+                    msg = self.get_vote_return_msgs(type, votes, vote_threshold)
+                    return msg["already_performed_msg"], "error"
+
+            # Perform and let know result.
+            voted = await self.db.cast_vote(
+                type, ctx.guild.id, vote_threshold, ctx.author.id, user.id)
         member = await self.db.member_in_database(ctx.guild.id, user.id)
         votes = len(member["voters"])
         if not voted:
@@ -302,8 +330,7 @@ class NWordCounter(commands.Cog):
         await ctx.defer()
         member_list = [
             member["name"]
-            for member in await self.db.get_member_list(ctx.guild.id)
-            if member["is_black"]
+            for member in await self.db.get_member_list(ctx.guild.id, is_black=True)
         ]
         msg = "Verified black members in this server:\n"
         if len(member_list) == 0:
@@ -322,8 +349,7 @@ class NWordCounter(commands.Cog):
         await ctx.defer()
         member_list = [
             member["name"]
-            for member in await self.db.get_member_list(ctx.guild.id)
-            if member["has_pass"]
+            for member in await self.db.get_member_list(ctx.guild.id, has_pass=True)
         ]
         msg = "Verified pass holders in this server:\n"
         if len(member_list) == 0:
@@ -28,22 +28,23 @@ class SettingModal(discord.ui.Modal):
         new_setting = interaction.to_dict()["data"]["components"][0]["components"][0]["value"].upper().strip()
         old_setting = interaction.to_dict()["data"]["custom_id"].upper().strip()
         setting_name = interaction.to_dict()["message"]["components"][0]["components"][0]["custom_id"]
-        settings = await self.db.get_internal_guild_settings(interaction.guild.id)
-        if not settings:
-            settings = DEFAULT_SETTINGS
-        for setting in settings:
-            if setting["int_name"] == setting_name:
-                if setting["type"] == "bool":
-                    if new_setting == "TRUE" or new_setting == "FALSE":
-                        setting["value"] = new_setting == "TRUE"
-                    else:
-                        await interaction.edit_original_response(embed=await generate_message_embed(
-                            title="Invalid Setting",
-                            text=f"Setting `{setting_name}` must be either `TRUE` or `FALSE` not `{new_setting}`",
-                            type="error"
-                        ), view=None, content=None, delete_after=5)
-                        return False
-        await self.db.update_guild_settings(interaction.guild.id, settings)
+        async with self.db.transaction(interaction.guild.id):
+            settings = await self.db.get_internal_guild_settings(interaction.guild.id)
+            if not settings:
+                settings = [dict(setting) for setting in DEFAULT_SETTINGS]
+            for setting in settings:
+                if setting["int_name"] == setting_name:
+                    if setting["type"] == "bool":
+                        if new_setting == "TRUE" or new_setting == "FALSE":
+                            setting["value"] = new_setting == "TRUE"
+                        else:
+                            await interaction.edit_original_response(embed=await generate_message_embed(
+                                title="Invalid Setting",
+                                text=f"Setting `{setting_name}` must be either `TRUE` or `FALSE` not `{new_setting}`",
+                                type="error"
+                            ), view=None, content=None, delete_after=5)
+                            return False
+            await self.db.update_guild_settings(interaction.guild.id, settings)
         embed = await generate_message_embed(
             title="Setting Changed",
             text=f"Setting `{setting_name}` changed from `{old_setting}` to `{new_setting}`",
@@ -0,0 +1,100 @@
+"""Unit tests for the message count cache.
+
+USAGE: cd bot, then python -m pytest tests/test_count_cache.py -v
+       or: python -m unittest tests.test_count_cache
+"""
+import unittest
+import os
+import tempfile
+from unittest import mock
+
+# Add parent directory to path for imports
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.count_cache import CountCache
+from utils.matcher import HARD_RS_LIST
+from utils.whitelist import Whitelist
+
+try:
+    from cogs.nword_counter import NWordCounter
+except ImportError:  # pycord is not installed
+    NWordCounter = None
+
+
+class TestCountCache(unittest.TestCase):
+    """Check eviction order, invalidation and hit statistics"""
+
+    def test_evicts_least_recently_used(self):
+        cache = CountCache(size=2)
+        a, b, c = (CountCache.key(text) for text in ("a", "b", "c"))
+        cache.put(a, 1)
+        cache.put(b, 0)
+        self.assertEqual(cache.get(a), 1)
+        cache.put(c, 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(b))
+        self.assertEqual(cache.get(a), 1)
+        self.assertEqual(cache.get(c), 3)
+
+    def test_zero_counts_are_cached(self):
+        cache = CountCache()
+        key = CountCache.key("hello")
+        cache.put(key, 0)
+        self.assertEqual(cache.get(key), 0)
+
+    def test_keys_follow_content(self):
+        self.assertEqual(CountCache.key("same text"), CountCache.key("same text"))
+        self.assertNotEqual(CountCache.key("same text"), CountCache.key("same text "))
+        self.assertEqual(len(CountCache.key("x" * 4000)), 16)
+        CountCache.key("\ud800 lone surrogate")
+
+    def test_hit_rate_survives_clear(self):
+        cache = CountCache()
+        self.assertEqual(cache.hit_rate, 0.0)
+        key = CountCache.key("spam")
+        cache.get(key)
+        cache.put(key, 2)
+        for _ in range(3):
+            cache.get(key)
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+        self.assertEqual(cache.hit_rate, 0.75)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.get(key))
+        self.assertEqual((cache.hits, cache.misses), (3, 2))
+
+
+@unittest.skipIf(NWordCounter is None, "pycord is not installed")
+class TestCogCountCache(unittest.TestCase):
+    """Check the cog drops cached counts when the whitelist file changes"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".txt")
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        self.write(["niggard"], 1_000_000_000)
+        whitelist = Whitelist(self.path, check_interval=0)
+        with mock.patch("cogs.nword_counter.Database"), \
+                mock.patch("cogs.nword_counter.Whitelist", return_value=whitelist):
+            self.cog = NWordCounter(mock.MagicMock())
+
+    def write(self, words: list[str], mtime_ns: int):
+        with open(self.path, "w") as f:
+            f.write("\n".join(words) + "\n")
+        os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def test_whitelist_change_clears_cache(self):
+        msg = "s" + HARD_RS_LIST[0]
+        self.assertEqual(self.cog.count_nwords(msg), 1)
+        self.assertEqual(self.cog.count_nwords(msg), 1)
+        self.assertEqual((self.cog.counts.hits, self.cog.counts.misses), (1, 1))
+
+        self.write(["niggard", msg], 2_000_000_000)
+        self.assertEqual(self.cog.count_nwords(msg), 0)
+        self.assertEqual((self.cog.counts.hits, self.cog.counts.misses), (1, 2))
+        self.assertEqual(len(self.cog.counts), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,24 +1,33 @@
-"""Unit tests for JSON file-based database.
+"""Unit tests for the database against every storage backend.
 
 USAGE: cd bot, then python -m pytest tests/test_json_database.py -v
        or: python -m unittest tests.test_json_database
 """
 import unittest
 import asyncio
+import glob
 import os
+import random
 import json
+import shutil
+import sqlite3
 import tempfile
+import threading
 from pathlib import Path
+from unittest import mock
 
 # Add parent directory to path for imports
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.database import Database
+from utils.storage import snapshot
+from utils.storage.json_store import JSONStorage
 
 
-class TestJSONDatabase(unittest.TestCase):
-    """Test JSON file-based database operations"""
+class DatabaseTestCases:
+    """Database operations every storage backend must support"""
+    backend = "json"
 
     def setUp(self):
         """Set up test fixtures"""
@@ -30,6 +39,7 @@ class TestJSONDatabase(unittest.TestCase):
 
         # Override the database path for testing
         Database._get_db_path = classmethod(lambda cls: self.test_db_path)
+        Database.configure(backend=self.backend)
 
         # Create clean database
         with open(self.test_db_path, 'w') as f:
@@ -37,11 +47,15 @@ class TestJSONDatabase(unittest.TestCase):
 
     def tearDown(self):
         """Clean up"""
+        # Flush and unload the resident database before the next test
+        self.loop.run_until_complete(Database.close())
         self.loop.close()
 
-        # Remove test database
-        if hasattr(self, 'test_db_path') and os.path.exists(self.test_db_path):
-            os.remove(self.test_db_path)
+        # Remove test database and the files each backend keeps next to it
+        base_path = os.path.splitext(self.test_db_path)[0]
+        for path in glob.glob(base_path + ".*"):
+            os.remove(path)
+        shutil.rmtree(base_path, ignore_errors=True)
 
     def test_guild_creation(self):
         """Test creating a new guild"""
@@ -111,6 +125,32 @@ class TestJSONDatabase(unittest.TestCase):
 
         self.loop.run_until_complete(test())
 
+    def test_purge_votes(self):
+        """Test removing every vote a user cast, before and after a reload"""
+        async def test():
+            await Database.create_database(555555, "Test Guild 4")
+            for member_id in (1, 2, 3, 4):
+                await Database.create_member(555555, member_id, f"user{member_id}")
+            await Database.cast_vote("vote", 555555, 2, 3, 1)
+            await Database.cast_vote("vote", 555555, 2, 4, 1)
+            await Database.cast_vote("vote", 555555, 2, 3, 2)
+            await Database.cast_vote("vote", 555555, 2, 3, 2)
+            member = await Database.member_in_database(555555, 1)
+            self.assertEqual(member["voters"], {3, 4})
+            self.assertTrue(member["is_black"])
+            await Database.close()
+
+            Database.configure(backend=self.backend)
+            self.assertEqual(await Database.purge_votes(555555, 3, 2), 2)
+            member = await Database.member_in_database(555555, 1)
+            self.assertEqual(member["voters"], {4})
+            self.assertFalse(member["is_black"])
+            member = await Database.member_in_database(555555, 2)
+            self.assertEqual(len(member["voters"]), 0)
+            self.assertEqual(await Database.purge_votes(555555, 3, 2), 0)
+
+        self.loop.run_until_complete(test())
+
     def test_get_nword_server_total(self):
         """Test getting total n-word count for server"""
         async def test():
@@ -196,7 +236,976 @@ class TestJSONDatabase(unittest.TestCase):
 
         self.loop.run_until_complete(test())
 
+    def test_indexed_lookup(self):
+        """Test lookups by id stay correct across many guilds and a reload"""
+        async def test():
+            for guild_id in range(1, 51):
+                await Database.create_database(guild_id, f"Guild {guild_id}")
+                await Database.create_member(guild_id, guild_id * 10, "user")
+
+            # Creating a member twice does not duplicate it
+            await Database.create_member(25, 250, "user")
+            self.assertEqual(len(await Database.get_member_list(25)), 1)
+
+            await Database.increment_nword_count(25, 250, 2)
+            await Database.flush()
+
+            # Lookups work the same after a reload from disk
+            await Database.close()
+            self.assertTrue(await Database.guild_in_database(50))
+            self.assertFalse(await Database.guild_in_database(51))
+            member = await Database.member_in_database(25, 250)
+            self.assertEqual(member["nword_count"], 2)
+            self.assertIsNone(await Database.member_in_database(25, 260))
+
+        self.loop.run_until_complete(test())
+
+    def test_record_message(self):
+        """Test recording a message upserts guild and member in one call"""
+        async def test():
+            member, settings = await Database.record_message(
+                3030, "Guild Record", 4040, "user1", 2)
+            self.assertEqual(member["nword_count"], 2)
+            self.assertFalse(member["is_black"])
+            self.assertEqual(settings, {})
+            self.assertTrue(await Database.guild_in_database(3030))
+
+            await Database.update_guild_settings(3030, [
+                {"name": "Send Message", "int_name": "send_message", "value": False}
+            ])
+            member, settings = await Database.record_message(
+                3030, "Guild Record", 4040, "user1", 3)
+            self.assertEqual(member["nword_count"], 5)
+            self.assertFalse(settings["send_message"]["value"])
+
+        self.loop.run_until_complete(test())
+
+    def test_coalesced_increments(self):
+        """Test increments are summed per member and flushed in one batch"""
+        async def test():
+            Database.configure(backend=self.backend, increment_flush_ms=50,
+                               increment_flush_ops=100)
+            await Database.create_database(5050, "Guild Burst")
+            await Database.create_member(5050, 1, "user1")
+            await Database.create_member(5050, 2, "user2")
+
+            batches = []
+            apply_increments = Database._backend.apply_increments
+
+            async def record_batch(deltas):
+                batches.append(sorted(deltas))
+                await apply_increments(deltas)
+
+            Database._backend.apply_increments = record_batch
+
+            for _ in range(30):
+                await Database.increment_nword_count(5050, 1, 1)
+            await Database.increment_nword_count(5050, 2, 5)
+
+            # Reads see pending deltas before they are flushed
+            stored = await Database._backend.get_member(5050, 1)
+            self.assertEqual(stored["nword_count"], 0)
+            member = await Database.member_in_database(5050, 1)
+            self.assertEqual(member["nword_count"], 30)
+
+            # Timer flush applies everything as one batch
+            await asyncio.sleep(0.1)
+            self.assertEqual(batches, [[(5050, 1, 30), (5050, 2, 5)]])
+
+            # Reaching the op limit flushes without waiting for the timer
+            Database.configure(backend=self.backend, increment_flush_ms=60000,
+                               increment_flush_ops=100)
+            for _ in range(100):
+                await Database.increment_nword_count(5050, 2, 1)
+            self.assertEqual(batches[-1], [(5050, 2, 100)])
+            self.assertEqual(await Database.get_nword_server_total(5050), 135)
+
+        self.loop.run_until_complete(test())
+
+    def test_maintained_totals(self):
+        """Test totals and member counts follow every kind of change"""
+        async def test():
+            await Database.create_database(6060, "Guild Totals")
+            await Database.create_member(6060, 1, "user1")
+            await Database.increment_nword_count(6060, 1, 4)
+            await Database.record_message(6060, "Guild Totals", 2, "user2", 3)
+            await Database.record_message(7070, "Guild Other", 1, "user1", 5)
+            await Database.increment_passes(6060, 1, 2)
+
+            self.assertEqual(await Database.get_nword_server_total(6060), 7)
+            self.assertEqual(await Database.get_nword_server_total(7070), 5)
+            self.assertEqual(await Database.get_nword_server_total(8080), 0)
+            self.assertEqual(await Database.get_global_nword_count(), 12)
+            self.assertEqual(await Database.get_member_count(6060), 2)
+            self.assertEqual(await Database.get_member_count(8080), 0)
+            self.assertTrue(await Database.check_aggregates())
+
+        self.loop.run_until_complete(test())
+
+    def test_leaderboard_limit(self):
+        """Test leaderboards only return the requested number of rows"""
+        async def test():
+            await Database.create_database(1, "Guild A")
+            await Database.create_database(2, "Guild B")
+            for member_id in range(20):
+                await Database.create_member(1, member_id, f"user{member_id}")
+                await Database.increment_nword_count(1, member_id, member_id)
+            await Database.create_member(2, 99, "user99")
+            await Database.increment_nword_count(2, 99, 150)
+
+            members = await Database.get_member_list(1, limit=3)
+            self.assertEqual([m["name"] for m in members], ["user19", "user18", "user17"])
+            counts = await Database.get_all_time_counts(2)
+            self.assertEqual([c["nword_count"] for c in counts], [150, 19])
+            servers = await Database.get_all_time_servers(1)
+            self.assertEqual(servers[0]["_id"]["guild_name"], "Guild A")
+            self.assertEqual(servers[0]["nword_count"], sum(range(20)))
+
+        self.loop.run_until_complete(test())
+
+    def test_member_list_paging(self):
+        """Test member lists take a page after an offset and filter on flags"""
+        async def test():
+            for member_id in range(150):
+                await Database.record_message(3, "Guild Pages", member_id, f"user{member_id}", member_id)
+            for member_id in (10, 120, 140):
+                await Database.cast_vote("vote", 3, 1, 999, member_id)
+
+            for limit, offset in ((10, 0), (10, 20), (5, 98), (20, 140), (None, 145)):
+                members = await Database.get_member_list(3, limit, offset)
+                self.assertEqual([m["nword_count"] for m in members],
+                                 list(range(149 - offset, -1, -1))[:limit])
+
+            black = await Database.get_member_list(3, is_black=True)
+            self.assertEqual([m["name"] for m in black], ["user140", "user120", "user10"])
+            black = await Database.get_member_list(3, limit=1, offset=1, is_black=True)
+            self.assertEqual([m["name"] for m in black], ["user120"])
+            members = await Database.get_member_list(3, limit=3, is_black=False, has_pass=False)
+            self.assertEqual([m["name"] for m in members], ["user149", "user148", "user147"])
+            self.assertEqual(await Database.get_member_list(3, has_pass=True), [])
+
+        self.loop.run_until_complete(test())
+
+    def test_flag_filters_follow_votes(self):
+        """Test flag filters follow votes and unvotes"""
+        async def test():
+            for member_id in range(1, 4):
+                await Database.record_message(4, "Guild Flags", member_id, f"user{member_id}", member_id)
+            await Database.cast_vote("vote", 4, 2, 10, 1)
+            await Database.cast_vote("vote", 4, 2, 11, 1)
+            await Database.cast_vote("vote", 4, 2, 10, 2)
+            await Database.cast_vote("vote", 4, 2, 11, 2)
+            black = await Database.get_member_list(4, is_black=True)
+            self.assertEqual([m["name"] for m in black], ["user2", "user1"])
+
+            await Database.cast_vote("unvote", 4, 2, 11, 2)
+            black = await Database.get_member_list(4, is_black=True)
+            self.assertEqual([m["name"] for m in black], ["user1"])
+            await Database.purge_votes(4, 10, 2)
+            self.assertEqual(await Database.get_member_list(4, is_black=True), [])
+
+        self.loop.run_until_complete(test())
+
+    def test_leaderboards_follow_increments(self):
+        """Test leaderboards stay exact past their size as counts change"""
+        async def test():
+            random.seed(7)
+            for member_id in range(150):
+                guild_id = 1 if member_id < 120 else 2
+                await Database.record_message(
+                    guild_id, f"Guild {guild_id}", member_id, f"user{member_id}", 0)
+            counts = {member_id: 0 for member_id in range(150)}
+            for _ in range(1000):
+                member_id = random.randrange(150)
+                count = random.randint(1, 5)
+                counts[member_id] += count
+                await Database.increment_nword_count(
+                    1 if member_id < 120 else 2, member_id, count)
+
+            expected = sorted(counts.values(), reverse=True)
+            global_top = await Database.get_all_time_counts(100)
+            self.assertEqual([m["nword_count"] for m in global_top], expected[:100])
+            guild_expected = sorted((counts[i] for i in range(120)), reverse=True)
+            guild_top = await Database.get_member_list(1, 100)
+            self.assertEqual([m["nword_count"] for m in guild_top], guild_expected[:100])
+            guild_all = await Database.get_member_list(1)
+            self.assertEqual([m["nword_count"] for m in guild_all], guild_expected)
+            servers = await Database.get_all_time_servers(10)
+            self.assertEqual([s["nword_count"] for s in servers], [
+                sum(guild_expected), sum(counts[i] for i in range(120, 150))])
+
+        self.loop.run_until_complete(test())
+
+    def test_member_rank(self):
+        """Test rank lookups in a guild, globally and around a rank"""
+        async def test():
+            for member_id, count in enumerate([5, 9, 5, 0, 12]):
+                await Database.record_message(1, "Guild A", member_id, f"user{member_id}", count)
+            await Database.record_message(2, "Guild B", 10, "user10", 7)
+
+            self.assertEqual(await Database.get_member_rank(1, 4), (1, 1))
+            self.assertEqual(await Database.get_member_rank(1, 1), (2, 2))
+            self.assertEqual(await Database.get_member_rank(1, 0), (3, 4))
+            self.assertEqual(await Database.get_member_rank(1, 2), (3, 4))
+            self.assertEqual(await Database.get_member_rank(1, 3), (5, 6))
+            self.assertEqual(await Database.get_member_rank(1, 99), (None, None))
+
+            await Database.increment_nword_count(1, 3, 10)
+            self.assertEqual(await Database.get_member_rank(1, 3), (2, 2))
+
+            around = await Database.get_members_around_rank(1, 3, 1)
+            self.assertEqual([(m["rank"], m["nword_count"]) for m in around],
+                             [(2, 10), (3, 9), (4, 5)])
+            around = await Database.get_members_around_rank(1, 1, 2)
+            self.assertEqual([m["name"] for m in around], ["user4", "user3", "user1"])
+
+        self.loop.run_until_complete(test())
+
+    def test_negative_increment(self):
+        """Test a count driven below zero still ranks and reports its value"""
+        async def test():
+            await Database.record_message(1, "Guild A", 1, "user1", 5)
+            await Database.record_message(1, "Guild A", 2, "user2", 3)
+            await Database.increment_nword_count(1, 2, -5)
+            self.assertEqual(await Database.get_member_rank(1, 1), (1, 1))
+            self.assertEqual(await Database.get_member_rank(1, 2), (2, 2))
+            around = await Database.get_members_around_rank(1, 1, 1)
+            self.assertEqual([(m["rank"], m["nword_count"]) for m in around],
+                             [(1, 5), (2, -2)])
+
+        self.loop.run_until_complete(test())
+
+    def test_concurrent_increments(self):
+        """Test thousands of parallel increments across guilds add up exactly"""
+        async def test():
+            guild_ids = range(2001, 2009)
+            member_ids = range(1, 6)
+
+            async def burst(guild_id, member_id):
+                for _ in range(50):
+                    await Database.record_message(
+                        guild_id, f"Guild {guild_id}", member_id, f"user{member_id}", 1)
+                    await Database.increment_nword_count(guild_id, member_id, 2)
+
+            # 4000 messages from 40 members, two tasks each, first messages racing
+            await asyncio.gather(*(
+                burst(guild_id, member_id)
+                for guild_id in guild_ids for member_id in member_ids for _ in range(2)))
+
+            for guild_id in guild_ids:
+                self.assertEqual(await Database.get_nword_server_total(guild_id), 1500)
+                for member_id in member_ids:
+                    member = await Database.member_in_database(guild_id, member_id)
+                    self.assertEqual(member["nword_count"], 300)
+            self.assertEqual(await Database.get_global_nword_count(), 12000)
+            self.assertEqual(await Database.get_total_documents(), 8)
+
+        self.loop.run_until_complete(test())
+
+    def test_transaction(self):
+        """Test read-modify-write transactions never lose updates within a guild"""
+        async def test():
+            await Database.create_database(1919, "Guild Transaction")
+            await Database.update_guild_settings(1919, [{"int_name": "counter", "value": 0}])
+
+            async def bump(guild_id):
+                async with Database.transaction(guild_id):
+                    settings = await Database.get_internal_guild_settings(guild_id)
+                    await asyncio.sleep(0)
+                    settings[0]["value"] += 1
+                    await Database.update_guild_settings(guild_id, settings)
+
+            await asyncio.gather(*(bump(1919) for _ in range(500)))
+            settings = await Database.get_internal_guild_settings(1919)
+            self.assertEqual(settings[0]["value"], 500)
+
+            # A transaction on another guild does not wait for this one
+            await Database.create_database(1920, "Guild Other")
+            await Database.update_guild_settings(1920, [{"int_name": "counter", "value": 0}])
+            async with Database.transaction(1919):
+                await asyncio.wait_for(bump(1920), 1)
+                # Nested transactions of the same task do not deadlock
+                async with Database.transaction(1919):
+                    pass
+            settings = await Database.get_internal_guild_settings(1920)
+            self.assertEqual(settings[0]["value"], 1)
+
+        self.loop.run_until_complete(test())
+
+    def test_read_views(self):
+        """Test read views are immutable and only rebuilt after writes and the interval"""
+        async def test():
+            Database.configure(backend=self.backend, read_view_interval=60)
+            await Database.record_message(2121, "Guild View", 1, "user1", 3)
+            view = await Database.get_global_view()
+            guild_view = await Database.get_guild_view(2121)
+            self.assertEqual((view.nword_count, view.total_documents), (3, 1))
+            self.assertEqual(view.top_guilds[0]["nword_count"], 3)
+            self.assertEqual(guild_view.top_members[0]["nword_count"], 3)
+            with self.assertRaises(AttributeError):
+                view.nword_count = 0
+            with self.assertRaises(TypeError):
+                guild_view.top_members[0]["nword_count"] = 0
+
+            # Writes within the interval neither rebuild views nor flush increments
+            await Database.increment_nword_count(2121, 1, 2)
+            self.assertIs(await Database.get_global_view(), view)
+            self.assertIs(await Database.get_guild_view(2121), guild_view)
+            self.assertEqual(Database._pending_ops, 1)
+
+            Database._global_view.interval = 0
+            Database._guild_views[2121].interval = 0
+            view = await Database.get_global_view()
+            self.assertEqual(view.top_members[0]["nword_count"], 5)
+            self.assertEqual((await Database.get_guild_view(2121)).nword_count, 5)
+
+            # Without writes the view is served as is, and readers share a rebuild
+            self.assertIs(await Database.get_global_view(), view)
+            await Database.increment_nword_count(2121, 1, 1)
+            views = await asyncio.gather(*(Database.get_global_view() for _ in range(10)))
+            self.assertEqual(len({id(view) for view in views}), 1)
+            self.assertEqual(views[0].nword_count, 6)
+
+        self.loop.run_until_complete(test())
+
+    def test_shutdown(self):
+        """Test shutdown persists buffered increments and stops accepting writes"""
+        async def test():
+            await Database.record_message(1717, "Guild Shutdown", 1, "user1", 2)
+            await Database.increment_nword_count(1717, 1, 3)
+
+            with self.assertLogs(level="INFO") as logs:
+                await Database.shutdown(timeout=5)
+            self.assertIn("flushed pending counts of 1 members", "\n".join(logs.output))
+            self.assertFalse(Database.accepting_writes())
+            with self.assertRaises(RuntimeError):
+                await Database.member_in_database(1717, 1)
+
+            # A restart reads the counts back from disk
+            Database.configure(backend=self.backend)
+            member = await Database.member_in_database(1717, 1)
+            self.assertEqual(member["nword_count"], 5)
+
+        self.loop.run_until_complete(test())
+
+    def test_failed_increment_flush(self):
+        """Test a batch the backend rejects is retried and shutdown still completes"""
+        async def test():
+            await Database.record_message(1919, "Guild Flaky", 1, "user1", 2)
+            await Database._flush_increments()
+            backend = Database._backend
+            failing = mock.patch.object(backend, "apply_increments", side_effect=OSError("disk full"))
+
+            with failing, self.assertLogs(level="ERROR"):
+                await Database.increment_nword_count(1919, 1, 3)
+                await Database._flush_increments()
+            member = await Database.member_in_database(1919, 1)
+            self.assertEqual(member["nword_count"], 5)
+            await Database._flush_increments()
+
+            await Database.increment_nword_count(1919, 1, 1)
+            with failing, self.assertLogs(level="ERROR") as logs:
+                await Database.shutdown(timeout=5)
+            self.assertIn("Pending counts of 1 members could not be saved",
+                          "\n".join(logs.output))
+
+            # The retried batch reached the disk before the last failure
+            Database.configure(backend=self.backend)
+            member = await Database.member_in_database(1919, 1)
+            self.assertEqual(member["nword_count"], 5)
+
+        self.loop.run_until_complete(test())
+
+
+    def test_shutdown_close_error(self):
+        """Test shutdown logs a backend that fails to close instead of raising"""
+        async def test():
+            await Database.record_message(2020, "Guild Stuck", 1, "user1", 2)
+            backend = Database._backend
+            with mock.patch.object(backend, "close", side_effect=OSError("disk full")), \
+                    self.assertLogs(level="ERROR") as logs:
+                await Database.shutdown(timeout=5)
+            self.assertIn(f"Failed to close the {backend.name} backend: disk full",
+                          "\n".join(logs.output))
+            self.assertFalse(Database.accepting_writes())
+
+        self.loop.run_until_complete(test())
+
+
+class TestJSONDatabase(DatabaseTestCases, unittest.TestCase):
+    """Test JSON file-based database operations"""
+    backend = "json"
+
+    async def wait_for_journal(self):
+        """Flush pending increments and wait for journal writes"""
+        await Database._flush_increments()
+        await Database._backend._wait_for_io()
+
+    def read_journal(self) -> list[dict]:
+        """Return records in the test database journal"""
+        with open(Database._backend.journal_path) as f:
+            return [json.loads(line) for line in f]
+
+    def simulate_crash(self):
+        """Drop resident state without compacting the journal"""
+        Database._backend._close_journal()
+        Database._backend._data = None
+
+    def test_resident_flush(self):
+        """Test writes stay in memory until flushed to disk"""
+        async def test():
+            await Database.create_database(7777777, "Guild Flush")
+            await Database.create_member(7777777, 8888888, "user1")
+            await Database.increment_nword_count(7777777, 8888888, 4)
+
+            # Nothing written to disk yet
+            with open(self.test_db_path) as f:
+                self.assertEqual(json.load(f), {"guilds": []})
+
+            await Database.flush()
+            with open(self.test_db_path) as f:
+                data = json.load(f)
+            self.assertEqual(data["guilds"][0]["members"][0]["nword_count"], 4)
+
+            # Reloading from disk returns the flushed state
+            await Database.close()
+            member = await Database.member_in_database(7777777, 8888888)
+            self.assertEqual(member["nword_count"], 4)
+
+        self.loop.run_until_complete(test())
+
+    def test_journal_replay(self):
+        """Test changes are journaled and replayed after a crash"""
+        async def test():
+            await Database.create_database(4242, "Guild Journal")
+            await Database.create_member(4242, 1, "user1")
+            await Database.increment_nword_count(4242, 1, 3)
+            await Database.cast_vote("vote", 4242, 1, 2, 1)
+
+            # Journal holds one small record per change
+            await self.wait_for_journal()
+            self.assertEqual([r["op"] for r in self.read_journal()],
+                             ["create_guild", "create_member", "vote", "increments"])
+
+            self.simulate_crash()
+            member = await Database.member_in_database(4242, 1)
+            self.assertEqual(member["nword_count"], 3)
+            self.assertTrue(member["is_black"])
+
+            # Compaction folds the journal into the snapshot
+            await Database.flush()
+            self.assertFalse(os.path.exists(Database._backend.journal_path))
+            await Database.increment_nword_count(4242, 1, 1)
+            await self.wait_for_journal()
+            self.simulate_crash()
+            member = await Database.member_in_database(4242, 1)
+            self.assertEqual(member["nword_count"], 4)
+
+        self.loop.run_until_complete(test())
+
+    def test_record_message_journal(self):
+        """Test a message from a known member only journals its increment"""
+        async def test():
+            await Database.record_message(3030, "Guild Record", 4040, "user1", 2)
+            await Database.record_message(3030, "Guild Record", 4040, "user1", 3)
+            await self.wait_for_journal()
+            records = self.read_journal()
+            self.assertEqual([r["op"] for r in records], ["record_message", "increments"])
+            self.assertEqual(records[-1]["deltas"], [[3030, 4040, 5]])
+
+        self.loop.run_until_complete(test())
+
+    def test_io_off_event_loop(self):
+        """Test disk I/O runs on the dedicated I/O thread"""
+        async def test():
+            threads = set()
+            original = JSONStorage._save_database
+
+            def record_thread(store, data):
+                threads.add(threading.current_thread().name)
+                original(store, data)
+
+            JSONStorage._save_database = record_thread
+            try:
+                await Database.create_database(1212, "Guild IO")
+                await Database.flush()
+            finally:
+                JSONStorage._save_database = original
+
+            self.assertEqual(len(threads), 1)
+            self.assertTrue(threads.pop().startswith("database-io"))
+
+        self.loop.run_until_complete(test())
+
+    def test_snapshot_formats(self):
+        """Test switching snapshot formats loads the newest snapshot"""
+        async def test():
+            for snapshot_format, fast_json in (("binary", False), ("json", True), ("binary", True)):
+                Database.configure(backend="json", snapshot_format=snapshot_format,
+                                   fast_json=fast_json)
+                await Database.record_message(1313, "Guild Format", 1, "user1", 2)
+                await Database.cast_vote("vote", 1313, 5, 7, 1)
+                await Database.close()
+
+            Database.configure(backend="json")
+            member = await Database.member_in_database(1313, 1)
+            self.assertEqual(member["nword_count"], 6)
+            self.assertEqual(member["voters"], {7})
+            with open(self.test_db_path[:-len(".json")] + ".bin", 'rb') as f:
+                self.assertTrue(f.read().startswith(snapshot.MAGIC))
+
+        self.loop.run_until_complete(test())
+
+    def test_shutdown_timeout(self):
+        """Test counts survive a shutdown that cannot write the final snapshot in time"""
+        async def test():
+            await Database.record_message(1818, "Guild Slow", 1, "user1", 4)
+            original = JSONStorage.flush
+
+            async def slow_flush(store):
+                await asyncio.sleep(10)
+
+            JSONStorage.flush = slow_flush
+            try:
+                with self.assertLogs(level="ERROR") as logs:
+                    await Database.shutdown(timeout=0.2)
+            finally:
+                JSONStorage.flush = original
+            self.assertIn("the journal will be replayed on the next start",
+                          "\n".join(logs.output))
+
+            # The drained journal is replayed by a fresh store
+            store = JSONStorage(self.test_db_path)
+            member = await store.get_member(1818, 1)
+            await store.close()
+            self.assertEqual(member["nword_count"], 4)
+
+        self.loop.run_until_complete(test())
+
+    def test_flag_index(self):
+        """Test flagged members are indexed per guild, also after a reload"""
+        async def test():
+            for member_id in range(1, 4):
+                await Database.record_message(5, "Guild Index", member_id, f"user{member_id}", 1)
+                await Database.cast_vote("vote", 5, 1, 9, member_id)
+            await Database.cast_vote("unvote", 5, 1, 9, 2)
+            self.assertEqual(Database._backend._flagged["is_black"][5], {1, 3})
+
+            await Database.close()
+            await Database.get_member_list(5, is_black=True)
+            self.assertEqual(Database._backend._flagged["is_black"][5], {1, 3})
+            self.assertEqual(Database._backend._flagged["has_pass"].get(5, set()), set())
+
+        self.loop.run_until_complete(test())
+
+    def test_snapshot_rotation(self):
+        """Test snapshots replace the file atomically and keep older ones"""
+        async def test():
+            await Database.record_message(1414, "Guild Rotate", 1, "user1", 1)
+            await Database.create_database(1515, "Guild Idle")
+            for _ in range(4):
+                await Database.increment_nword_count(1414, 1, 1)
+                await Database.flush()
+
+            store = Database._backend
+            for rotation in range(1, store.snapshot_keep + 1):
+                self.assertTrue(os.path.exists(f"{self.test_db_path}.{rotation}"))
+            self.assertFalse(os.path.exists(f"{self.test_db_path}.{store.snapshot_keep + 1}"))
+            self.assertFalse(os.path.exists(self.test_db_path + ".tmp"))
+
+            # Unchanged guilds hand out the copy of the previous snapshot
+            idle = store._snapshot_copy()["guilds"][1]
+            await Database.increment_nword_count(1414, 1, 1)
+            await Database._flush_increments()
+            guilds = store._snapshot_copy()["guilds"]
+            self.assertIs(guilds[1], idle)
+            self.assertEqual(guilds[0]["members"][0]["nword_count"], 6)
+
+        self.loop.run_until_complete(test())
+
+    def test_crash_before_replace_without_rotation(self):
+        """Test the live snapshot survives a crash mid-save when none are kept"""
+        async def test():
+            Database.configure(backend="json", snapshot_keep=0)
+            await Database.record_message(1717, "Guild Keep", 1, "user1", 2)
+            await Database.flush()
+            await Database.increment_nword_count(1717, 1, 3)
+
+            replace = os.replace
+
+            def crash(source, target):
+                if source.endswith(".tmp"):
+                    raise OSError("simulated crash")
+                replace(source, target)
+
+            with mock.patch("utils.storage.json_store.os.replace", side_effect=crash):
+                await Database.flush()
+            self.simulate_crash()
+
+            with open(self.test_db_path, 'rb') as f:
+                data = snapshot.decode(f.read())
+            self.assertEqual(data["guilds"][0]["members"][0]["nword_count"], 2)
+            member = await Database.member_in_database(1717, 1)
+            self.assertEqual(member["nword_count"], 5)
+
+        self.loop.run_until_complete(test())
+
+    def test_corrupt_snapshot_recovery(self):
+        """Test a truncated snapshot is recovered from the previous one and its journal"""
+        async def test():
+            for guild_id, snapshot_format in enumerate(snapshot.FORMATS, start=1616):
+                Database.configure(backend="json", snapshot_format=snapshot_format)
+                await Database.record_message(guild_id, "Guild Recover", 1, "user1", 3)
+                await Database.flush()
+                await Database.increment_nword_count(guild_id, 1, 2)
+                await Database.flush()
+                await Database.increment_nword_count(guild_id, 1, 1)
+                await self.wait_for_journal()
+                self.simulate_crash()
+
+                path = Database._backend.snapshot_path
+                with open(path, 'rb') as f:
+                    raw = f.read()
+                with open(path, 'wb') as f:
+                    f.write(raw[:len(raw) // 2])
+
+                member = await Database.member_in_database(guild_id, 1)
+                self.assertEqual(member["nword_count"], 6)
+                await Database.close()
+
+        self.loop.run_until_complete(test())
+
+    def test_unreadable_snapshots(self):
+        """Test loading refuses to start empty when no snapshot decodes"""
+        async def test():
+            with open(self.test_db_path, 'w') as f:
+                f.write('{"guilds": [')
+            with self.assertRaises(RuntimeError):
+                await Database.start()
+
+        self.loop.run_until_complete(test())
+
+    def test_check_aggregates_rebuild(self):
+        """Test a consistency check rebuilds wrong totals"""
+        async def test():
+            await Database.record_message(6060, "Guild Totals", 1, "user1", 4)
+            await Database._flush_increments()
+            Database._backend._guild_totals[6060] = 100
+            Database._backend._global_total = 100
+
+            self.assertFalse(await Database.check_aggregates())
+            self.assertEqual(await Database.get_nword_server_total(6060), 4)
+            self.assertEqual(await Database.get_global_nword_count(), 4)
+            self.assertTrue(await Database.check_aggregates())
+
+        self.loop.run_until_complete(test())
+
+
+class TestSQLiteDatabase(DatabaseTestCases, unittest.TestCase):
+    """Test SQLite database operations"""
+    backend = "sqlite"
+
+    def test_import_json_database(self):
+        """Test an existing JSON database is imported on first start"""
+        async def test():
+            Database.configure(backend="json")
+            await Database.create_database(9090, "Guild Import")
+            await Database.create_member(9090, 1, "user1")
+            await Database.increment_nword_count(9090, 1, 7)
+            await Database.cast_vote("vote", 9090, 1, 2, 1)
+            await Database.close()
+
+            Database.configure(backend="sqlite")
+            member = await Database.member_in_database(9090, 1)
+            self.assertEqual(member["nword_count"], 7)
+            self.assertEqual(member["voters"], {2})
+            self.assertTrue(member["is_black"])
+
+        self.loop.run_until_complete(test())
+
+    def test_check_aggregates_rebuild(self):
+        """Test a consistency check rebuilds wrong totals"""
+        async def test():
+            await Database.record_message(6060, "Guild Totals", 1, "user1", 4)
+            await Database._flush_increments()
+            await Database._backend._run(
+                Database._backend._execute,
+                "UPDATE guilds SET nword_count = 100, member_count = 9")
+
+            self.assertFalse(await Database.check_aggregates())
+            self.assertEqual(await Database.get_nword_server_total(6060), 4)
+            self.assertEqual(await Database.get_member_count(6060), 1)
+            self.assertEqual(await Database.get_global_nword_count(), 4)
+            self.assertTrue(await Database.check_aggregates())
+
+        self.loop.run_until_complete(test())
+
+    def test_rank_indexes_follow_writes(self):
+        """Test rank indexes built on first lookup stay in step with later writes"""
+        async def test():
+            rng = random.Random(3)
+            for member_id in range(20):
+                await Database.record_message(
+                    member_id % 2, "Guild Ranks", member_id, f"user{member_id}", rng.randrange(5))
+            await Database.get_member_rank(0, 0)
+            for step in range(200):
+                member_id = rng.randrange(30)
+                await Database.record_message(
+                    member_id % 2, "Guild Ranks", member_id, f"user{member_id}",
+                    rng.choice([0, 1, 3, -2]))
+                if step % 50 == 0:
+                    await Database._flush_increments()
+
+            await Database._flush_increments()
+            backend = Database._backend
+            rows = await backend._run(lambda: backend._conn.execute(
+                "SELECT guild_id, member_id, nword_count FROM members").fetchall())
+            for guild_id, member_id, count in rows:
+                # Counts driven below zero rank as zero.
+                higher = [g for g, _, c in rows if max(c, 0) > max(count, 0)]
+                self.assertEqual(await Database.get_member_rank(guild_id, member_id),
+                                 (1 + higher.count(guild_id), 1 + len(higher)))
+
+        self.loop.run_until_complete(test())
+
+    def test_flag_queries_use_partial_indexes(self):
+        """Test flag filters are answered from the partial flag indexes"""
+        async def test():
+            await Database.record_message(6, "Guild Plan", 1, "user1", 1)
+            backend = Database._backend
+            for column, index in (("is_black", "members_black"), ("has_pass", "members_with_pass")):
+                # The connection belongs to the database thread.
+                plan = await backend._run(lambda: backend._conn.execute(
+                    "EXPLAIN QUERY PLAN SELECT name FROM members WHERE guild_id = ? "
+                    f"AND {column} = 1 ORDER BY nword_count DESC", (6,)).fetchall())
+                self.assertIn(index, " ".join(row[-1] for row in plan))
+
+        self.loop.run_until_complete(test())
+
+    def test_add_totals_to_existing_database(self):
+        """Test a database without total columns gets them filled in"""
+        async def test():
+            await Database.record_message(6060, "Guild Totals", 1, "user1", 4)
+            db_path = Database._backend.path
+            await Database.close()
+
+            with sqlite3.connect(db_path) as conn:
+                conn.executescript(
+                    "DROP TRIGGER members_insert_totals; DROP TRIGGER members_update_totals;"
+                    "DROP TRIGGER members_delete_totals; DROP TRIGGER guilds_update_totals;"
+                    "DROP TRIGGER guilds_delete_totals; DROP INDEX guilds_by_count;"
+                    "ALTER TABLE guilds DROP COLUMN nword_count;"
+                    "ALTER TABLE guilds DROP COLUMN member_count; DROP TABLE totals;")
+            conn.close()
+
+            Database.configure(backend="sqlite")
+            self.assertEqual(await Database.get_nword_server_total(6060), 4)
+            self.assertEqual(await Database.get_member_count(6060), 1)
+            self.assertEqual(await Database.get_global_nword_count(), 4)
+
+        self.loop.run_until_complete(test())
+
+
+class TestShardedDatabase(DatabaseTestCases, unittest.TestCase):
+    """Test per-guild sharded database operations"""
+    backend = "sharded"
+
+    def reopen(self):
+        """Close the backend so the next call loads it from disk"""
+        self.loop.run_until_complete(Database.close())
+        Database.configure(backend="sharded")
+
+    def test_split_json_database(self):
+        """Test an existing JSON database is split into guild files on first start"""
+        async def test():
+            Database.configure(backend="json")
+            await Database.create_database(9090, "Guild Import")
+            await Database.create_member(9090, 1, "user1")
+            await Database.increment_nword_count(9090, 1, 7)
+            await Database.close()
+
+            Database.configure(backend="sharded")
+            self.assertEqual(await Database.get_global_nword_count(), 7)
+            member = await Database.member_in_database(9090, 1)
+            self.assertEqual(member["nword_count"], 7)
+            self.assertTrue(os.path.exists(
+                os.path.join(Database._backend.guilds_dir, "9090.json")))
+
+        self.loop.run_until_complete(test())
+
+    def test_flush_writes_dirty_guilds_only(self):
+        """Test a flush only rewrites the guild files that changed"""
+        async def test():
+            await Database.create_database(1, "Guild A")
+            await Database.create_database(2, "Guild B")
+            await Database.create_member(1, 10, "user10")
+            await Database.create_member(2, 20, "user20")
+            await Database.flush()
+
+            backend = Database._backend
+            written = []
+            write_json = backend._write_json
+
+            def record_write(path, data):
+                written.append(os.path.basename(path))
+                write_json(path, data)
+
+            backend._write_json = record_write
+            await Database.increment_nword_count(2, 20, 3)
+            await Database.flush()
+            self.assertEqual(written, ["2.json", "manifest.json"])
+
+            written.clear()
+            await Database.flush()
+            self.assertEqual(written, [])
+
+        self.loop.run_until_complete(test())
+
+    def test_failed_flush_keeps_guilds_dirty(self):
+        """Test guilds whose write failed are written by the next flush"""
+        async def test():
+            await Database.record_message(1, "Guild A", 10, "user10", 2)
+            await Database.flush()
+            await Database.increment_nword_count(1, 10, 3)
+
+            backend = Database._backend
+            with mock.patch.object(backend, "_write_json", side_effect=OSError("disk full")):
+                with self.assertRaises(OSError):
+                    await Database.flush()
+            await Database.close()
+
+            Database.configure(backend="sharded")
+            member = await Database.member_in_database(1, 10)
+            self.assertEqual(member["nword_count"], 5)
+            self.assertEqual(await Database.get_global_nword_count(), 5)
+
+        self.loop.run_until_complete(test())
+
+    def test_corrupt_guild_segment(self):
+        """Test a guild file that does not decode is never replaced by an empty guild"""
+        async def test():
+            await Database.record_message(1, "Guild A", 10, "user10", 4)
+            await Database.record_message(2, "Guild B", 20, "user20", 6)
+
+        self.loop.run_until_complete(test())
+        path = Database._backend._segment_path(1)
+        self.reopen()
+        with open(path, "w") as f:
+            f.write('{"guild_id": 1, "members": [')
+
+        async def reopened():
+            with self.assertRaises(RuntimeError):
+                await Database.member_in_database(1, 10)
+            with self.assertRaises(RuntimeError):
+                await Database.record_message(1, "Guild A", 11, "user11", 1)
+            await Database.increment_nword_count(2, 20, 1)
+            await Database._buffer_increment(1, 10, 1)
+            await Database.flush()
+            # The batch failed on guild 1, none of it was applied and it is kept whole.
+            member = await Database.member_in_database(2, 20)
+            self.assertEqual(member["nword_count"], 6 + 1)
+            self.assertEqual(Database._backend._members[2][20]["nword_count"], 6)
+            await Database._backend.flush()
+
+        self.loop.run_until_complete(reopened())
+        with open(path) as f:
+            self.assertEqual(f.read(), '{"guild_id": 1, "members": [')
+
+    def test_decrease_in_global_top(self):
+        """Test a count going down in the global top lets in a member of an unloaded guild"""
+        async def test():
+            for guild_id, member_id, count in ((1, 1, 10), (1, 2, 8), (2, 3, 5)):
+                await Database.record_message(
+                    guild_id, f"Guild {guild_id}", member_id, f"user{member_id}", count)
+
+        async def decrease():
+            await Database.increment_nword_count(1, 1, -9)
+            await Database.flush()
+            self.assertEqual(list(Database._backend._guilds), [1])
+
+        async def reopened():
+            counts = await Database.get_all_time_counts(2)
+            self.assertEqual([(c["member"], c["nword_count"]) for c in counts],
+                             [("user2", 8), ("user3", 5)])
+
+        with mock.patch("utils.storage.sharded_store.LEADERBOARD_SIZE", 2):
+            self.loop.run_until_complete(test())
+            self.reopen()
+            self.loop.run_until_complete(decrease())
+            # The stale leaderboard is remembered across a restart.
+            self.reopen()
+            self.loop.run_until_complete(reopened())
+
+    def test_lazy_guild_loading(self):
+        """Test global queries use the manifest and guild files load on access"""
+        async def test():
+            await Database.create_database(1, "Guild A")
+            await Database.create_database(2, "Guild B")
+            await Database.create_member(1, 10, "user10")
+            await Database.create_member(2, 20, "user20")
+            await Database.increment_nword_count(1, 10, 4)
+            await Database.increment_nword_count(2, 20, 6)
+
+        self.loop.run_until_complete(test())
+        self.reopen()
+
+        async def reopened():
+            self.assertEqual(await Database.get_global_nword_count(), 10)
+            self.assertEqual(await Database.get_total_documents(), 2)
+            counts = await Database.get_all_time_counts(2)
+            self.assertEqual([c["member"] for c in counts], ["user20", "user10"])
+            servers = await Database.get_all_time_servers(1)
+            self.assertEqual(servers[0]["_id"]["guild_name"], "Guild B")
+            self.assertEqual(Database._backend._guilds, {})
+
+            member = await Database.member_in_database(1, 10)
+            self.assertEqual(member["nword_count"], 4)
+            self.assertEqual(list(Database._backend._guilds), [1])
+
+        self.loop.run_until_complete(reopened())
+
+    def test_global_rank_loads_one_guild(self):
+        """Test a global rank only loads the member's guild, also from an old manifest"""
+        async def test():
+            for guild_id, counts in ((1, [5, 9, 0]), (2, [7, 5]), (3, [12])):
+                for member_id, count in enumerate(counts):
+                    await Database.record_message(
+                        guild_id, f"Guild {guild_id}", member_id, f"user{member_id}", count)
+
+        self.loop.run_until_complete(test())
+        self.reopen()
+
+        async def reopened():
+            self.assertEqual(await Database.get_member_rank(2, 1), (2, 4))
+            self.assertEqual(list(Database._backend._guilds), [2])
+            await Database.increment_nword_count(2, 1, 10)
+            self.assertEqual(await Database.get_member_rank(2, 1), (1, 1))
+            self.assertEqual(await Database.get_member_rank(3, 0), (1, 2))
+            self.assertEqual(sorted(Database._backend._guilds), [2, 3])
+
+        self.loop.run_until_complete(reopened())
+        path = Database._backend.manifest_path
+        self.reopen()
+
+        # Manifests written before count histograms still rank every member.
+        with open(path) as f:
+            manifest = json.load(f)
+        for summary in manifest["guilds"]:
+            del summary["count_histogram"]
+        with open(path, "w") as f:
+            json.dump(manifest, f)
+
+        async def upgraded():
+            self.assertEqual(await Database.get_member_rank(1, 0), (2, 5))
+            self.assertEqual(await Database.get_member_rank(1, 2), (3, 6))
+            await Database.flush()
+
+        self.loop.run_until_complete(upgraded())
+        with open(path) as f:
+            manifest = json.load(f)
+        self.assertEqual({s["guild_id"]: s["count_histogram"] for s in manifest["guilds"]},
+                         {1: [[0, 1], [5, 1], [9, 1]], 2: [[7, 1], [15, 1]], 3: [[12, 1]]})
+
 
 if __name__ == "__main__":
     unittest.main()
-
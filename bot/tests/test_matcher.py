@@ -0,0 +1,112 @@
+"""Regression tests for the n-word matcher.
+
+USAGE: cd bot, then python -m pytest tests/test_matcher.py -v
+       or: python -m unittest tests.test_matcher
+"""
+import unittest
+import os
+import random
+
+# Add parent directory to path for imports
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.matcher import (
+    AUTOMATON_MIN_PATTERNS, HARD_RS_LIST, NWORDS_LIST, LoopMatcher, Matcher,
+    build_matcher, find_anchors)
+
+WHITELIST_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "whitelist.txt")
+
+
+def legacy_count(msg: str, words: list[str], whitelist: list[str]) -> int:
+    """The counting loop count_nwords ran before the matcher"""
+    count = 0
+    for word in whitelist:
+        if word in msg:
+            count -= 1
+    for n_word in words:
+        count += msg.count(n_word)
+    return count if count >= 0 else 0
+
+
+class TestMatcher(unittest.TestCase):
+    """Compare Matcher.count against the legacy loop"""
+
+    def setUp(self):
+        self.words = NWORDS_LIST + HARD_RS_LIST
+        with open(WHITELIST_PATH, "r") as f:
+            self.whitelist = f.read().splitlines()
+        self.matcher = Matcher(self.words, self.whitelist)
+
+    def assert_matches(self, matcher: Matcher, words, whitelist, messages):
+        for msg in messages:
+            self.assertEqual(matcher.count(msg), legacy_count(msg, words, whitelist), msg)
+
+    def test_regression_corpus(self):
+        rng = random.Random(0)
+        fragments = (self.words + self.whitelist + list("nigaerchuzmys/\\|")
+                     + ["ig", "gga", "nig", "niggas", "cz"])
+        messages = ["".join(rng.choices(fragments, k=rng.randint(0, 10)))
+                    for _ in range(20000)]
+        self.assert_matches(self.matcher, self.words, self.whitelist, messages)
+
+    def test_occurrences_do_not_overlap_per_word(self):
+        words = ["aa", "aaa", "ab"]
+        whitelist = ["aab", "b"]
+        matcher = Matcher(words, whitelist)
+        messages = ["", "a", "aa", "aaaaa", "aaaab", "abab", "aabaab", "baaab"]
+        self.assert_matches(matcher, words, whitelist, messages)
+        self.assertEqual(matcher.count("aaaaa"), 3)
+
+    def test_words_sharing_boundaries_count_separately(self):
+        msg = self.words[3] + self.words[0] + self.words[0]
+        self.assertEqual(self.matcher.count(msg), 3)
+
+    def test_each_whitelisted_word_counts_once(self):
+        word = self.words[0]
+        msg = "s" + HARD_RS_LIST[0] + "s" + word + word + word
+        # snigger and sniggers are both present, one hard r and three others.
+        self.assertEqual(self.matcher.count(msg), 2)
+        # Repeating snigger adds its hard r but takes nothing more off.
+        self.assertEqual(self.matcher.count(msg + "snigger"), 3)
+
+    def test_prefilter_keeps_every_match(self):
+        rng = random.Random(1)
+        fragments = self.words + self.whitelist + list("nigaerchuzmys/\\|")
+        for _ in range(5000):
+            msg = "".join(rng.choices(fragments, k=rng.randint(0, 6)))
+            if self.matcher.count(msg):
+                self.assertTrue(self.matcher.might_match(msg), msg)
+        self.assertFalse(self.matcher.might_match("hello there, nice game"))
+
+    def test_anchors_cover_every_word(self):
+        words = ["abcd", "xbcy", "zz", "q", "mnop"]
+        anchors = find_anchors(words)
+        for word in words:
+            self.assertTrue(any(anchor in word for anchor in anchors), word)
+        self.assertIn("bc", find_anchors(words, 2))
+        self.assertEqual(len(find_anchors(self.words)), 3)
+
+    def test_loop_matcher_and_selection(self):
+        rng = random.Random(2)
+        fragments = self.words + self.whitelist + list("nigaer/\\|")
+        messages = ["".join(rng.choices(fragments, k=rng.randint(0, 8))) for _ in range(2000)]
+        self.assert_matches(LoopMatcher(self.words, self.whitelist),
+                            self.words, self.whitelist, messages)
+        # The short lists in use today are counted faster by str.count.
+        self.assertIs(type(build_matcher(self.words, self.whitelist)), LoopMatcher)
+        words = [f"w{i:03}" for i in range(AUTOMATON_MIN_PATTERNS)]
+        self.assertIs(type(build_matcher(words)), Matcher)
+
+    def test_duplicate_and_empty_entries(self):
+        words = ["ab", "ab"]
+        whitelist = ["", "cab", "cab"]
+        matcher = Matcher(words, whitelist)
+        self.assert_matches(matcher, words, whitelist, ["", "ab", "abab", "cabab", "ababab"])
+        with self.assertRaises(ValueError):
+            Matcher(["ab", ""])
+
+
+if __name__ == "__main__":
+    unittest.main()
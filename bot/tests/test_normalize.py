@@ -0,0 +1,50 @@
+"""Unit tests for message normalization.
+
+USAGE: cd bot, then python -m pytest tests/test_normalize.py -v
+       or: python -m unittest tests.test_normalize
+"""
+import unittest
+import os
+import string
+
+# Add parent directory to path for imports
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.normalize import normalize
+
+
+class TestNormalize(unittest.TestCase):
+    """Check what normalize folds and what it leaves alone"""
+
+    def test_ascii_as_before(self):
+        for msg in ["Hello World", "  spaced\tout\nlines  ", "/\\/ |\\/ MiXeD 123 !?"]:
+            self.assertEqual(normalize(msg), msg.lower().strip().translate(
+                {ord(char): "" for char in string.whitespace}))
+
+    def test_strips_invisible_characters(self):
+        self.assertEqual(normalize("s\u200bn\u200ci\u200dp\u2060e\ufeffs\u00ad"), "snipes")
+        self.assertEqual(normalize("a\u00a0b\u3000c\u202ed"), "abcd")
+
+    def test_folds_confusables(self):
+        self.assertEqual(normalize("саре"), "cape")
+        self.assertEqual(normalize("НЕХ"), "hex")
+        self.assertEqual(normalize("ορα"), "opa")
+
+    def test_folds_fullwidth(self):
+        self.assertEqual(normalize("Ｓｎｉｐ／"), "snip/")
+
+    def test_folds_diacritics(self):
+        self.assertEqual(normalize("Crème Brûlée"), "cremebrulee")
+        self.assertEqual(normalize("Łódź żółć"), "lodzzolc")
+        self.assertEqual(normalize("İstanbul"), "istanbul")
+        # Already decomposed: the combining marks are dropped.
+        self.assertEqual(normalize("e\u0301te\u0301"), "ete")
+
+    def test_leaves_other_scripts(self):
+        self.assertEqual(normalize("добро 日本"),
+                         "дoбpo日本")
+
+
+if __name__ == "__main__":
+    unittest.main()
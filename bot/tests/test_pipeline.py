@@ -0,0 +1,94 @@
+"""Unit tests for message ingestion.
+
+USAGE: cd bot, then python -m pytest tests/test_pipeline.py -v
+       or: python -m unittest tests.test_pipeline
+"""
+import unittest
+import os
+from unittest import mock
+
+# Add parent directory to path for imports
+import sys
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BOT_DIR)
+
+from utils.database import Database
+from utils.matcher import NWORDS_LIST
+from utils.pipeline import IngestStats
+
+try:
+    from cogs.nword_counter import NWordCounter
+except ImportError:  # pycord is not installed
+    NWordCounter = None
+
+
+class TestIngestStats(unittest.TestCase):
+    """Check that stages count what they pass and drop"""
+
+    def test_record_counts_and_returns_hit(self):
+        ingest = IngestStats("prefilter", "counter", "storage")
+        self.assertTrue(ingest.record("prefilter", True))
+        self.assertFalse(ingest.record("prefilter", False))
+        self.assertFalse(ingest.record("counter", False))
+        self.assertEqual([stage.name for stage in ingest.stages()],
+                         ["prefilter", "counter", "storage"])
+        self.assertEqual([(stage.hits, stage.misses) for stage in ingest.stages()],
+                         [(1, 1), (0, 1), (0, 0)])
+        self.assertEqual(ingest.stages()[0].seen, 2)
+        with self.assertRaises(KeyError):
+            ingest.record("unknown", True)
+
+
+@unittest.skipIf(NWordCounter is None, "pycord is not installed")
+class TestOnMessage(unittest.IsolatedAsyncioTestCase):
+    """Run messages through the cog with the database mocked out"""
+
+    def setUp(self):
+        # The cog reads whitelist.txt relative to the bot directory.
+        cwd = os.getcwd()
+        os.chdir(BOT_DIR)
+        self.addCleanup(os.chdir, cwd)
+        self.db = mock.MagicMock(spec=Database)
+        self.db.accepting_writes.return_value = True
+        self.db.record_message.return_value = ({"is_black": True}, {})
+        with mock.patch("cogs.nword_counter.Database", return_value=self.db):
+            self.cog = NWordCounter(mock.MagicMock())
+
+    @staticmethod
+    def message(content: str) -> mock.MagicMock:
+        """Return a guild message from a person, in a channel the bot can't post in"""
+        message = mock.MagicMock()
+        message.content = content
+        message.webhook_id = None
+        message.author.bot = False
+        message.channel.permissions_for.return_value.send_messages = False
+        return message
+
+    async def test_clean_message_skips_storage(self):
+        await self.cog.on_message(self.message("hello there, nice game tonight"))
+        self.assertEqual(self.db.mock_calls, [])
+        self.assertEqual([(stage.hits, stage.misses) for stage in self.cog.ingest.stages()],
+                         [(0, 1), (0, 0), (0, 0)])
+
+    async def test_matching_message_is_recorded_once(self):
+        message = self.message(f"well {NWORDS_LIST[0]} then")
+        await self.cog.on_message(message)
+        self.assertEqual([call[0] for call in self.db.mock_calls],
+                         ["accepting_writes", "record_message"])
+        self.db.record_message.assert_awaited_once_with(
+            message.guild.id, message.guild.name, message.author.id, message.author.name, 1)
+        self.assertEqual([(stage.hits, stage.misses) for stage in self.cog.ingest.stages()],
+                         [(1, 0), (1, 0), (1, 0)])
+
+    async def test_cached_messages_pass_every_stage(self):
+        for content in [f"well {NWORDS_LIST[0]} then", "hello there", "snigger"] * 2:
+            await self.cog.on_message(self.message(content))
+        self.assertEqual((self.cog.counts.hits, self.cog.counts.misses), (3, 3))
+        # Repeats answered from the cache count at each stage like the originals.
+        self.assertEqual([(stage.hits, stage.misses) for stage in self.cog.ingest.stages()],
+                         [(4, 2), (2, 2), (2, 0)])
+        self.assertEqual(self.db.record_message.await_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
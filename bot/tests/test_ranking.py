@@ -0,0 +1,102 @@
+"""Unit tests for the rank index.
+
+USAGE: cd bot, then python -m pytest tests/test_ranking.py -v
+       or: python -m unittest tests.test_ranking
+"""
+import unittest
+import os
+import random
+
+# Add parent directory to path for imports
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ranking import CountHistogram, RankIndex
+
+
+class TestRankIndex(unittest.TestCase):
+    """Compare RankIndex against sorting the counts"""
+
+    def assert_matches(self, index: RankIndex, counts: dict):
+        ranked = sorted(counts.values(), reverse=True)
+        for key, count in counts.items():
+            self.assertEqual(index.rank(key), ranked.index(count) + 1)
+        for rank in range(1, len(counts) + 1):
+            around = index.around(rank, 3)
+            positions = range(max(1, rank - 3), min(len(counts), rank + 3) + 1)
+            self.assertEqual([count for _, _, count in around],
+                             [ranked[position - 1] for position in positions])
+            self.assertEqual([member_rank for member_rank, _, _ in around],
+                             [ranked.index(count) + 1 for _, _, count in around])
+
+    def test_random_updates(self):
+        """Test ranks while keys grow, appear and disappear"""
+        random.seed(11)
+        counts = {key: random.choice([0, 0, 3, random.randrange(5000)]) for key in range(50)}
+        index = RankIndex.from_items(counts.items())
+        self.assert_matches(index, counts)
+        for step in range(2000):
+            key = random.randrange(60)
+            if random.random() < 0.05:
+                index.discard(key)
+                counts.pop(key, None)
+            else:
+                counts[key] = counts.get(key, 0) + random.choice([0, 1, 2, 40, 100000])
+                index.set(key, counts[key])
+            if step % 100 == 0:
+                self.assert_matches(index, counts)
+        self.assert_matches(index, counts)
+
+    def test_negative_counts(self):
+        """Test counts below zero rank as zero instead of hanging the tree"""
+        index = RankIndex.from_items([("a", -3), ("b", 4)])
+        index.set("c", -1)
+        index.set("b", -7)
+        self.assertEqual([index.rank(key) for key in "abc"], [1, 1, 1])
+        index.set("a", 2)
+        self.assertEqual([index.rank(key) for key in "abc"], [1, 2, 2])
+        self.assertEqual(index.rank_of_count(-5), 2)
+
+    def test_ties_around(self):
+        """Test walking a large tie by rank lists each of its keys once"""
+        index = RankIndex.from_items((key, 0) for key in range(1000))
+        index.set("top", 5)
+        for key in range(0, 1000, 3):
+            index.discard(key)
+        index.set(1, 5)
+        listed = []
+        for rank in range(5, len(index) + 3, 5):
+            listed += index.around(rank, 2)
+        self.assertEqual(sorted(key for _, key, _ in listed),
+                         sorted(key for key in range(1000) if key % 3 and key != 1))
+        self.assertEqual({(member_rank, count) for member_rank, _, count in listed}, {(3, 0)})
+        self.assertEqual({key for _, key, _ in index.around(1, 1)}, {"top", 1})
+
+    def test_histogram_merges_parts(self):
+        """Test a histogram summed from parts ranks like an index of every key"""
+        random.seed(12)
+        parts = [[random.randrange(300) for _ in range(40)] for _ in range(5)]
+        merged: dict[int, int] = {}
+        for part in parts:
+            for count in part:
+                merged[count] = merged.get(count, 0) + 1
+        histogram = CountHistogram.from_counts(merged)
+        index = RankIndex.from_items(enumerate(count for part in parts for count in part))
+        for count in range(-1, 302):
+            self.assertEqual(histogram.rank_of_count(count), index.rank_of_count(count))
+        histogram.add(parts[0][0], -1)
+        histogram.add(1000)
+        index.set(0, 1000)
+        self.assertEqual(len(histogram), len(index))
+        for count in range(0, 1002, 7):
+            self.assertEqual(histogram.rank_of_count(count), index.rank_of_count(count))
+
+    def test_missing_key(self):
+        """Test unknown keys have no rank"""
+        index = RankIndex()
+        self.assertIsNone(index.rank("missing"))
+        self.assertEqual(index.around(1), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+"""Unit tests for the in-memory whitelist.
+
+USAGE: cd bot, then python -m pytest tests/test_whitelist.py -v
+       or: python -m unittest tests.test_whitelist
+"""
+import unittest
+import os
+import tempfile
+
+# Add parent directory to path for imports
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.whitelist import Whitelist
+
+
+class TestWhitelist(unittest.TestCase):
+    """Check that the whitelist follows its file"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".txt")
+        os.close(fd)
+        self.write(["snigger", "sniggers"], 1_000_000_000)
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def write(self, words: list[str], mtime_ns: int):
+        with open(self.path, "w") as f:
+            f.write("\n".join(words) + "\n")
+        os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def test_reloads_when_file_changes(self):
+        whitelist = Whitelist(self.path, check_interval=0)
+        self.assertEqual(whitelist.words, ("snigger", "sniggers"))
+        version = whitelist.version
+
+        self.assertEqual(whitelist.words, ("snigger", "sniggers"))
+        self.assertEqual(whitelist.version, version)
+
+        self.write(["niggard"], 2_000_000_000)
+        self.assertEqual(whitelist.words, ("niggard",))
+        self.assertEqual(whitelist.version, version + 1)
+
+    def test_checks_at_most_once_per_interval(self):
+        whitelist = Whitelist(self.path, check_interval=3600)
+        self.write(["niggard"], 2_000_000_000)
+        self.assertEqual(whitelist.words, ("snigger", "sniggers"))
+        self.assertEqual(whitelist.reload(), 1)
+        self.assertEqual(whitelist.words, ("niggard",))
+
+    def test_keeps_words_when_file_disappears(self):
+        whitelist = Whitelist(self.path, check_interval=0)
+        os.remove(self.path)
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(whitelist.words, ("snigger", "sniggers"))
+
+
+if __name__ == "__main__":
+    unittest.main()
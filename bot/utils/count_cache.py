@@ -0,0 +1,58 @@
+"""Counts of recently seen messages, so repeated copies skip counting"""
+import hashlib
+from collections import OrderedDict
+
+# Number of distinct messages whose counts are kept
+DEFAULT_CACHE_SIZE = 4096
+
+
+class CountCache:
+    """Bounded LRU of n-word counts keyed by a hash of the message content
+
+    Keys are 16 byte blake2b digests of the raw text, so an entry costs the
+    same however long the message was. Values are counts, or a negative
+    marker of the caller's choosing. They are only valid for the words they
+    were computed with; clear() the cache when those change.
+    """
+
+    def __init__(self, size: int = DEFAULT_CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._counts: OrderedDict[bytes, int] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        """Return the cache key for a message's content"""
+        return hashlib.blake2b(
+            text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    @property
+    def hit_rate(self) -> float:
+        """Return share of lookups answered from the cache"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, key: bytes) -> int | None:
+        """Return the cached count for key, or None if it is not cached"""
+        count = self._counts.get(key)
+        if count is None:
+            self.misses += 1
+            return None
+        self._counts.move_to_end(key)
+        self.hits += 1
+        return count
+
+    def put(self, key: bytes, count: int) -> None:
+        """Cache count for key, evicting the least recently used entry if full"""
+        self._counts[key] = count
+        self._counts.move_to_end(key)
+        if len(self._counts) > self.size:
+            self._counts.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every cached count, keeping the hit and miss totals"""
+        self._counts.clear()
@@ -1,19 +1,86 @@
-"""JSON file-based database utility class with database commands"""
+"""Database utility class with database commands over a pluggable storage backend"""
 import os
+import time
 import logging
-import json
 import asyncio
+from functools import partial
+from typing import AsyncContextManager
+
+from utils.leaderboard import LEADERBOARD_SIZE
+from utils.locks import StripedLock
+from utils.stats_view import GlobalView, GuildView, ViewCache, freeze
+from utils.storage import snapshot
+from utils.storage.base import StorageBackend
+from utils.storage.json_store import JSONStorage, DEFAULT_COMPACT_THRESHOLD, DEFAULT_SNAPSHOT_KEEP
+from utils.storage.sqlite_store import SQLiteStorage
+from utils.storage.sharded_store import ShardedJSONStorage
 
 # Database file path
 DB_FILE = "bot_database.json"
 
-# Default database structure
-DEFAULT_DB = {"guilds": []}
+# Storage backends selectable through the DATABASE_BACKEND config key
+BACKENDS = {
+    "json": JSONStorage,
+    "sqlite": SQLiteStorage,
+    "sharded": ShardedJSONStorage
+}
+
+# Seconds between background maintenance runs (journal compaction, WAL checkpoints)
+DEFAULT_FLUSH_INTERVAL = 30
+
+# Pending n-word increments are flushed after this many milliseconds...
+DEFAULT_INCREMENT_FLUSH_MS = 250
+
+# ...or once this many increments are pending, whichever comes first
+DEFAULT_INCREMENT_FLUSH_OPS = 1000
+
+# Seconds shutdown() may spend persisting writes (fly.toml kill_timeout is 5)
+DEFAULT_SHUTDOWN_TIMEOUT = 4
+
+# Minimum seconds between rebuilds of the read views behind leaderboards
+DEFAULT_READ_VIEW_INTERVAL = 5
 
 
 class Database:
-    """JSON file-based database"""
-    _lock = asyncio.Lock()
+    """Database commands shared by all cogs
+
+    Storage is delegated to a backend (JSON file, per-guild JSON files or
+    SQLite) chosen with configure(). N-word increments are coalesced per (guild id, member id)
+    and handed to the backend as one batch on a short timer. Member reads
+    include the pending deltas and aggregate reads flush them first.
+
+    Every method is a single atomic change. Code that reads data, decides
+    and writes it back runs inside transaction(guild_id), which holds one
+    of a set of striped per-guild locks so updates within a guild are never
+    lost while other guilds carry on.
+
+    Leaderboards and stats are read from immutable views (get_global_view,
+    get_guild_view) rebuilt at most every read view interval and only once
+    data changed, so read commands never hold up message counting.
+    """
+    _backend: StorageBackend | None = None
+    _backend_name: str = "json"
+    _flush_interval: float = DEFAULT_FLUSH_INTERVAL
+    _compact_threshold: int = DEFAULT_COMPACT_THRESHOLD
+    _snapshot_format: str = "json"
+    _fast_json: bool = False
+    _snapshot_keep: int = DEFAULT_SNAPSHOT_KEEP
+    _shutdown_timeout: float = DEFAULT_SHUTDOWN_TIMEOUT
+    _accepting_writes: bool = True
+    _guild_locks: StripedLock = StripedLock()
+    _read_view_interval: float = DEFAULT_READ_VIEW_INTERVAL
+    _version: int = 0
+    _guild_versions: dict[int, int] = {}
+    _global_view: ViewCache[GlobalView] | None = None
+    _guild_views: dict[int, ViewCache[GuildView]] = {}
+    _flush_task: asyncio.Task | None = None
+    _pending_increments: dict[tuple[int, int], int] = {}
+    _inflight_increments: list[dict[tuple[int, int], int]] = []
+    _pending_ops: int = 0
+    _increment_flush_ms: float = DEFAULT_INCREMENT_FLUSH_MS
+    _increment_flush_ops: int = DEFAULT_INCREMENT_FLUSH_OPS
+    _increment_flush_handle: asyncio.TimerHandle | None = None
+    _increment_flush_task: asyncio.Task | None = None
 
     @classmethod
     def _get_db_path(cls) -> str:
@@ -21,108 +88,333 @@ class Database:
         return os.path.join(os.path.dirname(__file__), "..", DB_FILE)
 
     @classmethod
-    def _load_database(cls) -> dict:
-        """Load database from JSON file"""
+    def _create_backend(cls) -> StorageBackend:
+        """Create the configured storage backend"""
         db_path = cls._get_db_path()
+        if cls._backend_name == "sqlite":
+            return SQLiteStorage(os.path.splitext(db_path)[0] + ".sqlite3")
+        if cls._backend_name == "sharded":
+            return ShardedJSONStorage(os.path.splitext(db_path)[0])
+        return JSONStorage(db_path, compact_threshold=cls._compact_threshold,
+                           snapshot_format=cls._snapshot_format, fast_json=cls._fast_json,
+                           snapshot_keep=cls._snapshot_keep)
+
+    @classmethod
+    def _get_backend(cls) -> StorageBackend:
+        """Return the storage backend, creating it on first use"""
+        if cls._backend is None:
+            if not cls._accepting_writes:
+                raise RuntimeError("Database has been shut down")
+            cls._backend = cls._create_backend()
+        return cls._backend
+
+    @classmethod
+    def configure(cls, backend: str = "json",
+                  flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                  compact_threshold: int = DEFAULT_COMPACT_THRESHOLD,
+                  increment_flush_ms: float = DEFAULT_INCREMENT_FLUSH_MS,
+                  increment_flush_ops: int = DEFAULT_INCREMENT_FLUSH_OPS,
+                  snapshot_format: str = "json",
+                  fast_json: bool = False,
+                  snapshot_keep: int = DEFAULT_SNAPSHOT_KEEP,
+                  shutdown_timeout: float = DEFAULT_SHUTDOWN_TIMEOUT,
+                  read_view_interval: float = DEFAULT_READ_VIEW_INTERVAL) -> None:
+        """Set storage and persistence options, call before start()"""
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown database backend {backend}")
+        if snapshot_format not in snapshot.FORMATS:
+            raise ValueError(f"Unknown snapshot format {snapshot_format}")
+        cls._backend_name = backend
+        cls._flush_interval = flush_interval
+        cls._compact_threshold = compact_threshold
+        cls._increment_flush_ms = increment_flush_ms
+        cls._increment_flush_ops = increment_flush_ops
+        cls._snapshot_format = snapshot_format
+        cls._fast_json = fast_json
+        cls._snapshot_keep = snapshot_keep
+        cls._shutdown_timeout = shutdown_timeout
+        cls._accepting_writes = True
+        cls._read_view_interval = read_view_interval
+        # asyncio locks belong to the loop they are first used on.
+        cls._guild_locks = StripedLock()
+        cls._reset_views()
+
+    @classmethod
+    async def start(cls) -> None:
+        """Open the storage backend and start the background maintenance task"""
+        await cls._get_backend().load()
+        if cls._flush_task is None or cls._flush_task.done():
+            cls._flush_task = asyncio.create_task(cls._flush_loop())
+            logging.info(f"Database maintenance task started ({cls._flush_interval}s interval)")
+
+    @classmethod
+    async def _flush_loop(cls) -> None:
+        """Run backend maintenance every flush interval"""
+        while True:
+            await asyncio.sleep(cls._flush_interval)
+            try:
+                await cls._get_backend().maintenance()
+            except Exception as e:
+                logging.error(f"Database maintenance failed: {e}")
+
+    @classmethod
+    async def flush(cls) -> None:
+        """Apply pending increments and persist everything to disk"""
+        if cls._backend is None:
+            return
+        await cls._flush_increments()
+        await cls._backend.flush()
+
+    @classmethod
+    async def close(cls) -> None:
+        """Stop background tasks, persist pending changes and close the backend"""
+        if cls._flush_task is not None:
+            cls._flush_task.cancel()
+            cls._flush_task = None
+        if cls._backend is not None:
+            await cls._flush_increments()
+            await cls._backend.close()
+            cls._backend = None
+        cls._pending_increments = {}
+        cls._pending_ops = 0
+        cls._reset_views()
+
+    @classmethod
+    def accepting_writes(cls) -> bool:
+        """Return False once shutdown() has started"""
+        return cls._accepting_writes
+
+    @classmethod
+    async def shutdown(cls, timeout: float | None = None) -> None:
+        """Stop ingestion and persist pending writes within timeout seconds
+
+        Pending increments are handed to the backend and made durable first
+        (for the JSON backend, appended to the journal), then the backend is
+        closed, which writes a final snapshot, with the time that is left.
+        If the snapshot does not finish in time the journal is replayed on
+        the next start, so no counts are lost either way. Errors are logged
+        rather than raised so the caller can still disconnect.
+        """
+        cls._accepting_writes = False
+        if cls._flush_task is not None:
+            cls._flush_task.cancel()
+            cls._flush_task = None
+        if cls._backend is None:
+            return
+        timeout = cls._shutdown_timeout if timeout is None else timeout
+        members = len(set(cls._pending_increments).union(
+            *(batch.keys() for batch in cls._inflight_increments)))
+
+        backend = cls._backend
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        drained = None
         try:
-            if os.path.exists(db_path):
-                with open(db_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+            await asyncio.wait_for(cls._drain(), timeout)
+            drained = loop.time()
+            await asyncio.wait_for(cls.close(), started + timeout - drained)
+        except asyncio.TimeoutError:
+            if drained is None:
+                logging.error(
+                    f"Database shutdown ran out of its {timeout}s budget before pending "
+                    f"counts of {members} members were saved")
             else:
-                return DEFAULT_DB.copy()
-        except json.JSONDecodeError:
-            logging.error(f"Failed to decode {db_path}, using default database")
-            return DEFAULT_DB.copy()
+                logging.error(
+                    f"Database shutdown ran out of its {timeout}s budget while closing "
+                    f"the {backend.name} backend, {backend.recovery}")
+            return
+        except Exception as e:
+            logging.error(f"Failed to close the {backend.name} backend: {e}")
+            return
+        logging.info(
+            f"Database shut down in {loop.time() - started:.2f}s: flushed pending counts "
+            f"of {members} members in {drained - started:.2f}s, then wrote the final snapshot")
 
     @classmethod
-    def _save_database(cls, data: dict) -> None:
-        """Save database to JSON file"""
-        db_path = cls._get_db_path()
+    async def _drain(cls) -> None:
+        """Apply pending increments and wait until the backend has them on disk
+
+        Errors are logged rather than raised so shutdown still goes on to
+        close the backend and disconnect.
+        """
         try:
-            with open(db_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            if cls._increment_flush_task is not None and not cls._increment_flush_task.done():
+                await cls._increment_flush_task
+            await cls._flush_increments()
+            await cls._backend.drain()
         except Exception as e:
-            logging.error(f"Failed to save database: {e}")
+            logging.error(f"Failed to drain database writes: {e}")
+        if cls._pending_increments:
+            logging.error(f"Pending counts of {len(cls._pending_increments)} members "
+                          f"could not be saved")
+
+    @classmethod
+    def _reset_views(cls) -> None:
+        """Drop cached read views"""
+        cls._global_view = None
+        cls._guild_views = {}
+
+    @classmethod
+    def _changed(cls, guild_id: int) -> None:
+        """Bump the data version so read views of the guild get rebuilt"""
+        cls._version += 1
+        cls._guild_versions[guild_id] = cls._version
+
+    @classmethod
+    async def _build_global_view(cls, version: int) -> GlobalView:
+        """Query global totals and leaderboards for a new read view"""
+        taken_at = time.monotonic()
+        await cls._flush_increments()
+        backend = cls._get_backend()
+        return GlobalView(
+            version=version,
+            taken_at=taken_at,
+            nword_count=await backend.get_global_total(),
+            total_documents=await backend.get_total_documents(),
+            top_members=freeze(await backend.get_all_time_counts(LEADERBOARD_SIZE)),
+            top_guilds=freeze(await backend.get_all_time_servers(LEADERBOARD_SIZE))
+        )
+
+    @classmethod
+    async def _build_guild_view(cls, guild_id: int, version: int) -> GuildView:
+        """Query a guild's total and leaderboard for a new read view"""
+        taken_at = time.monotonic()
+        await cls._flush_increments()
+        backend = cls._get_backend()
+        return GuildView(
+            version=version,
+            taken_at=taken_at,
+            nword_count=await backend.get_guild_total(guild_id),
+            top_members=freeze(await backend.get_member_list(guild_id, LEADERBOARD_SIZE))
+        )
+
+    @classmethod
+    async def get_global_view(cls) -> GlobalView:
+        """Return global total, guild count and top members and guilds
+
+        The view is shared by every reader and never changes; it may lag
+        writes by up to the read view interval.
+        """
+        if cls._global_view is None:
+            cls._global_view = ViewCache(cls._build_global_view, cls._read_view_interval)
+        return await cls._global_view.get(cls._version)
 
     @classmethod
-    async def _async_load_database(cls) -> dict:
-        """Async load database"""
-        async with cls._lock:
-            return cls._load_database()
+    async def get_guild_view(cls, guild_id: int) -> GuildView:
+        """Return a guild's total and top members, see get_global_view()"""
+        views = cls._guild_views.get(guild_id)
+        if views is None:
+            views = cls._guild_views[guild_id] = ViewCache(
+                partial(cls._build_guild_view, guild_id), cls._read_view_interval)
+        return await views.get(cls._guild_versions.get(guild_id, 0))
 
     @classmethod
-    async def _async_save_database(cls, data: dict) -> None:
-        """Async save database"""
-        async with cls._lock:
-            cls._save_database(data)
+    async def _buffer_increment(cls, guild_id: int, member_id: int, count: int) -> None:
+        """Add an n-word delta to the pending increment buffer"""
+        cls._changed(guild_id)
+        key = (guild_id, member_id)
+        cls._pending_increments[key] = cls._pending_increments.get(key, 0) + count
+        cls._pending_ops += 1
+        if cls._pending_ops >= cls._increment_flush_ops:
+            await cls._flush_increments()
+        elif cls._increment_flush_handle is None:
+            cls._increment_flush_handle = asyncio.get_running_loop().call_later(
+                cls._increment_flush_ms / 1000, cls._on_increment_timer)
+
+    @classmethod
+    def _on_increment_timer(cls) -> None:
+        """Start a flush of pending increments when the timer fires"""
+        cls._increment_flush_handle = None
+        cls._increment_flush_task = asyncio.create_task(cls._flush_increments())
+
+    @classmethod
+    async def _flush_increments(cls) -> None:
+        """Hand all pending n-word deltas to the backend as one batch
+
+        A batch the backend fails to apply goes back to the pending deltas
+        and is retried on the next flush.
+        """
+        if cls._increment_flush_handle is not None:
+            cls._increment_flush_handle.cancel()
+            cls._increment_flush_handle = None
+        if not cls._pending_increments:
+            return
+        batch = cls._pending_increments
+        cls._pending_increments = {}
+        cls._pending_ops = 0
+
+        # Reads keep seeing the batch until the backend has applied it.
+        cls._inflight_increments.append(batch)
+        try:
+            await cls._get_backend().apply_increments([
+                (guild_id, member_id, count)
+                for (guild_id, member_id), count in batch.items()
+            ])
+        except Exception as e:
+            logging.error(f"Failed to apply n-word counts of {len(batch)} members: {e}")
+            for key, count in batch.items():
+                cls._pending_increments[key] = cls._pending_increments.get(key, 0) + count
+            if cls._increment_flush_handle is None and cls._accepting_writes:
+                cls._increment_flush_handle = asyncio.get_running_loop().call_later(
+                    cls._increment_flush_ms / 1000, cls._on_increment_timer)
+        finally:
+            cls._inflight_increments.remove(batch)
+
+    @classmethod
+    def _with_pending(cls, guild_id: int, member: dict | None) -> dict | None:
+        """Return member with its pending n-word delta included"""
+        if member is None:
+            return None
+        key = (guild_id, member["id"])
+        delta = cls._pending_increments.get(key, 0)
+        for batch in cls._inflight_increments:
+            delta += batch.get(key, 0)
+        if not delta:
+            return member
+        return dict(member, nword_count=member["nword_count"] + delta)
 
     def __init__(self):
         """Initialize database connection"""
-        logging.info("Initialized JSON file-based database")
-        print("Initialized JSON file-based database")
+        logging.info(f"Initialized {self._backend_name} database")
+        print(f"Initialized {self._backend_name} database")
 
     @classmethod
     async def guild_in_database(cls, guild_id: int) -> bool:
         """Return True if guild is already recorded in database"""
-        db = await cls._async_load_database()
-        for guild in db.get("guilds", []):
-            if guild["guild_id"] == guild_id:
-                return True
-        return False
+        return await cls._get_backend().guild_exists(guild_id)
 
     @classmethod
     async def create_database(cls, guild_id: int, guild_name: str) -> None:
         """Initialize guild template in database"""
-        db = await cls._async_load_database()
-
-        # Check if guild already exists
-        for guild in db.get("guilds", []):
-            if guild["guild_id"] == guild_id:
-                return
-
-        new_guild = {
-            "guild_id": guild_id,
-            "guild_name": guild_name,
-            "members": [],
-            "settings": []
-        }
-
-        db.setdefault("guilds", []).append(new_guild)
-        await cls._async_save_database(db)
-        logging.info(f"Guild added! {guild_name} with id {guild_id}")
+        if await cls._get_backend().create_guild(guild_id, guild_name):
+            cls._changed(guild_id)
+            logging.info(f"Guild added! {guild_name} with id {guild_id}")
 
     @classmethod
     async def update_guilds(cls):
         """Update all guilds in database to have a settings field if they don't already."""
-        db = await cls._async_load_database()
+        await cls._get_backend().update_guilds()
 
-        for guild in db.get("guilds", []):
-            if "settings" not in guild:
-                guild["settings"] = []
+    @classmethod
+    def transaction(cls, guild_id: int) -> AsyncContextManager[None]:
+        """Lock a guild for a read-modify-write
 
-        await cls._async_save_database(db)
+        Use as ``async with Database.transaction(guild_id):`` around reading
+        guild or member data, deciding on it and writing the result, so no
+        other transaction of the guild interleaves with it.
+        """
+        return cls._guild_locks.hold(guild_id)
 
     @classmethod
     async def get_internal_guild_settings(cls, guild_id: int) -> list:
-        """Return guild settings as a list"""
-        db = await cls._async_load_database()
-
-        for guild in db.get("guilds", []):
-            if guild["guild_id"] == guild_id:
-                return guild.get("settings", [])
-
-        return []
+        """Return a copy of guild settings as a list"""
+        settings = await cls._get_backend().get_settings(guild_id)
+        return [dict(setting) for setting in settings]
 
     @classmethod
     async def update_guild_settings(cls, guild_id: int, settings: list) -> None:
         """Update guild settings"""
-        db = await cls._async_load_database()
-
-        for guild in db.get("guilds", []):
-            if guild["guild_id"] == guild_id:
-                guild["settings"] = settings
-                await cls._async_save_database(db)
-                return
+        await cls._get_backend().set_settings(guild_id, settings)
 
     @classmethod
     async def get_guild_settings(cls, guild_id: int):
@@ -136,149 +428,120 @@ class Database:
     async def member_in_database(
             cls, guild_id: int, member_id: int) -> dict | None:
         """Return member dict if member is already recorded in guild database"""
-        db = await cls._async_load_database()
-
-        for guild in db.get("guilds", []):
-            if guild["guild_id"] == guild_id:
-                for member in guild.get("members", []):
-                    if member["id"] == member_id:
-                        return member
-
-        return None
+        member = await cls._get_backend().get_member(guild_id, member_id)
+        return cls._with_pending(guild_id, member)
 
     @classmethod
     async def create_member(cls, guild_id: int, member_id: int, member_name: str) -> None:
         """Initialize member data in guild database"""
-        db = await cls._async_load_database()
-
-        for guild in db.get("guilds", []):
-            if guild["guild_id"] == guild_id:
-                new_member = {
-                    "id": member_id,
-                    "name": member_name,
-                    "nword_count": 0,
-                    "is_black": False,
-                    "has_pass": False,
-                    "passes": 0,
-                    "voters": []
-                }
-                guild.setdefault("members", []).append(new_member)
-                await cls._async_save_database(db)
-                return
+        await cls._get_backend().create_member(guild_id, member_id, member_name)
+        cls._changed(guild_id)
 
     @classmethod
     async def increment_nword_count(cls, guild_id: int, member_id: int, count: int) -> None:
         """Add to n-word count of person's data info in server"""
-        db = await cls._async_load_database()
-
-        for guild in db.get("guilds", []):
-            if guild["guild_id"] == guild_id:
-                for member in guild.get("members", []):
-                    if member["id"] == member_id:
-                        member["nword_count"] += count
-                        await cls._async_save_database(db)
-                        return
+        if await cls._get_backend().get_member(guild_id, member_id) is None:
+            return
+        await cls._buffer_increment(guild_id, member_id, count)
 
     @classmethod
     async def increment_passes(cls, guild_id: int, member_id: int, count: int) -> None:
         """Add to user's total available n-word passes in server"""
-        db = await cls._async_load_database()
+        await cls._get_backend().increment_passes(guild_id, member_id, count)
 
-        for guild in db.get("guilds", []):
-            if guild["guild_id"] == guild_id:
-                for member in guild.get("members", []):
-                    if member["id"] == member_id:
-                        member["passes"] += count
-                        await cls._async_save_database(db)
-                        return
+    @classmethod
+    async def record_message(
+        cls, guild_id: int, guild_name: str, member_id: int,
+        member_name: str, count: int
+    ) -> tuple[dict, dict]:
+        """Record n-words said in a message in a single operation
+
+        Creates the guild and member if they are missing, adds count to the
+        member's n-word count and returns the member dict together with the
+        guild settings keyed by internal name.
+        """
+        member, settings = await cls._get_backend().record_message(
+            guild_id, guild_name, member_id, member_name)
+        await cls._buffer_increment(guild_id, member_id, count)
+        return (
+            cls._with_pending(guild_id, member),
+            {setting["int_name"]: setting for setting in settings}
+        )
 
     @classmethod
     async def get_total_documents(cls) -> int:
         """Return total number of guilds in database"""
-        db = await cls._async_load_database()
-        return len(db.get("guilds", []))
+        return await cls._get_backend().get_total_documents()
 
     @classmethod
     async def get_nword_server_total(cls, guild_id: int) -> int:
         """Return integer sum of total n-words said in a server"""
-        db = await cls._async_load_database()
+        await cls._flush_increments()
+        return await cls._get_backend().get_guild_total(guild_id)
 
-        for guild in db.get("guilds", []):
-            if guild["guild_id"] == guild_id:
-                total = 0
-                for member in guild.get("members", []):
-                    total += member.get("nword_count", 0)
-                return total
+    @classmethod
+    async def get_member_count(cls, guild_id: int) -> int:
+        """Return number of members recorded in a server"""
+        return await cls._get_backend().get_member_count(guild_id)
 
-        return 0
+    @classmethod
+    async def get_member_rank(
+            cls, guild_id: int, member_id: int) -> tuple[int | None, int | None]:
+        """Return member's n-word rank in the server and out of all servers
+
+        Members with the same count share a rank. Either rank is None if the
+        member is not recorded.
+        """
+        await cls._flush_increments()
+        backend = cls._get_backend()
+        return (
+            await backend.get_member_rank(guild_id, member_id),
+            await backend.get_global_rank(guild_id, member_id)
+        )
 
     @classmethod
-    async def get_all_time_servers(cls, limit: int) -> list:
-        """Return the servers with the highest recorded n-word count out of all servers"""
-        db = await cls._async_load_database()
+    async def get_members_around_rank(
+            cls, guild_id: int, rank: int, radius: int = 2) -> list:
+        """Return the server's members ranked rank - radius to rank + radius"""
+        await cls._flush_increments()
+        return await cls._get_backend().get_members_around_rank(guild_id, rank, radius)
 
-        servers = []
-        for guild in db.get("guilds", []):
-            total = 0
-            for member in guild.get("members", []):
-                total += member.get("nword_count", 0)
+    @classmethod
+    async def check_aggregates(cls) -> bool:
+        """Rebuild maintained n-word totals from member records
 
-            servers.append({
-                "_id": {
-                    "guild_id": guild["guild_id"],
-                    "guild_name": guild["guild_name"]
-                },
-                "nword_count": total
-            })
+        Returns True if the totals were already consistent.
+        """
+        await cls._flush_increments()
+        consistent = await cls._get_backend().check_aggregates()
+        if not consistent:
+            logging.warning("Database totals were inconsistent and have been rebuilt")
+        return consistent
 
-        # Sort by nword_count descending and limit
-        servers.sort(key=lambda x: x["nword_count"], reverse=True)
-        return servers[:limit]
+    @classmethod
+    async def get_all_time_servers(cls, limit: int) -> list:
+        """Return the servers with the highest recorded n-word count out of all servers"""
+        await cls._flush_increments()
+        return await cls._get_backend().get_all_time_servers(limit)
 
     @classmethod
     async def get_all_time_counts(cls, limit: int) -> list:
         """Return the members with the highest recorded n-word count out of all servers"""
-        db = await cls._async_load_database()
-
-        all_members = []
-        for guild in db.get("guilds", []):
-            for member in guild.get("members", []):
-                all_members.append({
-                    "member": member["name"],
-                    "nword_count": member.get("nword_count", 0)
-                })
-
-        # Sort by nword_count descending and limit
-        all_members.sort(key=lambda x: x["nword_count"], reverse=True)
-        return all_members[:limit]
-
-    @classmethod
-    async def get_member_list(cls, guild_id: int) -> list:
-        """Return sorted ranked list of member objects based on n-word frequency"""
-        db = await cls._async_load_database()
-
-        for guild in db.get("guilds", []):
-            if guild["guild_id"] == guild_id:
-                members = guild.get("members", [])
-                # Sort by nword_count descending
-                sorted_members = sorted(
-                    members,
-                    key=lambda x: x.get("nword_count", 0),
-                    reverse=True
-                )
-
-                # Return formatted list
-                return [
-                    {
-                        "name": member["name"],
-                        "is_black": member.get("is_black", False),
-                        "has_pass": member.get("has_pass", False),
-                        "nword_count": member.get("nword_count", 0)
-                    }
-                    for member in sorted_members
-                ]
-
-        return []
+        await cls._flush_increments()
+        return await cls._get_backend().get_all_time_counts(limit)
+
+    @classmethod
+    async def get_member_list(
+            cls, guild_id: int, limit: int | None = None, offset: int = 0,
+            is_black: bool | None = None, has_pass: bool | None = None) -> list:
+        """Return sorted ranked list of member objects based on n-word frequency
+
+        Only the page of limit members after offset is built. is_black and
+        has_pass, when given, keep only members with that flag value.
+        """
+        await cls._flush_increments()
+        return await cls._get_backend().get_member_list(
+            guild_id, limit, offset, is_black, has_pass)
 
     @classmethod
     async def cast_vote(
@@ -286,38 +549,19 @@ class Database:
         voter_id: int, votee_id: int
     ) -> dict | None:
         """Insert voter id into votee's voter list in database"""
-        db = await cls._async_load_database()
-
-        for guild in db.get("guilds", []):
-            if guild["guild_id"] == guild_id:
-                for member in guild.get("members", []):
-                    if member["id"] == votee_id:
-                        if type == "vote":
-                            if voter_id not in member.get("voters", []):
-                                member.setdefault("voters", []).append(voter_id)
-                        else:  # unvote
-                            if voter_id in member.get("voters", []):
-                                member["voters"].remove(voter_id)
-
-                        # Check if enough votes
-                        if len(member.get("voters", [])) >= vote_threshold:
-                            member["is_black"] = True
-                        else:
-                            member["is_black"] = False
+        member = await cls._get_backend().cast_vote(
+            type, guild_id, vote_threshold, voter_id, votee_id)
+        cls._changed(guild_id)
+        return cls._with_pending(guild_id, member)
 
-                        await cls._async_save_database(db)
-                        return member
-
-        return None
+    @classmethod
+    async def purge_votes(cls, guild_id: int, voter_id: int, vote_threshold: int) -> int:
+        """Remove every vote a user cast in a server, return how many were removed"""
+        cls._changed(guild_id)
+        return await cls._get_backend().purge_votes(guild_id, voter_id, vote_threshold)
 
     @classmethod
     async def get_global_nword_count(cls) -> int:
         """Return integer sum of total n-words said in all servers"""
-        db = await cls._async_load_database()
-
-        total = 0
-        for guild in db.get("guilds", []):
-            for member in guild.get("members", []):
-                total += member.get("nword_count", 0)
-
-        return total
+        await cls._flush_increments()
+        return await cls._get_backend().get_global_total()
@@ -0,0 +1,103 @@
+"""Bounded leaderboard structures for n-word counts"""
+import heapq
+from typing import Any, Callable, Hashable, Iterable, TypeVar
+
+T = TypeVar("T")
+
+# Entries kept per leaderboard, the largest limit /top commands accept
+LEADERBOARD_SIZE = 100
+
+
+class TopK:
+    """The k entries with the highest values, maintained on update
+
+    Counts only ever grow, so an entry outside the top k can only get in
+    by overtaking the current minimum and an entry inside can only leave
+    by being evicted. That keeps the structure exact with O(1) updates for
+    entries already inside and O(k) when the minimum has to be found again.
+    Call rebuild() after a value decreases.
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self._values: dict[Hashable, int] = {}
+        self._data: dict[Hashable, Any] = {}
+        self._min_key: Hashable | None = None
+
+    @classmethod
+    def from_items(cls, k: int, items: Iterable[tuple[Hashable, int, Any]]) -> "TopK":
+        """Build from (key, value, data) tuples"""
+        top = cls(k)
+        top.rebuild(items)
+        return top
+
+    def rebuild(self, items: Iterable[tuple[Hashable, int, Any]]) -> None:
+        """Replace contents with the k largest (key, value, data) tuples"""
+        largest = heapq.nlargest(self.k, items, key=lambda item: item[1])
+        self._values = {key: value for key, value, _ in largest}
+        self._data = {key: data for key, _, data in largest}
+        self._min_key = None
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._values
+
+    def _get_min_key(self) -> Hashable:
+        """Return key of the smallest value, cached until it changes"""
+        if self._min_key is None:
+            self._min_key = min(self._values, key=self._values.__getitem__)
+        return self._min_key
+
+    def update(self, key: Hashable, value: int, data: Any = None) -> None:
+        """Record a new (larger) value for key"""
+        values = self._values
+        if key in values:
+            values[key] = value
+            if data is not None:
+                self._data[key] = data
+            if key == self._min_key:
+                self._min_key = None
+            return
+
+        if len(values) < self.k:
+            values[key] = value
+            self._data[key] = data
+            if self._min_key is not None and value < values[self._min_key]:
+                self._min_key = key
+            return
+
+        min_key = self._get_min_key()
+        if value > values[min_key]:
+            del values[min_key]
+            del self._data[min_key]
+            values[key] = value
+            self._data[key] = data
+            self._min_key = None
+
+    def discard(self, key: Hashable) -> None:
+        """Remove key if present"""
+        if key in self._values:
+            del self._values[key]
+            del self._data[key]
+            if key == self._min_key:
+                self._min_key = None
+
+    def top(self, limit: int | None = None) -> list[tuple[Hashable, int, Any]]:
+        """Return up to limit (key, value, data) tuples, highest value first"""
+        ranked = sorted(self._values.items(), key=lambda item: item[1], reverse=True)
+        return [(key, value, self._data[key]) for key, value in ranked[:limit]]
+
+
+def top_slice(
+        items: Iterable[T], key: Callable[[T], int],
+        limit: int | None = None, offset: int = 0) -> list[T]:
+    """Return items ranked by key, highest first, skipping offset and keeping limit
+
+    With a limit only offset + limit items are kept on a heap instead of
+    sorting them all.
+    """
+    if limit is None:
+        return sorted(items, key=key, reverse=True)[offset:]
+    return heapq.nlargest(offset + limit, items, key=key)[offset:]
@@ -0,0 +1,40 @@
+"""Striped locks for per-guild read-modify-write transactions"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Hashable
+
+# Number of locks keys are spread over
+DEFAULT_STRIPES = 64
+
+
+class StripedLock:
+    """A fixed pool of asyncio locks that keys are hashed onto
+
+    Memory stays constant however many keys there are. Keys on different
+    stripes never wait on each other; keys sharing a stripe only lose some
+    concurrency. A task already holding a stripe may take it again, so a
+    transaction can call helpers that lock the same key.
+    """
+
+    def __init__(self, stripes: int = DEFAULT_STRIPES):
+        self._locks = [asyncio.Lock() for _ in range(stripes)]
+        self._owners: list[asyncio.Task | None] = [None] * stripes
+
+    def stripe(self, key: Hashable) -> int:
+        """Return index of the lock guarding key"""
+        return hash(key) % len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        """Hold the lock guarding key for the duration of the block"""
+        index = self.stripe(key)
+        task = asyncio.current_task()
+        if self._owners[index] is task:
+            yield
+            return
+        async with self._locks[index]:
+            self._owners[index] = task
+            try:
+                yield
+            finally:
+                self._owners[index] = None
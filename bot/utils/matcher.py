@@ -0,0 +1,167 @@
+"""Matching of n-words and whitelisted words in a message"""
+from collections import Counter
+from typing import Iterable
+
+# Create the n-word lists from ASCII, so I don't have to type it.
+NWORDS_LIST = [
+    (chr(110) + chr(105) + chr(103) + chr(103) + chr(97)),
+    (chr(47) + chr(92) + chr(47) + chr(105) + chr(103) + chr(103) + chr(97)),
+    (chr(124) + chr(92) + chr(47) + chr(105) + chr(103) + chr(103) + chr(97)),
+    (chr(109) + chr(117) + chr(114) + chr(122) + chr(121) + chr(110)),
+    (chr(99) + chr(122) + chr(97) + chr(114) + chr(110) + chr(117) + chr(99) + chr(104)),
+    (chr(99) + chr(122) + chr(97) + chr(114) + chr(110) + chr(117) + chr(104))
+]
+HARD_RS_LIST = [
+    (chr(110) + chr(105) + chr(103) + chr(103) + chr(101) + chr(114)),
+    (chr(47) + chr(92) + chr(47) + chr(105) + chr(103) + chr(103) + chr(101) +
+     chr(114)),
+    (chr(124) + chr(92) + chr(47) + chr(105) + chr(103) + chr(103) + chr(101) +
+     chr(114))
+]
+# Length of the substrings the prefilter looks for
+ANCHOR_LENGTH = 3
+# Counted plus whitelisted words from which the automaton beats str.count
+AUTOMATON_MIN_PATTERNS = 40
+
+
+def find_anchors(words: Iterable[str], length: int = ANCHOR_LENGTH) -> tuple[str, ...]:
+    """Return a few substrings such that every word contains one of them
+
+    Picks greedily the substring of the given length shared by the most
+    words not yet covered. Words shorter than length are their own anchor.
+    """
+    uncovered = set(words)
+    anchors = []
+    while uncovered:
+        grams = Counter(
+            gram for word in uncovered
+            for gram in {word[i:i + length] for i in range(max(1, len(word) - length + 1))})
+        anchor = max(sorted(grams), key=grams.__getitem__)
+        anchors.append(anchor)
+        uncovered = {word for word in uncovered if anchor not in word}
+    return tuple(anchors)
+
+
+def build_matcher(words: Iterable[str], whitelist: Iterable[str] = ()) -> "LoopMatcher":
+    """Return the faster matcher for lists of this size"""
+    words = list(words)
+    whitelist = list(whitelist)
+    if len(words) + len(whitelist) >= AUTOMATON_MIN_PATTERNS:
+        return Matcher(words, whitelist)
+    return LoopMatcher(words, whitelist)
+
+
+class LoopMatcher:
+    """Counted and whitelisted words, matched one str.count at a time
+
+    Every counted word adds its non-overlapping occurrences, every
+    whitelisted word present in the message takes one off, and the total
+    never goes below zero. Each word costs a pass over the message, but
+    the passes run in C, so for short lists this beats a single pass in
+    Python.
+    """
+
+    def __init__(self, words: Iterable[str], whitelist: Iterable[str] = ()):
+        self._words = tuple(words)
+        self._whitelist = tuple(whitelist)
+        if not all(self._words):
+            raise ValueError("Counted words must not be empty")
+        self._anchors = find_anchors(self._words)
+
+    def might_match(self, text: str) -> bool:
+        """Return False if text cannot contain a counted word
+
+        Looks for the anchors only, a handful of substring searches, so
+        most messages are ruled out without counting.
+        """
+        for anchor in self._anchors:
+            if anchor in text:
+                return True
+        return False
+
+    def count(self, text: str) -> int:
+        """Return counted occurrences minus whitelisted words, at least zero"""
+        total = 0
+        for word in self._whitelist:
+            if word in text:
+                total -= 1
+        for word in self._words:
+            total += text.count(word)
+        return total if total >= 0 else 0
+
+
+class Matcher(LoopMatcher):
+    """Aho-Corasick automaton over the counted words and the whitelist
+
+    count() scans a message once, whatever the number of words, and gives
+    the same result as LoopMatcher. It only pays off for long lists, see
+    build_matcher. The automaton is immutable once built; build a new one
+    to change the words.
+    """
+
+    def __init__(self, words: Iterable[str], whitelist: Iterable[str] = ()):
+        super().__init__(words, whitelist)
+        words = list(self._words)
+        whitelist = list(self._whitelist)
+        # Ids below len(words) are counted words, the rest whitelisted ones.
+        self._counted = len(words)
+        self._lengths = [len(word) for word in words]
+        # An empty whitelisted word is in every message.
+        self._always_excused = whitelist.count("")
+        patterns = words + whitelist
+
+        goto: list[dict[str, int]] = [{}]
+        outputs: list[list[int]] = [[]]
+        for pattern_id, pattern in enumerate(patterns):
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                if char not in goto[state]:
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            outputs[state].append(pattern_id)
+
+        # Follow failure links breadth first, folding each state's fallback
+        # transitions and outputs into it so the scan never backtracks.
+        delta: list[dict[str, int]] = [dict(goto[0])] + [{} for _ in goto[1:]]
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            delta[state] = dict(delta[fail[state]])
+            outputs[state] = outputs[state] + outputs[fail[state]]
+            for char, child in goto[state].items():
+                if state:
+                    fail[child] = delta[fail[state]].get(char, 0)
+                delta[state][char] = child
+                queue.append(child)
+        self._delta = delta
+        self._outputs = [tuple(found) for found in outputs]
+
+    def count(self, text: str) -> int:
+        """Return counted occurrences minus whitelisted words, at least zero"""
+        delta = self._delta
+        outputs = self._outputs
+        lengths = self._lengths
+        counted = self._counted
+        next_start = [0] * counted
+        excused = set()
+        total = -self._always_excused
+        state = 0
+        for end, char in enumerate(text):
+            state = delta[state].get(char, 0)
+            found = outputs[state]
+            if not found:
+                continue
+            for pattern_id in found:
+                if pattern_id < counted:
+                    # str.count resumes after each occurrence it counts.
+                    if end - lengths[pattern_id] >= next_start[pattern_id] - 1:
+                        next_start[pattern_id] = end + 1
+                        total += 1
+                elif pattern_id not in excused:
+                    excused.add(pattern_id)
+                    total -= 1
+        return total if total >= 0 else 0
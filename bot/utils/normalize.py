@@ -0,0 +1,77 @@
+"""Folding of message text before n-word matching
+
+The translation table is built once at import. A message then costs one
+str.translate and one str.lower, however it tries to disguise a word.
+"""
+import string
+import unicodedata
+
+# Characters that render as nothing and can be slipped inside a word
+INVISIBLE = (
+    [0x00AD, 0x034F, 0x061C, 0x115F, 0x1160, 0x17B4, 0x17B5, 0x3164, 0xFEFF, 0xFFA0]
+    + list(range(0x180B, 0x180F))  # Mongolian selectors and vowel separator
+    + list(range(0x200B, 0x2010))  # zero-width space, joiners and marks
+    + list(range(0x202A, 0x202F))  # bidirectional embeddings
+    + list(range(0x2060, 0x2065))  # word joiner and invisible operators
+    + list(range(0x2066, 0x2070))  # bidirectional isolates
+    + list(range(0xFE00, 0xFE10))  # variation selectors
+)
+# Cyrillic and Greek letters drawn like Latin ones
+CONFUSABLES = {
+    "А": "A", "В": "B", "Е": "E", "К": "K", "М": "M", "Н": "H", "О": "O",
+    "Р": "P", "С": "C", "Т": "T", "У": "Y", "Х": "X", "І": "I", "Ј": "J",
+    "Ѕ": "S", "Ү": "Y", "Ԁ": "D", "Ԛ": "Q", "Ԝ": "W",
+    "а": "a", "е": "e", "ё": "e", "о": "o", "р": "p", "с": "c", "у": "y",
+    "х": "x", "і": "i", "ї": "i", "ј": "j", "ѕ": "s", "һ": "h", "ӏ": "l",
+    "ү": "y", "ԁ": "d", "ԛ": "q", "ԝ": "w",
+    "Α": "A", "Β": "B", "Ε": "E", "Ζ": "Z", "Η": "H", "Ι": "I", "Κ": "K",
+    "Μ": "M", "Ν": "N", "Ο": "O", "Ρ": "P", "Τ": "T", "Υ": "Y", "Χ": "X",
+    "α": "a", "ι": "i", "κ": "k", "ν": "v", "ο": "o", "ρ": "p", "υ": "u",
+    "ı": "i", "ɡ": "g", "ɑ": "a",
+}
+# Latin letters whose accent is part of the glyph rather than a combining mark
+STROKED = {"Ł": "L", "ł": "l", "Ø": "O", "ø": "o", "Đ": "D", "đ": "d",
+           "Ħ": "H", "ħ": "h", "Ŧ": "T", "ŧ": "t", "Ɨ": "I", "ɨ": "i"}
+# Ranges holding accented Latin letters
+LATIN_RANGES = (range(0x00C0, 0x0250), range(0x1E00, 0x1F00))
+
+
+def _strip_accents(char: str) -> str | None:
+    """Return the ASCII base of an accented Latin letter, if it has one"""
+    base = "".join(
+        part for part in unicodedata.normalize("NFD", char)
+        if not unicodedata.combining(part))
+    return base if base != char and base.isascii() and len(base) == 1 else None
+
+
+def _build_table() -> dict[int, str | None]:
+    """Return the str.translate table applied to every message"""
+    table: dict[int, str | None] = {}
+    for code in range(0x10000):
+        char = chr(code)
+        if char.isspace() or unicodedata.combining(char):
+            table[code] = None
+    for code in INVISIBLE:
+        table[code] = None
+    for char in string.whitespace:
+        table[ord(char)] = None
+    # Fullwidth forms of printable ASCII sit at a fixed offset from it.
+    for code in range(0xFF01, 0xFF5F):
+        table[code] = chr(code - 0xFEE0)
+    for codes in LATIN_RANGES:
+        for code in codes:
+            base = _strip_accents(chr(code))
+            if base is not None:
+                table[code] = base
+    for char, folded in {**STROKED, **CONFUSABLES}.items():
+        table[ord(char)] = folded
+    return table
+
+
+FOLD_TABLE = _build_table()
+
+
+def normalize(text: str) -> str:
+    """Return text without whitespace or invisible characters, folded to lowercase ASCII look-alikes"""
+    # Folded before lowering so uppercase look-alikes are caught too.
+    return text.translate(FOLD_TABLE).lower()
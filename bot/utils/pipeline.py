@@ -0,0 +1,40 @@
+"""Hit and miss counts for the stages a message passes through"""
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class Stage:
+    """One stage of message ingestion and what it let through"""
+    name: str
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def seen(self) -> int:
+        """Return number of messages that reached this stage"""
+        return self.hits + self.misses
+
+
+class IngestStats:
+    """Ordered ingestion stages, each counting the messages it passes on
+
+    A message that misses a stage goes no further, so each stage sees only
+    the hits of the one before it. Counters are plain integers bumped from
+    the event loop and never reset while the cog is loaded.
+    """
+
+    def __init__(self, *names: str):
+        self._stages = {name: Stage(name) for name in names}
+
+    def record(self, name: str, hit: bool) -> bool:
+        """Count a message at stage name and return hit, to short-circuit on"""
+        stage = self._stages[name]
+        if hit:
+            stage.hits += 1
+        else:
+            stage.misses += 1
+        return hit
+
+    def stages(self) -> list[Stage]:
+        """Return the stages in order"""
+        return list(self._stages.values())
@@ -0,0 +1,191 @@
+"""Order-statistic indexes for ranking members by n-word count"""
+from typing import Hashable, Iterable, Mapping
+
+
+class CountHistogram:
+    """How many keys have each count, with O(log C) updates and rank lookups
+
+    A sparse Fenwick (binary indexed) tree over count values, where C is
+    the largest count seen. Only the number of keys per count is kept, not
+    the keys themselves, so histograms of parts can be merged cheaply.
+    Ranks are competition ranks: 1 plus the number of keys with a strictly
+    higher count, so ties share a rank. Counts below zero, which a negative
+    increment can leave behind, are indexed and ranked as zero.
+    """
+
+    def __init__(self):
+        self._tree: dict[int, int] = {}
+        self._size = 1
+        self._total = 0
+
+    @classmethod
+    def from_counts(cls, counts: Mapping[int, int]) -> "CountHistogram":
+        """Build from keys per count, one tree update per distinct count"""
+        histogram = cls()
+        histogram._fill(counts)
+        return histogram
+
+    def _fill(self, counts: Mapping[int, int]) -> None:
+        """Add keys per count to an empty tree in ascending count order"""
+        merged: dict[int, int] = {}
+        for count, keys in counts.items():
+            count = max(count, 0)
+            merged[count] = merged.get(count, 0) + keys
+        for count in sorted(merged):
+            self.add(count, merged[count])
+
+    def __len__(self) -> int:
+        return self._total
+
+    def add(self, count: int, delta: int = 1) -> None:
+        """Add delta keys with count, negative to remove them"""
+        count = max(count, 0)
+        self._grow(count + 1, self._total)
+        self._add(count, delta)
+        self._total += delta
+
+    def _grow(self, index: int, total: int) -> None:
+        """Double the tree until it covers index, total keys being indexed"""
+        while index > self._size:
+            # Nodes at powers of two cover everything below them.
+            self._size *= 2
+            self._tree[self._size] = total
+
+    def _add(self, count: int, delta: int) -> None:
+        """Add delta to the number of keys with count"""
+        index = count + 1
+        while index <= self._size:
+            self._tree[index] = self._tree.get(index, 0) + delta
+            index += index & -index
+
+    def _count_at_most(self, count: int) -> int:
+        """Return number of keys with a count of at most count"""
+        index = min(count + 1, self._size)
+        total = 0
+        while index > 0:
+            total += self._tree.get(index, 0)
+            index -= index & -index
+        return total
+
+    def _select(self, position: int) -> int:
+        """Return count of the key at 1-based position in ascending order"""
+        index = 0
+        step = self._size
+        while step:
+            node = self._tree.get(index + step, 0)
+            if index + step <= self._size and node < position:
+                index += step
+                position -= node
+            step //= 2
+        return index
+
+    def rank_of_count(self, count: int) -> int:
+        """Return rank a key with count would have"""
+        return self._total - self._count_at_most(max(count, 0)) + 1
+
+
+class RankIndex(CountHistogram):
+    """Ranks keys by count with O(log C) updates and lookups
+
+    A CountHistogram that also remembers each key's count, so keys can be
+    moved, ranked by key and listed around a rank. Keys with the same count
+    share a bucket list, and each key knows its slot in it, so a key leaves
+    its bucket in O(1) and listing around a rank costs O(log C + radius)
+    however many keys tie.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._counts: dict[Hashable, int] = {}
+        self._buckets: dict[int, list[Hashable]] = {}
+        self._slots: dict[Hashable, int] = {}
+
+    @classmethod
+    def from_items(cls, items: Iterable[tuple[Hashable, int]]) -> "RankIndex":
+        """Build from (key, count) pairs, one tree update per distinct count"""
+        index = cls()
+        for key, count in items:
+            count = max(count, 0)
+            if key in index._counts:
+                index._take(key, index._counts[key])
+            index._counts[key] = count
+            index._put(key, count)
+        index._fill({count: len(bucket) for count, bucket in index._buckets.items()})
+        return index
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._counts
+
+    def set(self, key: Hashable, count: int) -> None:
+        """Insert key or move it to a new count"""
+        count = max(count, 0)
+        old = self._counts.get(key)
+        if old == count:
+            return
+        if old is not None:
+            self.discard(key)
+        self._counts[key] = count
+        self._put(key, count)
+        self.add(count)
+
+    def discard(self, key: Hashable) -> None:
+        """Remove key if present"""
+        count = self._counts.pop(key, None)
+        if count is not None:
+            self._remove(key, count)
+
+    def _remove(self, key: Hashable, count: int) -> None:
+        """Take key out of its bucket and the tree"""
+        self._take(key, count)
+        self.add(count, -1)
+
+    def _put(self, key: Hashable, count: int) -> None:
+        """Append key to the bucket of count"""
+        bucket = self._buckets.setdefault(count, [])
+        self._slots[key] = len(bucket)
+        bucket.append(key)
+
+    def _take(self, key: Hashable, count: int) -> None:
+        """Remove key from the bucket of count, moving the last key into its slot"""
+        bucket = self._buckets[count]
+        slot = self._slots.pop(key)
+        last = bucket.pop()
+        if slot < len(bucket):
+            bucket[slot] = last
+            self._slots[last] = slot
+        if not bucket:
+            del self._buckets[count]
+
+    def rank(self, key: Hashable) -> int | None:
+        """Return rank of key, None if it is not indexed"""
+        count = self._counts.get(key)
+        if count is None:
+            return None
+        return self.rank_of_count(count)
+
+    def around(self, rank: int, radius: int = 2) -> list[tuple[int, Hashable, int]]:
+        """Return (rank, key, count) of keys at positions rank +- radius
+
+        Positions are 1-based in descending count order; keys that share a
+        count are listed in bucket order, which is insertion order until a
+        key leaves the bucket.
+        """
+        total = len(self._counts)
+        first = max(1, rank - radius)
+        last = min(total, rank + radius)
+        entries = []
+        position = first
+        while position <= last:
+            # Key at descending position p has ascending position total - p + 1.
+            count = self._select(total - position + 1)
+            higher = total - self._count_at_most(count)
+            bucket = self._buckets[count]
+            offset = position - higher - 1
+            take = min(len(bucket) - offset, last - position + 1)
+            for key in bucket[offset:offset + take]:
+                entries.append((higher + 1, key, count))
+            position += take
+        return entries
@@ -0,0 +1,67 @@
+"""Immutable views of aggregate stats served to read-only commands"""
+import time
+import asyncio
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Awaitable, Callable, Generic, Mapping, TypeVar
+
+
+def freeze(entries: list[dict]) -> tuple[Mapping, ...]:
+    """Return leaderboard entries as a tuple of read-only mappings"""
+    return tuple(MappingProxyType(entry) for entry in entries)
+
+
+@dataclass(frozen=True, slots=True)
+class GlobalView:
+    """Global totals and leaderboards as of one moment"""
+    version: int
+    taken_at: float
+    nword_count: int
+    total_documents: int
+    top_members: tuple[Mapping, ...]
+    top_guilds: tuple[Mapping, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class GuildView:
+    """A guild's total and leaderboard as of one moment"""
+    version: int
+    taken_at: float
+    nword_count: int
+    top_members: tuple[Mapping, ...]
+
+
+View = TypeVar("View", GlobalView, GuildView)
+
+
+class ViewCache(Generic[View]):
+    """Hands out the latest view, rebuilding it at most once per interval
+
+    A view is reused while the data version it was built from is current,
+    or while it is younger than interval seconds. Readers that find it
+    stale share a single rebuild, so a burst of commands costs one query.
+    """
+
+    def __init__(self, build: Callable[[int], Awaitable[View]], interval: float):
+        self._build = build
+        self.interval = interval
+        self._view: View | None = None
+        self._rebuild: asyncio.Future | None = None
+
+    def is_fresh(self, version: int) -> bool:
+        """Return True if the cached view may be served for version"""
+        view = self._view
+        return view is not None and (
+            view.version == version or time.monotonic() - view.taken_at < self.interval)
+
+    async def get(self, version: int) -> View:
+        """Return a view that is fresh for version"""
+        if self.is_fresh(version):
+            return self._view
+        if self._rebuild is None or self._rebuild.done():
+            self._rebuild = asyncio.ensure_future(self._build(version))
+        # A cancelled reader must not cancel the rebuild others wait for.
+        view = await asyncio.shield(self._rebuild)
+        if self._view is None or view.taken_at > self._view.taken_at:
+            self._view = view
+        return self._view
@@ -0,0 +1,146 @@
+"""Storage backend interface used by the Database utility class"""
+from abc import ABC, abstractmethod
+
+
+class StorageBackend(ABC):
+    """Interface every database storage backend implements
+
+    Member records are returned as dicts with the keys ``id``, ``name``,
+    ``nword_count``, ``is_black``, ``has_pass``, ``passes`` and ``voters``.
+    ``voters`` is a set of voter ids that callers must not modify.
+    """
+    name: str = ""
+    # What the next start recovers if close() is cut short after drain()
+    recovery: str = "writes made durable by drain() are kept"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @abstractmethod
+    async def load(self) -> None:
+        """Open the store, called once before any other method"""
+
+    @abstractmethod
+    async def maintenance(self) -> None:
+        """Periodic housekeeping, cheap when there is nothing to do"""
+
+    @abstractmethod
+    async def flush(self) -> None:
+        """Persist everything written so far"""
+
+    @abstractmethod
+    async def drain(self) -> None:
+        """Make everything written so far durable the cheapest way possible"""
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Persist everything and release resources"""
+
+    @abstractmethod
+    async def guild_exists(self, guild_id: int) -> bool:
+        """Return True if guild is recorded"""
+
+    @abstractmethod
+    async def create_guild(self, guild_id: int, guild_name: str) -> bool:
+        """Create guild if missing, return True if it was created"""
+
+    @abstractmethod
+    async def update_guilds(self) -> None:
+        """Give every guild a settings field"""
+
+    @abstractmethod
+    async def get_settings(self, guild_id: int) -> list:
+        """Return guild settings list"""
+
+    @abstractmethod
+    async def set_settings(self, guild_id: int, settings: list) -> None:
+        """Replace guild settings list"""
+
+    @abstractmethod
+    async def get_member(self, guild_id: int, member_id: int) -> dict | None:
+        """Return member record"""
+
+    @abstractmethod
+    async def create_member(self, guild_id: int, member_id: int, member_name: str) -> None:
+        """Create member in an existing guild if missing"""
+
+    @abstractmethod
+    async def record_message(
+        self, guild_id: int, guild_name: str, member_id: int, member_name: str
+    ) -> tuple[dict, list]:
+        """Create guild and member if missing, return member and guild settings"""
+
+    @abstractmethod
+    async def apply_increments(self, deltas: list[tuple[int, int, int]]) -> None:
+        """Add (guild id, member id, count) deltas to n-word counts"""
+
+    @abstractmethod
+    async def increment_passes(self, guild_id: int, member_id: int, count: int) -> None:
+        """Add to member's passes"""
+
+    @abstractmethod
+    async def cast_vote(
+        self, type: str, guild_id: int, vote_threshold: int,
+        voter_id: int, votee_id: int
+    ) -> dict | None:
+        """Add or remove a vote and return the votee's member record"""
+
+    @abstractmethod
+    async def purge_votes(self, guild_id: int, voter_id: int, vote_threshold: int) -> int:
+        """Remove every vote voter_id cast in a guild, return how many"""
+
+    @abstractmethod
+    async def get_total_documents(self) -> int:
+        """Return number of guilds"""
+
+    @abstractmethod
+    async def get_guild_total(self, guild_id: int) -> int:
+        """Return sum of n-word counts in a guild"""
+
+    @abstractmethod
+    async def get_member_count(self, guild_id: int) -> int:
+        """Return number of members recorded in a guild"""
+
+    @abstractmethod
+    async def get_global_total(self) -> int:
+        """Return sum of n-word counts in all guilds"""
+
+    @abstractmethod
+    async def get_member_rank(self, guild_id: int, member_id: int) -> int | None:
+        """Return member's n-word rank within the guild, None if not recorded"""
+
+    @abstractmethod
+    async def get_global_rank(self, guild_id: int, member_id: int) -> int | None:
+        """Return member's n-word rank among members of all guilds"""
+
+    @abstractmethod
+    async def get_members_around_rank(self, guild_id: int, rank: int, radius: int) -> list:
+        """Return guild members at positions rank - radius to rank + radius
+
+        Entries are dicts with ``rank``, ``name`` and ``nword_count``.
+        """
+
+    @abstractmethod
+    async def check_aggregates(self) -> bool:
+        """Recompute maintained totals from member records
+
+        Returns True if the maintained totals already matched.
+        """
+
+    @abstractmethod
+    async def get_all_time_servers(self, limit: int) -> list:
+        """Return top guilds by n-word count"""
+
+    @abstractmethod
+    async def get_all_time_counts(self, limit: int) -> list:
+        """Return top members by n-word count out of all guilds"""
+
+    @abstractmethod
+    async def get_member_list(
+            self, guild_id: int, limit: int | None = None, offset: int = 0,
+            is_black: bool | None = None, has_pass: bool | None = None) -> list:
+        """Return guild members ranked by n-word count
+
+        Skips the first offset members and returns at most limit. is_black
+        and has_pass, when given, keep only members with that flag value.
+        """
@@ -0,0 +1,854 @@
+"""JSON file storage backend kept resident in memory with an append-only journal"""
+import os
+import copy
+import logging
+import json
+import struct
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.leaderboard import TopK, LEADERBOARD_SIZE, top_slice
+from utils.ranking import RankIndex
+from utils.storage import snapshot
+from utils.storage.base import StorageBackend
+from utils.storage.records import new_guild, MemberRecord, update_voters, FLAGS
+
+# Default database structure
+DEFAULT_DB = {"guilds": []}
+
+# Journal size in bytes after which it is folded into a new snapshot
+DEFAULT_COMPACT_THRESHOLD = 1024 * 1024
+
+# Previous snapshots (and the journals written after them) kept for recovery
+DEFAULT_SNAPSHOT_KEEP = 3
+
+
+class JSONStorage(StorageBackend):
+    """JSON file storage
+
+    The database file is loaded once and kept resident in memory, members
+    as slotted MemberRecord objects with voter sets stored apart, next to a
+    reverse index of the votes each user cast and, per guild, the ids of
+    members having each flag (is_black, has_pass). Reads are served from
+    memory. Every change is applied in memory and appended as a
+    small record to a journal next to the snapshot; the journal is folded
+    into a new snapshot (compacted) in the background and on close, and
+    replayed on top of the snapshot at startup.
+
+    Per-guild and global n-word totals are computed once at load and kept
+    up to date as changes are applied, so totals never rescan members. The
+    same goes for the top members of every guild and the global top
+    members and guilds, which serve leaderboards without sorting, and for
+    the rank indexes answering a member's position in its guild and
+    globally.
+
+    Snapshots are written as compact JSON or in the binary format of
+    utils.storage.snapshot to a temporary file that is fsynced and renamed
+    over the previous one, so a crash never leaves a half-written snapshot.
+    The last snapshot_keep snapshots and the journals written after each are
+    kept as <file>.1, <file>.2, ...; startup reads the newest snapshot that
+    decodes and replays every journal on top of it.
+
+    A snapshot reuses the copy and the encoded bytes of every guild that did
+    not change since the previous one, so taking it on the event loop costs
+    in proportion to the guilds changed, and writers never wait for disk.
+
+    Disk reads, serialization and writes run on a single dedicated I/O
+    thread so the event loop never blocks on disk. The thread runs jobs in
+    submission order, which keeps journal appends and snapshots ordered.
+    """
+    name = "json"
+    recovery = "the journal will be replayed on the next start"
+
+    def __init__(self, path: str, compact_threshold: int = DEFAULT_COMPACT_THRESHOLD,
+                 snapshot_format: str = "json", fast_json: bool = False,
+                 snapshot_keep: int = DEFAULT_SNAPSHOT_KEEP):
+        super().__init__(path)
+        base_path = os.path.splitext(path)[0]
+        self.journal_path = base_path + ".journal"
+        self.snapshot_paths = {
+            format: base_path + extension
+            for format, extension in snapshot.EXTENSIONS.items()
+        }
+        self.snapshot_path = self.snapshot_paths[snapshot_format]
+        self.snapshot_format = snapshot_format
+        self.fast_json = fast_json
+        if fast_json and snapshot.orjson is None:
+            logging.warning("orjson is not installed, using the standard json module")
+        self.compact_threshold = compact_threshold
+        self.snapshot_keep = snapshot_keep
+        self._lock = asyncio.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="database-io")
+        self._data: dict | None = None
+        self._guild_index: dict[int, dict] = {}
+        self._member_index: dict[tuple[int, int], MemberRecord] = {}
+        self._voters: dict[tuple[int, int], set[int]] = {}
+        self._votes_cast: dict[tuple[int, int], set[int]] = {}
+        self._flagged: dict[str, dict[int, set[int]]] = {flag: {} for flag in FLAGS}
+        self._guild_totals: dict[int, int] = {}
+        self._global_total = 0
+        self._top_members = TopK(LEADERBOARD_SIZE)
+        self._top_guilds = TopK(LEADERBOARD_SIZE)
+        self._guild_top_members: dict[int, TopK] = {}
+        self._leaderboards_stale = False
+        self._guild_ranks: dict[int, RankIndex] = {}
+        self._global_ranks = RankIndex()
+        self._journal_file = None
+        self._journal_buffer: list[str] = []
+        self._journal_write_scheduled = False
+        self._journal_seq = 0
+        self._journal_bytes = 0
+        self._guild_copies: dict[int, dict] = {}
+        self._dirty_guilds: set[int] = set()
+        # Encoded guild fragments by guild id, only touched by the I/O thread
+        self._fragments: dict[int, tuple[dict, bytes]] = {}
+
+    @staticmethod
+    def _rotated_paths(path: str, keep: int) -> list[str]:
+        """Return path followed by its rotated copies, newest first"""
+        return [path] + [f"{path}.{i}" for i in range(1, keep + 1)]
+
+    def _rotate(self, path: str) -> None:
+        """Shift path to path.1, path.1 to path.2, ... dropping the oldest"""
+        if not self.snapshot_keep:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        paths = self._rotated_paths(path, self.snapshot_keep)
+        for newer, older in reversed(list(zip(paths, paths[1:]))):
+            if os.path.exists(newer):
+                os.replace(newer, older)
+
+    def _load_database(self) -> tuple[dict, int]:
+        """Load database from the newest snapshot file that decodes
+
+        A truncated or corrupt snapshot is skipped in favour of the next
+        newest one, of any format, including rotated snapshots. Returns the
+        database and how many rotations old its snapshot is.
+        """
+        candidates = [
+            (candidate, rotation)
+            for path in self.snapshot_paths.values()
+            for rotation, candidate in enumerate(self._rotated_paths(path, self.snapshot_keep))
+            if os.path.exists(candidate)
+        ]
+        if not candidates:
+            return copy.deepcopy(DEFAULT_DB), 0
+        # Stable sort keeps the live snapshot ahead of a rotated one on ties.
+        candidates.sort(key=lambda candidate: os.path.getmtime(candidate[0]), reverse=True)
+        for path, rotation in candidates:
+            try:
+                with open(path, 'rb') as f:
+                    data = snapshot.decode(f.read(), self.fast_json)
+            except (ValueError, struct.error) as e:
+                logging.error(f"Failed to decode {path}: {e}")
+                continue
+            if rotation:
+                logging.warning(f"Recovered database from {path}")
+            return data, rotation
+        # Starting empty would overwrite every count on the next snapshot.
+        raise RuntimeError("No readable database snapshot among "
+                           + ", ".join(path for path, _ in candidates))
+
+    def _save_database(self, data: dict) -> None:
+        """Atomically replace the snapshot file, rotating the previous ones"""
+        fragments = [self._encode_guild(guild) for guild in data["guilds"]]
+        temp_path = self.snapshot_path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            f.writelines(snapshot.assemble(fragments, self.snapshot_format, data["journal_seq"]))
+            f.flush()
+            os.fsync(f.fileno())
+        # Without rotated copies the old snapshot must stay until replaced.
+        if self.snapshot_keep:
+            self._rotate(self.snapshot_path)
+        os.replace(temp_path, self.snapshot_path)
+        self._fsync_directory()
+
+    def _encode_guild(self, guild: dict) -> bytes:
+        """Encode a guild copy, reusing the bytes of an unchanged guild"""
+        cached = self._fragments.get(guild["guild_id"])
+        if cached is not None and cached[0] is guild:
+            return cached[1]
+        fragment = snapshot.encode_guild(guild, self.snapshot_format, self.fast_json)
+        self._fragments[guild["guild_id"]] = (guild, fragment)
+        return fragment
+
+    def _fsync_directory(self) -> None:
+        """Persist renames in the snapshot directory (POSIX only)"""
+        if os.name != "posix":
+            return
+        fd = os.open(os.path.dirname(os.path.abspath(self.snapshot_path)), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _load_journal(self, rotation: int = 0) -> list[dict]:
+        """Load records written after a snapshot rotation snapshots old, oldest first
+
+        Those are the records of the journal live now and of the rotated
+        journals back to the one started with that snapshot.
+        """
+        records = []
+        for path in reversed(self._rotated_paths(self.journal_path, rotation)):
+            if os.path.exists(path):
+                records += self._read_journal(path)
+        return records
+
+    @staticmethod
+    def _read_journal(path: str) -> list[dict]:
+        """Load the records of one journal file"""
+        records = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A crash mid-append leaves a partial last record.
+                    logging.warning(f"Ignoring truncated record in {path}")
+                    break
+        return records
+
+    def _write_journal(self, lines: list[str]) -> None:
+        """Append a batch of records to the journal file (I/O thread)"""
+        try:
+            if self._journal_file is None:
+                self._journal_file = open(self.journal_path, 'a', encoding='utf-8')
+            self._journal_file.writelines(lines)
+            self._journal_file.flush()
+        except Exception as e:
+            logging.error(f"Failed to append to journal: {e}")
+
+    def _save_snapshot(self, snapshot: dict) -> None:
+        """Write snapshot and retire the journal it supersedes (I/O thread)"""
+        try:
+            self._save_database(snapshot)
+        except Exception as e:
+            # Keep the journal, it still holds the changes the snapshot lacks.
+            logging.error(f"Failed to save database: {e}")
+            return
+
+        # Records up to journal_seq are now in the snapshot; the journal is
+        # kept next to the previous snapshot for recovering from it.
+        self._close_journal()
+        self._rotate(self.journal_path)
+
+    def _close_journal(self) -> None:
+        """Close the journal file handle if open"""
+        if self._journal_file is not None:
+            self._journal_file.close()
+            self._journal_file = None
+
+    def _append_journal(self, record: dict) -> None:
+        """Queue a record for the next batched journal write"""
+        line = json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n"
+        self._journal_buffer.append(line)
+        self._journal_bytes += len(line)
+        if not self._journal_write_scheduled:
+            # Batch every record committed in this loop iteration.
+            self._journal_write_scheduled = True
+            asyncio.get_running_loop().call_soon(self._submit_journal_writes)
+
+    def _submit_journal_writes(self) -> None:
+        """Hand buffered journal records to the I/O thread"""
+        self._journal_write_scheduled = False
+        if not self._journal_buffer:
+            return
+        lines, self._journal_buffer = self._journal_buffer, []
+        self._executor.submit(self._write_journal, lines)
+
+    async def _run_io(self, func, *args):
+        """Run blocking disk work on the I/O thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def _wait_for_io(self) -> None:
+        """Wait until every committed change has reached the journal on disk"""
+        self._submit_journal_writes()
+        await self._run_io(lambda: None)
+
+    async def load(self) -> None:
+        """Load the snapshot and replay the journal, once"""
+        if self._data is not None:
+            return
+        async with self._lock:
+            if self._data is None:
+                data, rotation = await self._run_io(self._load_database)
+                records = await self._run_io(self._load_journal, rotation)
+                self._build_indexes(data)
+                self._data = data
+                self._journal_seq = data.get("journal_seq", 0)
+                self._replay_journal(records)
+
+    def _replay_journal(self, records: list[dict]) -> None:
+        """Apply journal records that are newer than the loaded snapshot"""
+        replayed = 0
+        for record in records:
+            if record["seq"] <= self._journal_seq:
+                continue  # Already folded into the snapshot.
+            self._apply(record)
+            self._journal_seq = record["seq"]
+            replayed += 1
+        if replayed:
+            logging.info(f"Replayed {replayed} journal records")
+
+    def _build_indexes(self, data: dict) -> None:
+        """Convert members to records and index guilds and members by id"""
+        self._guild_index = {}
+        self._member_index = {}
+        self._voters = {}
+        self._votes_cast = {}
+        self._flagged = {flag: {} for flag in FLAGS}
+        for guild in data.get("guilds", []):
+            self._guild_index[guild["guild_id"]] = guild
+            records = []
+            for member in guild.get("members", []):
+                record = MemberRecord.from_dict(member)
+                records.append(record)
+                self._member_index[(guild["guild_id"], record.id)] = record
+                self._index_flags(guild["guild_id"], record)
+                if member.get("voters"):
+                    self._voters[(guild["guild_id"], record.id)] = set(member["voters"])
+                    for voter_id in member["voters"]:
+                        self._votes_cast.setdefault(
+                            (guild["guild_id"], voter_id), set()).add(record.id)
+            guild["members"] = records
+        self._guild_totals, self._global_total = self._compute_totals(data)
+        self._build_leaderboards(data)
+        self._build_ranks(data)
+
+    def _build_ranks(self, data: dict) -> None:
+        """Build per-guild and global rank indexes"""
+        self._guild_ranks = {
+            guild["guild_id"]: RankIndex.from_items(
+                (member.id, member.nword_count)
+                for member in guild.get("members", []))
+            for guild in data.get("guilds", [])
+        }
+        self._global_ranks = RankIndex.from_items(
+            ((guild_id, member_id), member.nword_count)
+            for (guild_id, member_id), member in self._member_index.items())
+
+    def _build_leaderboards(self, data: dict) -> None:
+        """Build top member and top guild leaderboards from scratch"""
+        self._top_members.rebuild(
+            ((guild["guild_id"], member.id), member.nword_count, member)
+            for guild in data.get("guilds", [])
+            for member in guild.get("members", [])
+        )
+        self._top_guilds.rebuild(
+            (guild["guild_id"], self._guild_totals[guild["guild_id"]], guild)
+            for guild in data.get("guilds", [])
+        )
+        self._guild_top_members = {
+            guild["guild_id"]: TopK.from_items(LEADERBOARD_SIZE, (
+                (member.id, member.nword_count, member)
+                for member in guild.get("members", [])
+            ))
+            for guild in data.get("guilds", [])
+        }
+        self._leaderboards_stale = False
+
+    def _get_leaderboards(self) -> None:
+        """Rebuild leaderboards if a count went down since the last build"""
+        if self._leaderboards_stale:
+            self._build_leaderboards(self._data)
+
+    @staticmethod
+    def _compute_totals(data: dict) -> tuple[dict[int, int], int]:
+        """Sum n-word counts per guild and over all guilds"""
+        guild_totals = {
+            guild["guild_id"]: sum(
+                member.nword_count for member in guild.get("members", []))
+            for guild in data.get("guilds", [])
+        }
+        return guild_totals, sum(guild_totals.values())
+
+    def _add_nwords(self, guild_id: int, member: MemberRecord, count: int) -> None:
+        """Add to a member's n-word count, the running totals and leaderboards"""
+        member.nword_count += count
+        self._guild_totals[guild_id] += count
+        self._global_total += count
+        self._guild_ranks[guild_id].set(member.id, member.nword_count)
+        self._global_ranks.set((guild_id, member.id), member.nword_count)
+        if count < 0:
+            # Leaderboards only follow growing counts.
+            self._leaderboards_stale = True
+            return
+        self._top_members.update((guild_id, member.id), member.nword_count, member)
+        self._guild_top_members[guild_id].update(member.id, member.nword_count, member)
+        self._top_guilds.update(
+            guild_id, self._guild_totals[guild_id], self._guild_index[guild_id])
+
+    async def _get_guild(self, guild_id: int) -> dict | None:
+        """Return guild record by id"""
+        await self.load()
+        return self._guild_index.get(guild_id)
+
+    async def _get_member(self, guild_id: int, member_id: int) -> MemberRecord | None:
+        """Return member record by guild id and member id"""
+        await self.load()
+        return self._member_index.get((guild_id, member_id))
+
+    def _apply(self, record: dict):
+        """Apply a journal record to the resident database"""
+        op = record["op"]
+        if op == "create_guild":
+            if record["guild_id"] in self._guild_index:
+                return None
+            guild = new_guild(record["guild_id"], record["guild_name"])
+            self._data.setdefault("guilds", []).append(guild)
+            self._guild_index[record["guild_id"]] = guild
+            self._guild_totals[record["guild_id"]] = 0
+            self._guild_top_members[record["guild_id"]] = TopK(LEADERBOARD_SIZE)
+            self._guild_ranks[record["guild_id"]] = RankIndex()
+            self._top_guilds.update(record["guild_id"], 0, guild)
+            return guild
+
+        if op == "update_guilds":
+            for guild in self._data.get("guilds", []):
+                if "settings" not in guild:
+                    guild["settings"] = []
+            return None
+
+        if op == "settings":
+            guild = self._guild_index.get(record["guild_id"])
+            if guild is not None:
+                guild["settings"] = record["settings"]
+            return guild
+
+        if op == "create_member":
+            if (record["guild_id"], record["member_id"]) in self._member_index:
+                return None
+            return self._insert_member(
+                record["guild_id"], record["member_id"], record["name"])
+
+        if op == "record_message":
+            if record["guild_id"] not in self._guild_index:
+                self._apply({
+                    "op": "create_guild",
+                    "guild_id": record["guild_id"],
+                    "guild_name": record["guild_name"]
+                })
+            member = self._member_index.get((record["guild_id"], record["member_id"]))
+            if member is None:
+                member = self._insert_member(
+                    record["guild_id"], record["member_id"], record["member_name"])
+            self._add_nwords(record["guild_id"], member, record.get("count", 0))
+            return member
+
+        if op == "purge_votes":
+            return self._purge_votes(
+                record["guild_id"], record["voter_id"], record["threshold"])
+
+        if op == "increments":
+            for guild_id, member_id, count in record["deltas"]:
+                member = self._member_index.get((guild_id, member_id))
+                if member is not None:
+                    self._add_nwords(guild_id, member, count)
+            return None
+
+        member = self._member_index.get((record["guild_id"], record["member_id"]))
+        if member is None:
+            return None
+
+        if op == "increment" and record["field"] == "nword_count":
+            self._add_nwords(record["guild_id"], member, record["count"])
+        elif op == "increment":
+            setattr(member, record["field"], getattr(member, record["field"]) + record["count"])
+            self._index_flags(record["guild_id"], member)
+        elif op == "vote":
+            self._vote(
+                record["guild_id"], member, record["type"],
+                record["voter_id"], record["threshold"])
+        else:
+            raise ValueError(f"Unknown journal operation {op}")
+        return member
+
+    def _vote(
+            self, guild_id: int, member: MemberRecord, type: str,
+            voter_id: int, vote_threshold: int) -> None:
+        """Add or remove a vote, keeping the voter's reverse index in step"""
+        key = (guild_id, member.id)
+        voters = self._voters.setdefault(key, set())
+        member.is_black = update_voters(voters, type, voter_id, vote_threshold)
+        if not voters:
+            del self._voters[key]
+        self._index_flags(guild_id, member)
+
+        cast_key = (guild_id, voter_id)
+        votees = self._votes_cast.setdefault(cast_key, set())
+        if type == "vote":
+            votees.add(member.id)
+        else:
+            votees.discard(member.id)
+        if not votees:
+            del self._votes_cast[cast_key]
+
+    def _purge_votes(self, guild_id: int, voter_id: int, vote_threshold: int) -> int:
+        """Remove every vote voter_id cast in a guild, return how many"""
+        votees = list(self._votes_cast.get((guild_id, voter_id), ()))
+        for member_id in votees:
+            self._vote(
+                guild_id, self._member_index[(guild_id, member_id)], "unvote",
+                voter_id, vote_threshold)
+        return len(votees)
+
+    def _index_flags(self, guild_id: int, member: MemberRecord) -> None:
+        """Add or remove a member in its guild's index of each flag"""
+        for flag in FLAGS:
+            if getattr(member, flag):
+                self._flagged[flag].setdefault(guild_id, set()).add(member.id)
+            elif member.id in self._flagged[flag].get(guild_id, ()):
+                self._flagged[flag][guild_id].discard(member.id)
+
+    def _filter_members(
+            self, guild_id: int, is_black: bool | None,
+            has_pass: bool | None) -> list[MemberRecord]:
+        """Return guild members with the given flag values
+
+        When a flag is required to be set only the members in its index are
+        looked at, which are few compared to the guild.
+        """
+        wanted = {flag: value for flag, value in zip(FLAGS, (is_black, has_pass))
+                  if value is not None}
+        indexed = [self._flagged[flag].get(guild_id, set()) for flag, value in wanted.items() if value]
+        if indexed:
+            candidates = (
+                self._member_index[(guild_id, member_id)] for member_id in min(indexed, key=len))
+        else:
+            candidates = self._guild_index[guild_id].get("members", [])
+        return [
+            member for member in candidates
+            if all(getattr(member, flag) == value for flag, value in wanted.items())
+        ]
+
+    def _insert_member(
+            self, guild_id: int, member_id: int, member_name: str) -> MemberRecord | None:
+        """Add a new member record to a guild and index it"""
+        guild = self._guild_index.get(guild_id)
+        if guild is None:
+            return None
+        member = MemberRecord(member_id, member_name)
+        guild.setdefault("members", []).append(member)
+        self._member_index[(guild_id, member_id)] = member
+        self._top_members.update((guild_id, member_id), 0, member)
+        self._guild_top_members[guild_id].update(member_id, 0, member)
+        self._guild_ranks[guild_id].set(member_id, 0)
+        self._global_ranks.set((guild_id, member_id), 0)
+        return member
+
+    def _member_dict(self, guild_id: int, member: MemberRecord | None) -> dict | None:
+        """Return a member record as the dict handed out to callers"""
+        if member is None:
+            return None
+        return member.to_dict(self._voters.get((guild_id, member.id)) or set())
+
+    def _guild_dict(self, guild: dict) -> dict:
+        """Return a copy of a guild with members converted back to dicts"""
+        guild_copy = dict(guild)
+        guild_copy["members"] = [
+            member.to_dict(sorted(self._voters.get((guild["guild_id"], member.id), ())))
+            for member in guild.get("members", [])
+        ]
+        guild_copy["settings"] = [dict(setting) for setting in guild.get("settings", [])]
+        return guild_copy
+
+    def _snapshot_copy(self) -> dict:
+        """Return a private copy of the database for the I/O thread to serialize
+
+        Guild copies are never modified once made, so the copy of a guild
+        that did not change since the last snapshot is handed out again.
+        """
+        guilds = []
+        for guild in self._data.get("guilds", []):
+            guild_copy = self._guild_copies.get(guild["guild_id"])
+            if guild_copy is None or guild["guild_id"] in self._dirty_guilds:
+                guild_copy = self._guild_copies[guild["guild_id"]] = self._guild_dict(guild)
+            guilds.append(guild_copy)
+        self._dirty_guilds.clear()
+        return {"guilds": guilds, "journal_seq": self._journal_seq}
+
+    def _mark_dirty(self, record: dict) -> None:
+        """Note the guilds a journal record changed for the next snapshot"""
+        if "guild_id" in record:
+            self._dirty_guilds.add(record["guild_id"])
+        elif record["op"] == "increments":
+            self._dirty_guilds.update(guild_id for guild_id, _, _ in record["deltas"])
+        else:
+            # update_guilds touches every guild.
+            self._guild_copies.clear()
+
+    async def _commit(self, record: dict):
+        """Apply a change to the resident database and journal it"""
+        await self.load()
+        self._journal_seq += 1
+        record["seq"] = self._journal_seq
+        result = self._apply(record)
+        self._mark_dirty(record)
+        self._append_journal(record)
+        return result
+
+    async def maintenance(self) -> None:
+        """Compact the journal once it grows past the threshold"""
+        if self._journal_bytes >= self.compact_threshold:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Fold the journal into a new snapshot and start an empty journal"""
+        async with self._lock:
+            if self._data is None or self._data.get("journal_seq", 0) == self._journal_seq:
+                return
+            # Queue pending records before the snapshot so the I/O thread
+            # never deletes records that the snapshot does not contain.
+            self._submit_journal_writes()
+            snapshot = self._snapshot_copy()
+            self._data["journal_seq"] = self._journal_seq
+            self._journal_bytes = 0
+            await self._run_io(self._save_snapshot, snapshot)
+
+    async def drain(self) -> None:
+        """Wait for the journal to reach disk, without compacting it"""
+        await self._wait_for_io()
+
+    async def close(self) -> None:
+        """Compact the journal, close files and stop the I/O thread"""
+        await self.flush()
+        await self._wait_for_io()
+        await self._run_io(self._close_journal)
+        self._executor.shutdown()
+        self._data = None
+
+    async def guild_exists(self, guild_id: int) -> bool:
+        return await self._get_guild(guild_id) is not None
+
+    async def create_guild(self, guild_id: int, guild_name: str) -> bool:
+        if await self._get_guild(guild_id) is not None:
+            return False
+        await self._commit({
+            "op": "create_guild",
+            "guild_id": guild_id,
+            "guild_name": guild_name
+        })
+        return True
+
+    async def update_guilds(self) -> None:
+        await self._commit({"op": "update_guilds"})
+
+    async def get_settings(self, guild_id: int) -> list:
+        guild = await self._get_guild(guild_id)
+        if guild is None:
+            return []
+        return guild.get("settings", [])
+
+    async def set_settings(self, guild_id: int, settings: list) -> None:
+        if await self._get_guild(guild_id) is None:
+            return
+        await self._commit({
+            "op": "settings",
+            "guild_id": guild_id,
+            "settings": settings
+        })
+
+    async def get_member(self, guild_id: int, member_id: int) -> dict | None:
+        return self._member_dict(guild_id, await self._get_member(guild_id, member_id))
+
+    async def create_member(self, guild_id: int, member_id: int, member_name: str) -> None:
+        if await self._get_guild(guild_id) is None:
+            return
+        if await self._get_member(guild_id, member_id) is not None:
+            return
+        await self._commit({
+            "op": "create_member",
+            "guild_id": guild_id,
+            "member_id": member_id,
+            "name": member_name
+        })
+
+    async def record_message(
+        self, guild_id: int, guild_name: str, member_id: int, member_name: str
+    ) -> tuple[dict, list]:
+        member = await self._get_member(guild_id, member_id)
+        if member is None:
+            # First message from this member, create records in one go.
+            member = await self._commit({
+                "op": "record_message",
+                "guild_id": guild_id,
+                "guild_name": guild_name,
+                "member_id": member_id,
+                "member_name": member_name
+            })
+        return (
+            self._member_dict(guild_id, member),
+            self._guild_index[guild_id].get("settings", [])
+        )
+
+    async def apply_increments(self, deltas: list[tuple[int, int, int]]) -> None:
+        await self._commit({
+            "op": "increments",
+            "deltas": [list(delta) for delta in deltas]
+        })
+
+    async def increment_passes(self, guild_id: int, member_id: int, count: int) -> None:
+        if await self._get_member(guild_id, member_id) is None:
+            return
+        await self._commit({
+            "op": "increment",
+            "guild_id": guild_id,
+            "member_id": member_id,
+            "field": "passes",
+            "count": count
+        })
+
+    async def cast_vote(
+        self, type: str, guild_id: int, vote_threshold: int,
+        voter_id: int, votee_id: int
+    ) -> dict | None:
+        if await self._get_member(guild_id, votee_id) is None:
+            return None
+        member = await self._commit({
+            "op": "vote",
+            "guild_id": guild_id,
+            "member_id": votee_id,
+            "voter_id": voter_id,
+            "type": type,
+            "threshold": vote_threshold
+        })
+        return self._member_dict(guild_id, member)
+
+    async def purge_votes(self, guild_id: int, voter_id: int, vote_threshold: int) -> int:
+        await self.load()
+        if (guild_id, voter_id) not in self._votes_cast:
+            return 0
+        return await self._commit({
+            "op": "purge_votes",
+            "guild_id": guild_id,
+            "voter_id": voter_id,
+            "threshold": vote_threshold
+        })
+
+    async def get_total_documents(self) -> int:
+        await self.load()
+        return len(self._data.get("guilds", []))
+
+    async def get_guild_total(self, guild_id: int) -> int:
+        await self.load()
+        return self._guild_totals.get(guild_id, 0)
+
+    async def get_member_count(self, guild_id: int) -> int:
+        guild = await self._get_guild(guild_id)
+        if guild is None:
+            return 0
+        return len(guild.get("members", []))
+
+    async def get_global_total(self) -> int:
+        await self.load()
+        return self._global_total
+
+    async def check_aggregates(self) -> bool:
+        await self.load()
+        guild_totals, global_total = self._compute_totals(self._data)
+        consistent = (
+            guild_totals == self._guild_totals and global_total == self._global_total)
+        self._guild_totals, self._global_total = guild_totals, global_total
+        self._build_leaderboards(self._data)
+        self._build_ranks(self._data)
+        return consistent
+
+    async def get_member_rank(self, guild_id: int, member_id: int) -> int | None:
+        await self.load()
+        ranks = self._guild_ranks.get(guild_id)
+        return ranks.rank(member_id) if ranks is not None else None
+
+    async def get_global_rank(self, guild_id: int, member_id: int) -> int | None:
+        await self.load()
+        return self._global_ranks.rank((guild_id, member_id))
+
+    async def get_members_around_rank(self, guild_id: int, rank: int, radius: int) -> list:
+        await self.load()
+        ranks = self._guild_ranks.get(guild_id)
+        if ranks is None:
+            return []
+        entries = []
+        for member_rank, member_id, _ in ranks.around(rank, radius):
+            # The index ranks negative counts as zero, report the real one.
+            record = self._member_index[(guild_id, member_id)]
+            entries.append({
+                "rank": member_rank,
+                "name": record.name,
+                "nword_count": record.nword_count
+            })
+        return entries
+
+    async def get_all_time_servers(self, limit: int) -> list:
+        await self.load()
+        self._get_leaderboards()
+        if limit <= self._top_guilds.k:
+            top_guilds = [guild for _, _, guild in self._top_guilds.top(limit)]
+        else:
+            top_guilds = sorted(
+                self._data.get("guilds", []),
+                key=lambda x: self._guild_totals[x["guild_id"]],
+                reverse=True
+            )[:limit]
+
+        return [
+            {
+                "_id": {
+                    "guild_id": guild["guild_id"],
+                    "guild_name": guild["guild_name"]
+                },
+                "nword_count": self._guild_totals[guild["guild_id"]]
+            }
+            for guild in top_guilds
+        ]
+
+    async def get_all_time_counts(self, limit: int) -> list:
+        await self.load()
+        self._get_leaderboards()
+        if limit <= self._top_members.k:
+            top_members = [member for _, _, member in self._top_members.top(limit)]
+        else:
+            top_members = sorted(
+                self._member_index.values(),
+                key=lambda x: x.nword_count,
+                reverse=True
+            )[:limit]
+
+        return [
+            {
+                "member": member.name,
+                "nword_count": member.nword_count
+            }
+            for member in top_members
+        ]
+
+    async def get_member_list(
+            self, guild_id: int, limit: int | None = None, offset: int = 0,
+            is_black: bool | None = None, has_pass: bool | None = None) -> list:
+        guild = await self._get_guild(guild_id)
+        if guild is None:
+            return []
+
+        self._get_leaderboards()
+        top = self._guild_top_members[guild_id]
+        filtered = is_black is not None or has_pass is not None
+        if not filtered and limit is not None and offset + limit <= top.k:
+            sorted_members = [member for _, _, member in top.top(offset + limit)][offset:]
+        else:
+            members = guild.get("members", [])
+            if filtered:
+                members = self._filter_members(guild_id, is_black, has_pass)
+            # Rank by nword_count descending
+            sorted_members = top_slice(members, lambda x: x.nword_count, limit, offset)
+
+        # Return formatted list
+        return [
+            {
+                "name": member.name,
+                "is_black": member.is_black,
+                "has_pass": member.has_pass,
+                "nword_count": member.nword_count
+            }
+            for member in sorted_members
+        ]
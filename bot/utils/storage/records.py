@@ -0,0 +1,95 @@
+"""Guild and member record helpers shared by the JSON storage backends"""
+from dataclasses import dataclass
+
+# Member flags that get a per-guild index of the members having them set
+FLAGS = ("is_black", "has_pass")
+
+
+def new_guild(guild_id: int, guild_name: str) -> dict:
+    """Return an empty guild record"""
+    return {
+        "guild_id": guild_id,
+        "guild_name": guild_name,
+        "members": [],
+        "settings": []
+    }
+
+
+def new_member(member_id: int, member_name: str) -> dict:
+    """Return a member record with nothing counted yet"""
+    return {
+        "id": member_id,
+        "name": member_name,
+        "nword_count": 0,
+        "is_black": False,
+        "has_pass": False,
+        "passes": 0,
+        "voters": set()
+    }
+
+
+@dataclass(slots=True)
+class MemberRecord:
+    """Member record kept resident by the JSON store
+
+    A slotted object instead of a seven key dict, which takes a fraction of
+    the memory with millions of members. Voters are kept apart since most
+    members never get a vote.
+    """
+    id: int
+    name: str
+    nword_count: int = 0
+    is_black: bool = False
+    has_pass: bool = False
+    passes: int = 0
+
+    @classmethod
+    def from_dict(cls, member: dict) -> "MemberRecord":
+        """Build from a member dict as stored on disk"""
+        return cls(
+            member["id"], member["name"], member.get("nword_count", 0),
+            member.get("is_black", False), member.get("has_pass", False),
+            member.get("passes", 0))
+
+    def to_dict(self, voters) -> dict:
+        """Return the member dict stored on disk or returned to cogs
+
+        voters is used as given: a sorted list on disk, a set for cogs.
+        """
+        return {
+            "id": self.id,
+            "name": self.name,
+            "nword_count": self.nword_count,
+            "is_black": self.is_black,
+            "has_pass": self.has_pass,
+            "passes": self.passes,
+            "voters": voters
+        }
+
+
+def update_voters(voters: set[int], type: str, voter_id: int, vote_threshold: int) -> bool:
+    """Add or remove voter_id, return whether the member is now verified"""
+    if type == "vote":
+        voters.add(voter_id)
+    else:  # unvote
+        voters.discard(voter_id)
+
+    # Check if enough votes
+    return len(voters) >= vote_threshold
+
+
+def apply_vote(member: dict, type: str, voter_id: int, vote_threshold: int) -> None:
+    """Add or remove voter_id and update the member's verification"""
+    member["is_black"] = update_voters(
+        member.setdefault("voters", set()), type, voter_id, vote_threshold)
+
+
+def copy_guild(guild: dict) -> dict:
+    """Return a copy of a guild record that shares no mutable state"""
+    guild_copy = dict(guild)
+    guild_copy["members"] = [
+        dict(member, voters=sorted(member.get("voters", ())))
+        for member in guild.get("members", [])
+    ]
+    guild_copy["settings"] = [dict(setting) for setting in guild.get("settings", [])]
+    return guild_copy
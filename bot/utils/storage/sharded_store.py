@@ -0,0 +1,618 @@
+"""Per-guild sharded JSON storage backend"""
+import os
+import logging
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.leaderboard import TopK, LEADERBOARD_SIZE, top_slice
+from utils.ranking import CountHistogram, RankIndex
+from utils.storage.base import StorageBackend
+from utils.storage.json_store import JSONStorage
+from utils.storage.records import new_guild, new_member, apply_vote, copy_guild, FLAGS
+
+
+class ShardedJSONStorage(StorageBackend):
+    """JSON storage with one file per guild and a small manifest
+
+    Layout of the storage directory:
+        manifest.json       name, n-word total, member count and count
+                            histogram of every guild, plus the global top
+                            members
+        guilds/<id>.json    one guild with its members and settings
+
+    The manifest is read at startup; guild files are loaded on first access
+    and stay resident. A change marks its guild dirty, and each flush writes
+    only dirty guild files plus the manifest. Global queries are answered
+    from the manifest summary without opening any guild file; the global
+    member leaderboard only ever holds the top LEADERBOARD_SIZE members.
+    Global ranks are looked up in the sum of the guilds' count histograms,
+    so they only load the member's own guild. A count going down inside the
+    global member leaderboard marks it stale, and the next read of it loads
+    every guild to rebuild it.
+    """
+    name = "sharded"
+    recovery = "guild files written by the drain are kept"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.manifest_path = os.path.join(path, "manifest.json")
+        self.guilds_dir = os.path.join(path, "guilds")
+        self._lock = asyncio.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="database-io")
+        self._summary: dict[int, dict] | None = None
+        self._global_total = 0
+        self._top_members = TopK(LEADERBOARD_SIZE)
+        self._top_members_stale = False
+        self._top_guilds = TopK(LEADERBOARD_SIZE)
+        self._guild_top_members: dict[int, TopK] = {}
+        self._guild_ranks: dict[int, RankIndex] = {}
+        self._votes_cast: dict[int, dict[int, set[int]]] = {}
+        self._flagged: dict[int, dict[str, set[int]]] = {}
+        self._global_counts: CountHistogram | None = None
+        self._guilds: dict[int, dict] = {}
+        self._members: dict[int, dict[int, dict]] = {}
+        self._loading: dict[int, asyncio.Future] = {}
+        self._dirty: set[int] = set()
+        self._manifest_dirty = False
+
+    async def _run_io(self, func, *args):
+        """Run blocking disk work on the I/O thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _segment_path(self, guild_id: int) -> str:
+        """Return path of a guild's file"""
+        return os.path.join(self.guilds_dir, f"{guild_id}.json")
+
+    @staticmethod
+    def _write_json(path: str, data) -> None:
+        """Write JSON to a temporary file and rename it over path (I/O thread)"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(",", ":"), ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _read_manifest(self) -> dict | None:
+        """Read manifest, None if there is none yet (I/O thread)"""
+        if not os.path.exists(self.manifest_path):
+            return None
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _read_segment(self, guild_id: int) -> dict:
+        """Read one guild file (I/O thread)
+
+        Raises RuntimeError if the file is missing or does not decode, as
+        starting the guild empty would overwrite it on the next flush.
+        """
+        path = self._segment_path(guild_id)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.error(f"Failed to read guild {guild_id} segment: {e}")
+            raise RuntimeError(f"Unreadable guild segment {path}") from e
+
+    def _write_files(self, segments: list[dict], manifest: dict) -> None:
+        """Write dirty guild files, then the manifest (I/O thread)"""
+        os.makedirs(self.guilds_dir, exist_ok=True)
+        for guild in segments:
+            self._write_json(self._segment_path(guild["guild_id"]), guild)
+        self._write_json(self.manifest_path, manifest)
+
+    async def load(self) -> None:
+        """Read the manifest, splitting a legacy bot_database.json on first run"""
+        if self._summary is not None:
+            return
+        async with self._lock:
+            if self._summary is not None:
+                return
+            manifest = await self._run_io(self._read_manifest)
+            if manifest is not None:
+                self._load_manifest(manifest)
+                return
+
+            self._summary = {}
+            legacy_path = self.path + ".json"
+            if os.path.exists(legacy_path):
+                json_store = JSONStorage(legacy_path)
+                await json_store.load()
+                data = json_store._snapshot_copy()
+                await json_store.close()
+                for guild in data.get("guilds", []):
+                    self._add_guild(guild)
+                self._rebuild_top_members()
+                logging.info(f"Split {len(self._guilds)} guilds out of {legacy_path}")
+        if self._manifest_dirty:
+            await self.flush()
+
+    def _load_manifest(self, manifest: dict) -> None:
+        """Load guild summaries and global top members from the manifest"""
+        self._summary = {
+            summary["guild_id"]: summary for summary in manifest.get("guilds", [])
+        }
+        for summary in self._summary.values():
+            if "count_histogram" in summary:
+                summary["count_histogram"] = {
+                    count: keys for count, keys in summary["count_histogram"]}
+        self._global_total = sum(
+            summary["nword_count"] for summary in self._summary.values())
+        self._top_members = TopK.from_items(LEADERBOARD_SIZE, (
+            ((guild_id, member_id), count, name)
+            for guild_id, member_id, name, count in manifest.get("top_members", [])
+        ))
+        self._top_members_stale = manifest.get("top_members_stale", False)
+        self._build_top_guilds()
+
+    def _build_top_guilds(self) -> None:
+        """Rebuild global top guilds from the guild summaries"""
+        self._top_guilds.rebuild(
+            (guild_id, summary["nword_count"], summary)
+            for guild_id, summary in self._summary.items()
+        )
+
+    def _manifest_copy(self) -> dict:
+        """Return the manifest contents for the I/O thread to write"""
+        return {
+            "guilds": [self._summary_copy(summary) for summary in self._summary.values()],
+            "top_members": [
+                [guild_id, member_id, name, count]
+                for (guild_id, member_id), count, name in self._top_members.top()
+            ],
+            "top_members_stale": self._top_members_stale
+        }
+
+    @staticmethod
+    def _summary_copy(summary: dict) -> dict:
+        """Return a guild summary as written to the manifest"""
+        copy = dict(summary)
+        if "count_histogram" in copy:
+            # JSON objects only have string keys, pairs keep counts as ints.
+            copy["count_histogram"] = sorted(copy["count_histogram"].items())
+        return copy
+
+    @staticmethod
+    def _histogram(members: list[dict]) -> dict[int, int]:
+        """Return how many members have each n-word count"""
+        histogram: dict[int, int] = {}
+        for member in members:
+            count = member.get("nword_count", 0)
+            histogram[count] = histogram.get(count, 0) + 1
+        return histogram
+
+    def _recount(self, guild_id: int, old: int | None, new: int | None) -> None:
+        """Move a member between counts in its guild's histogram and the global one"""
+        histogram = self._summary[guild_id]["count_histogram"]
+        for count, delta in ((old, -1), (new, 1)):
+            if count is None:
+                continue
+            histogram[count] = histogram.get(count, 0) + delta
+            if not histogram[count]:
+                del histogram[count]
+            if self._global_counts is not None:
+                self._global_counts.add(count, delta)
+
+    def _add_guild(self, guild: dict) -> None:
+        """Make a guild resident, index its members and mark it dirty"""
+        guild.setdefault("members", [])
+        guild.setdefault("settings", [])
+        guild_id = guild["guild_id"]
+        self._guilds[guild_id] = guild
+        self._members[guild_id] = {member["id"]: member for member in guild["members"]}
+        votes_cast = self._votes_cast[guild_id] = {}
+        self._flagged[guild_id] = {
+            flag: {member["id"] for member in guild["members"] if member.get(flag)}
+            for flag in FLAGS
+        }
+        for member in guild["members"]:
+            member["voters"] = set(member.get("voters", ()))
+            for voter_id in member["voters"]:
+                votes_cast.setdefault(voter_id, set()).add(member["id"])
+        self._guild_top_members[guild_id] = TopK.from_items(LEADERBOARD_SIZE, (
+            (member["id"], member.get("nword_count", 0), member)
+            for member in guild["members"]
+        ))
+        self._guild_ranks[guild_id] = RankIndex.from_items(
+            (member["id"], member.get("nword_count", 0)) for member in guild["members"])
+        if guild_id in self._summary:
+            if "count_histogram" not in self._summary[guild_id]:
+                # Manifests from before histograms get one as guilds load.
+                self._summary[guild_id]["count_histogram"] = self._histogram(guild["members"])
+                self._manifest_dirty = True
+        else:
+            total = sum(member.get("nword_count", 0) for member in guild["members"])
+            histogram = self._histogram(guild["members"])
+            self._summary[guild_id] = {
+                "guild_id": guild_id,
+                "guild_name": guild["guild_name"],
+                "nword_count": total,
+                "member_count": len(guild["members"]),
+                "count_histogram": histogram
+            }
+            if self._global_counts is not None:
+                for count, keys in histogram.items():
+                    self._global_counts.add(count, keys)
+            self._global_total += total
+            self._top_guilds.update(guild_id, total, self._summary[guild_id])
+            self._mark_dirty(guild_id)
+
+    def _rebuild_top_members(self) -> None:
+        """Rebuild global top members from every resident guild"""
+        self._top_members.rebuild(
+            ((guild_id, member["id"]), member.get("nword_count", 0), member["name"])
+            for guild_id, guild in self._guilds.items()
+            for member in guild["members"]
+        )
+        self._top_members_stale = False
+
+    async def _get_top_members(self) -> TopK:
+        """Return global top members, rebuilding them if a count in them went down"""
+        await self.load()
+        if self._top_members_stale:
+            for guild_id in list(self._summary):
+                await self._get_guild(guild_id)
+            if self._top_members_stale:
+                self._rebuild_top_members()
+                self._manifest_dirty = True
+        return self._top_members
+
+    def _mark_dirty(self, guild_id: int) -> None:
+        """Schedule a guild file and the manifest for the next flush"""
+        self._dirty.add(guild_id)
+        self._manifest_dirty = True
+
+    async def _get_guild(self, guild_id: int) -> dict | None:
+        """Return guild record, loading its file on first access"""
+        await self.load()
+        if guild_id not in self._summary:
+            return None
+        guild = self._guilds.get(guild_id)
+        if guild is not None:
+            return guild
+
+        # Share one read between concurrent first accesses.
+        future = self._loading.get(guild_id)
+        if future is None:
+            future = asyncio.ensure_future(self._run_io(self._read_segment, guild_id))
+            self._loading[guild_id] = future
+        try:
+            segment = await future
+        finally:
+            # A failed read is retried by the next access.
+            self._loading.pop(guild_id, None)
+        if guild_id not in self._guilds:
+            self._add_guild(segment)
+        return self._guilds[guild_id]
+
+    async def _get_member(self, guild_id: int, member_id: int) -> dict | None:
+        """Return member record, loading the guild file if needed"""
+        if await self._get_guild(guild_id) is None:
+            return None
+        return self._members[guild_id].get(member_id)
+
+    def _insert_member(self, guild_id: int, member_id: int, member_name: str) -> dict:
+        """Add a member to a resident guild"""
+        member = new_member(member_id, member_name)
+        self._guilds[guild_id]["members"].append(member)
+        self._members[guild_id][member_id] = member
+        self._guild_top_members[guild_id].update(member_id, 0, member)
+        self._guild_ranks[guild_id].set(member_id, 0)
+        self._recount(guild_id, None, 0)
+        self._summary[guild_id]["member_count"] += 1
+        self._mark_dirty(guild_id)
+        return member
+
+    async def maintenance(self) -> None:
+        """Write dirty guilds on every flush interval"""
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write dirty guild files and the manifest"""
+        if not self._manifest_dirty:
+            return
+        dirty = self._dirty
+        segments = [copy_guild(self._guilds[guild_id]) for guild_id in dirty]
+        manifest = self._manifest_copy()
+        self._dirty = set()
+        self._manifest_dirty = False
+        try:
+            await self._run_io(self._write_files, segments, manifest)
+        except Exception:
+            # Keep the guilds dirty so the next flush writes them again.
+            self._dirty |= dirty
+            self._manifest_dirty = True
+            raise
+
+    async def drain(self) -> None:
+        """Write dirty guilds, the store keeps no journal"""
+        await self.flush()
+
+    async def close(self) -> None:
+        """Write dirty guilds and stop the I/O thread"""
+        if self._summary is not None:
+            await self.flush()
+        self._executor.shutdown()
+        self._summary = None
+
+    async def guild_exists(self, guild_id: int) -> bool:
+        await self.load()
+        return guild_id in self._summary
+
+    async def create_guild(self, guild_id: int, guild_name: str) -> bool:
+        await self.load()
+        if guild_id in self._summary:
+            return False
+        self._add_guild(new_guild(guild_id, guild_name))
+        return True
+
+    async def update_guilds(self) -> None:
+        # Guild files get a settings field when they are loaded.
+        return None
+
+    async def get_settings(self, guild_id: int) -> list:
+        guild = await self._get_guild(guild_id)
+        if guild is None:
+            return []
+        return guild["settings"]
+
+    async def set_settings(self, guild_id: int, settings: list) -> None:
+        guild = await self._get_guild(guild_id)
+        if guild is None:
+            return
+        guild["settings"] = settings
+        self._mark_dirty(guild_id)
+
+    async def get_member(self, guild_id: int, member_id: int) -> dict | None:
+        return await self._get_member(guild_id, member_id)
+
+    async def create_member(self, guild_id: int, member_id: int, member_name: str) -> None:
+        if await self._get_guild(guild_id) is None:
+            return
+        if member_id in self._members[guild_id]:
+            return
+        self._insert_member(guild_id, member_id, member_name)
+
+    async def record_message(
+        self, guild_id: int, guild_name: str, member_id: int, member_name: str
+    ) -> tuple[dict, list]:
+        guild = await self._get_guild(guild_id)
+        if guild is None:
+            await self.create_guild(guild_id, guild_name)
+            guild = self._guilds[guild_id]
+        member = self._members[guild_id].get(member_id)
+        if member is None:
+            member = self._insert_member(guild_id, member_id, member_name)
+        return member, guild["settings"]
+
+    async def apply_increments(self, deltas: list[tuple[int, int, int]]) -> None:
+        # Load every guild first, so one that fails to load leaves the whole
+        # batch unapplied for the caller to retry.
+        for guild_id in {guild_id for guild_id, _, _ in deltas}:
+            await self._get_guild(guild_id)
+        for guild_id, member_id, count in deltas:
+            member = await self._get_member(guild_id, member_id)
+            if member is None:
+                continue
+            summary = self._summary[guild_id]
+            old = member["nword_count"]
+            member["nword_count"] += count
+            summary["nword_count"] += count
+            self._global_total += count
+            self._mark_dirty(guild_id)
+            self._guild_ranks[guild_id].set(member_id, member["nword_count"])
+            self._recount(guild_id, old, member["nword_count"])
+            if count < 0:
+                # Leaderboards only follow growing counts.
+                key = (guild_id, member_id)
+                if key in self._top_members:
+                    # The member it lets in may be in a guild that is not
+                    # loaded, so the next read rebuilds from every guild.
+                    self._top_members.discard(key)
+                    self._top_members.update(key, member["nword_count"], member["name"])
+                    self._top_members_stale = True
+                guild = self._guilds[guild_id]
+                self._guild_top_members[guild_id].rebuild(
+                    (m["id"], m.get("nword_count", 0), m) for m in guild["members"])
+                self._build_top_guilds()
+                continue
+            self._top_members.update(
+                (guild_id, member_id), member["nword_count"], member["name"])
+            self._guild_top_members[guild_id].update(member_id, member["nword_count"], member)
+            self._top_guilds.update(guild_id, summary["nword_count"], summary)
+
+    async def increment_passes(self, guild_id: int, member_id: int, count: int) -> None:
+        member = await self._get_member(guild_id, member_id)
+        if member is None:
+            return
+        member["passes"] += count
+        self._mark_dirty(guild_id)
+
+    async def cast_vote(
+        self, type: str, guild_id: int, vote_threshold: int,
+        voter_id: int, votee_id: int
+    ) -> dict | None:
+        member = await self._get_member(guild_id, votee_id)
+        if member is None:
+            return None
+        self._vote(guild_id, member, type, voter_id, vote_threshold)
+        return member
+
+    def _index_flags(self, guild_id: int, member: dict) -> None:
+        """Add or remove a member in its guild's index of each flag"""
+        for flag, flagged in self._flagged[guild_id].items():
+            if member.get(flag):
+                flagged.add(member["id"])
+            else:
+                flagged.discard(member["id"])
+
+    def _vote(
+            self, guild_id: int, member: dict, type: str,
+            voter_id: int, vote_threshold: int) -> None:
+        """Add or remove a vote, keeping the voter's reverse index in step"""
+        apply_vote(member, type, voter_id, vote_threshold)
+        self._index_flags(guild_id, member)
+        votes_cast = self._votes_cast[guild_id]
+        votees = votes_cast.setdefault(voter_id, set())
+        if type == "vote":
+            votees.add(member["id"])
+        else:
+            votees.discard(member["id"])
+        if not votees:
+            del votes_cast[voter_id]
+        self._mark_dirty(guild_id)
+
+    async def purge_votes(self, guild_id: int, voter_id: int, vote_threshold: int) -> int:
+        if await self._get_guild(guild_id) is None:
+            return 0
+        votees = list(self._votes_cast[guild_id].get(voter_id, ()))
+        for member_id in votees:
+            self._vote(
+                guild_id, self._members[guild_id][member_id], "unvote",
+                voter_id, vote_threshold)
+        return len(votees)
+
+    async def get_total_documents(self) -> int:
+        await self.load()
+        return len(self._summary)
+
+    async def get_guild_total(self, guild_id: int) -> int:
+        await self.load()
+        summary = self._summary.get(guild_id)
+        return summary["nword_count"] if summary else 0
+
+    async def get_member_count(self, guild_id: int) -> int:
+        await self.load()
+        summary = self._summary.get(guild_id)
+        return summary["member_count"] if summary else 0
+
+    async def get_global_total(self) -> int:
+        await self.load()
+        return self._global_total
+
+    async def check_aggregates(self) -> bool:
+        # Every guild file has to be read to recount it.
+        await self.load()
+        consistent = True
+        for guild_id in list(self._summary):
+            guild = await self._get_guild(guild_id)
+            summary = self._summary[guild_id]
+            total = sum(member.get("nword_count", 0) for member in guild["members"])
+            histogram = self._histogram(guild["members"])
+            if (summary["nword_count"], summary["member_count"], summary["count_histogram"]) \
+                    != (total, len(guild["members"]), histogram):
+                summary["nword_count"] = total
+                summary["member_count"] = len(guild["members"])
+                summary["count_histogram"] = histogram
+                self._manifest_dirty = True
+                consistent = False
+        global_total = sum(summary["nword_count"] for summary in self._summary.values())
+        if global_total != self._global_total:
+            self._global_total = global_total
+            consistent = False
+        self._rebuild_top_members()
+        self._build_top_guilds()
+        for guild_id, guild in self._guilds.items():
+            self._guild_ranks[guild_id] = RankIndex.from_items(
+                (member["id"], member.get("nword_count", 0)) for member in guild["members"])
+        self._global_counts = None
+        return consistent
+
+    async def get_member_rank(self, guild_id: int, member_id: int) -> int | None:
+        if await self._get_guild(guild_id) is None:
+            return None
+        return self._guild_ranks[guild_id].rank(member_id)
+
+    async def get_global_rank(self, guild_id: int, member_id: int) -> int | None:
+        member = await self._get_member(guild_id, member_id)
+        if member is None:
+            return None
+        if self._global_counts is None:
+            # Guilds listed in a manifest from before histograms load once.
+            for other_guild_id, summary in list(self._summary.items()):
+                if "count_histogram" not in summary:
+                    await self._get_guild(other_guild_id)
+            if self._global_counts is None:
+                merged: dict[int, int] = {}
+                for summary in self._summary.values():
+                    for count, keys in summary["count_histogram"].items():
+                        merged[count] = merged.get(count, 0) + keys
+                self._global_counts = CountHistogram.from_counts(merged)
+        return self._global_counts.rank_of_count(member["nword_count"])
+
+    async def get_members_around_rank(self, guild_id: int, rank: int, radius: int) -> list:
+        if await self._get_guild(guild_id) is None:
+            return []
+        members = self._members[guild_id]
+        # The index ranks negative counts as zero, report the real one.
+        return [
+            {
+                "rank": member_rank,
+                "name": members[member_id]["name"],
+                "nword_count": members[member_id]["nword_count"]
+            }
+            for member_rank, member_id, _ in self._guild_ranks[guild_id].around(rank, radius)
+        ]
+
+    async def get_all_time_servers(self, limit: int) -> list:
+        await self.load()
+        if limit <= self._top_guilds.k:
+            servers = [summary for _, _, summary in self._top_guilds.top(limit)]
+        else:
+            servers = sorted(
+                self._summary.values(), key=lambda x: x["nword_count"], reverse=True)
+        return [
+            {
+                "_id": {
+                    "guild_id": summary["guild_id"],
+                    "guild_name": summary["guild_name"]
+                },
+                "nword_count": summary["nword_count"]
+            }
+            for summary in servers[:limit]
+        ]
+
+    async def get_all_time_counts(self, limit: int) -> list:
+        top_members = await self._get_top_members()
+        return [
+            {"member": name, "nword_count": count}
+            for _, count, name in top_members.top(limit)
+        ]
+
+    async def get_member_list(
+            self, guild_id: int, limit: int | None = None, offset: int = 0,
+            is_black: bool | None = None, has_pass: bool | None = None) -> list:
+        guild = await self._get_guild(guild_id)
+        if guild is None:
+            return []
+
+        top = self._guild_top_members[guild_id]
+        filtered = is_black is not None or has_pass is not None
+        if not filtered and limit is not None and offset + limit <= top.k:
+            sorted_members = [member for _, _, member in top.top(offset + limit)][offset:]
+        else:
+            members = guild["members"]
+            if filtered:
+                wanted = {flag: value for flag, value in zip(FLAGS, (is_black, has_pass))
+                          if value is not None}
+                indexed = [self._flagged[guild_id][flag] for flag, value in wanted.items() if value]
+                if indexed:
+                    # Only the few members having a required flag are looked at.
+                    members = (self._members[guild_id][member_id]
+                               for member_id in min(indexed, key=len))
+                members = [
+                    member for member in members
+                    if all(member.get(flag, False) == value for flag, value in wanted.items())
+                ]
+            # Rank by nword_count descending
+            sorted_members = top_slice(
+                members, lambda x: x.get("nword_count", 0), limit, offset)
+        return [
+            {
+                "name": member["name"],
+                "is_black": member.get("is_black", False),
+                "has_pass": member.get("has_pass", False),
+                "nword_count": member.get("nword_count", 0)
+            }
+            for member in sorted_members
+        ]
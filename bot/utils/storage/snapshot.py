@@ -0,0 +1,223 @@
+"""Snapshot file formats for the JSON storage backend
+
+Two formats hold the same database dict:
+
+    json    compact JSON, parsed with orjson when it is installed and
+            fast_json is enabled, else with the standard library
+    binary  a struct layout storing each guild's members as columns
+            (ids, counts, passes, flags, names, voters) that are decoded
+            with array.frombytes instead of a parser
+
+Converting between them (cd bot first):
+    python -m utils.storage.snapshot bot_database.json bot_database.bin
+    python -m utils.storage.snapshot bot_database.bin bot_database.json
+"""
+import sys
+import json
+import struct
+from array import array
+from itertools import islice
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+FORMATS = ("json", "binary")
+
+# File extension of each format
+EXTENSIONS = {"json": ".json", "binary": ".bin"}
+
+MAGIC = b"NWCDB\0"
+VERSION = 1
+
+# magic, version, journal_seq, guild count
+HEADER = struct.Struct("<6sHqI")
+# guild_id, member count, name bytes, settings bytes, member names bytes
+GUILD_HEADER = struct.Struct("<qIIII")
+
+# Member flag bits
+IS_BLACK = 1
+HAS_PASS = 2
+
+
+def _to_bytes(column: array) -> bytes:
+    """Serialize an array as little-endian bytes"""
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _take(data: memoryview, offset: int, length: int) -> tuple[bytes, int]:
+    """Read length bytes starting at offset, return them and the new offset"""
+    end = offset + length
+    if end > len(data):
+        raise ValueError("Truncated binary snapshot")
+    return bytes(data[offset:end]), end
+
+
+def _from_bytes(typecode: str, data: memoryview, offset: int, count: int) -> tuple[array, int]:
+    """Read count little-endian items starting at offset, return them and the new offset"""
+    column = array(typecode)
+    end = offset + count * column.itemsize
+    if end > len(data):
+        raise ValueError("Truncated binary snapshot")
+    column.frombytes(data[offset:end])
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column, end
+
+
+def encode_guild_binary(guild: dict) -> bytes:
+    """Encode one guild as a fragment of a binary snapshot"""
+    members = guild.get("members", [])
+    name = guild["guild_name"].encode("utf-8")
+    settings = json.dumps(guild.get("settings", []), separators=(",", ":")).encode("utf-8")
+    # Discord names cannot contain NUL, which separates them here.
+    names = "\0".join(
+        member["name"].replace("\0", "\ufffd") for member in members).encode("utf-8")
+    parts = [
+        GUILD_HEADER.pack(guild["guild_id"], len(members), len(name), len(settings), len(names)),
+        name, settings, names
+    ]
+
+    voters = [member.get("voters", ()) for member in members]
+    parts.append(_to_bytes(array("q", (member["id"] for member in members))))
+    parts.append(_to_bytes(array("q", (member.get("nword_count", 0) for member in members))))
+    parts.append(_to_bytes(array("q", (member.get("passes", 0) for member in members))))
+    parts.append(bytes(
+        (IS_BLACK if member.get("is_black") else 0) | (HAS_PASS if member.get("has_pass") else 0)
+        for member in members))
+    parts.append(_to_bytes(array("q", (len(member_voters) for member_voters in voters))))
+    parts.append(_to_bytes(array(
+        "q", (voter_id for member_voters in voters for voter_id in sorted(member_voters)))))
+    return b"".join(parts)
+
+
+def encode_binary(data: dict) -> bytes:
+    """Encode a database dict in the binary snapshot format"""
+    return b"".join(assemble(
+        [encode_guild_binary(guild) for guild in data.get("guilds", [])],
+        "binary", data.get("journal_seq", 0)))
+
+
+def decode_binary(raw: bytes) -> dict:
+    """Decode a binary snapshot into a database dict"""
+    data = memoryview(raw)
+    magic, version, journal_seq, guild_count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a binary database snapshot")
+    if version != VERSION:
+        raise ValueError(f"Unsupported binary snapshot version {version}")
+
+    offset = HEADER.size
+    guilds = []
+    for _ in range(guild_count):
+        guild_id, count, name_len, settings_len, names_len = GUILD_HEADER.unpack_from(data, offset)
+        offset += GUILD_HEADER.size
+        name, offset = _take(data, offset, name_len)
+        settings, offset = _take(data, offset, settings_len)
+        names, offset = _take(data, offset, names_len)
+        names = names.decode("utf-8").split("\0") if count else []
+
+        ids, offset = _from_bytes("q", data, offset, count)
+        counts, offset = _from_bytes("q", data, offset, count)
+        passes, offset = _from_bytes("q", data, offset, count)
+        flags, offset = _take(data, offset, count)
+        voter_counts, offset = _from_bytes("q", data, offset, count)
+        voter_ids, offset = _from_bytes("q", data, offset, sum(voter_counts))
+
+        voter_iter = iter(voter_ids.tolist())
+        members = [
+            {
+                "id": member_id,
+                "name": member_name,
+                "nword_count": nword_count,
+                "is_black": bool(member_flags & IS_BLACK),
+                "has_pass": bool(member_flags & HAS_PASS),
+                "passes": member_passes,
+                "voters": list(islice(voter_iter, voter_count)) if voter_count else []
+            }
+            for member_id, member_name, nword_count, member_flags, member_passes, voter_count
+            in zip(ids.tolist(), names, counts.tolist(), flags, passes.tolist(),
+                   voter_counts.tolist())
+        ]
+        guilds.append({
+            "guild_id": guild_id,
+            "guild_name": name.decode("utf-8"),
+            "members": members,
+            "settings": json.loads(settings)
+        })
+    if offset != len(data):
+        raise ValueError("Trailing bytes after binary snapshot")
+    return {"guilds": guilds, "journal_seq": journal_seq}
+
+
+def encode_json(data: dict, fast_json: bool = False) -> bytes:
+    """Encode a database dict as compact JSON"""
+    if fast_json and orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def encode_guild(guild: dict, format: str, fast_json: bool = False) -> bytes:
+    """Encode one guild as a snapshot fragment, see assemble()"""
+    if format == "binary":
+        return encode_guild_binary(guild)
+    return encode_json(guild, fast_json)
+
+
+def assemble(fragments: list[bytes], format: str, journal_seq: int) -> list[bytes]:
+    """Return the chunks of a snapshot made of encoded guild fragments
+
+    Guilds are encoded on their own so a writer can reuse the fragments
+    of guilds that did not change since its last snapshot.
+    """
+    if format == "binary":
+        return [HEADER.pack(MAGIC, VERSION, journal_seq, len(fragments)), *fragments]
+    return [b'{"guilds":[', b",".join(fragments), b'],"journal_seq":%d}' % journal_seq]
+
+
+def decode_json(raw: bytes, fast_json: bool = False) -> dict:
+    """Decode a JSON snapshot"""
+    if fast_json and orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def encode(data: dict, format: str, fast_json: bool = False) -> bytes:
+    """Encode a database dict in the given snapshot format"""
+    if format == "binary":
+        return encode_binary(data)
+    return encode_json(data, fast_json)
+
+
+def decode(raw: bytes, fast_json: bool = False) -> dict:
+    """Decode a snapshot, detecting its format from the first bytes
+
+    Raises ValueError (or struct.error) for truncated or corrupt snapshots.
+    """
+    if raw.startswith(MAGIC):
+        return decode_binary(raw)
+    data = decode_json(raw, fast_json)
+    if not isinstance(data, dict) or not isinstance(data.get("guilds"), list):
+        raise ValueError("Not a database snapshot")
+    return data
+
+
+def main(source: str, destination: str) -> None:
+    """Convert a snapshot to the format matching the destination's extension"""
+    with open(source, 'rb') as f:
+        data = decode(f.read(), fast_json=True)
+    format = "json" if destination.endswith(EXTENSIONS["json"]) else "binary"
+    with open(destination, 'wb') as f:
+        f.write(encode(data, format, fast_json=True))
+    members = sum(len(guild.get("members", [])) for guild in data.get("guilds", []))
+    print(f"Wrote {len(data.get('guilds', []))} guilds and {members} members to {destination} ({format})")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m utils.storage.snapshot SOURCE DESTINATION")
+    main(sys.argv[1], sys.argv[2])
@@ -0,0 +1,551 @@
+"""SQLite storage backend"""
+import os
+import logging
+import json
+import asyncio
+import sqlite3
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.ranking import CountHistogram, RankIndex
+from utils.storage.base import StorageBackend
+from utils.storage.json_store import JSONStorage
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS guilds (
+    guild_id INTEGER PRIMARY KEY,
+    guild_name TEXT NOT NULL,
+    settings TEXT NOT NULL DEFAULT '[]',
+    nword_count INTEGER NOT NULL DEFAULT 0,
+    member_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS members (
+    guild_id INTEGER NOT NULL,
+    member_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    nword_count INTEGER NOT NULL DEFAULT 0,
+    is_black INTEGER NOT NULL DEFAULT 0,
+    has_pass INTEGER NOT NULL DEFAULT 0,
+    passes INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, member_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS members_by_guild_count ON members (guild_id, nword_count DESC);
+CREATE INDEX IF NOT EXISTS members_by_count ON members (nword_count DESC);
+CREATE INDEX IF NOT EXISTS members_black ON members (guild_id, nword_count DESC)
+    WHERE is_black = 1;
+CREATE INDEX IF NOT EXISTS members_with_pass ON members (guild_id, nword_count DESC)
+    WHERE has_pass = 1;
+CREATE TABLE IF NOT EXISTS voters (
+    guild_id INTEGER NOT NULL,
+    member_id INTEGER NOT NULL,
+    voter_id INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, member_id, voter_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS voters_by_voter ON voters (guild_id, voter_id);
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    nword_count INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO totals (id) VALUES (0);
+"""
+
+# Triggers keeping guilds.nword_count, guilds.member_count and the global
+# total in step with the members table
+AGGREGATE_SCHEMA = """
+CREATE INDEX IF NOT EXISTS guilds_by_count ON guilds (nword_count DESC);
+CREATE TRIGGER IF NOT EXISTS members_insert_totals AFTER INSERT ON members BEGIN
+    UPDATE guilds SET nword_count = nword_count + NEW.nword_count,
+        member_count = member_count + 1 WHERE guild_id = NEW.guild_id;
+END;
+CREATE TRIGGER IF NOT EXISTS members_update_totals AFTER UPDATE OF nword_count ON members BEGIN
+    UPDATE guilds SET nword_count = nword_count + NEW.nword_count - OLD.nword_count
+        WHERE guild_id = NEW.guild_id;
+END;
+CREATE TRIGGER IF NOT EXISTS members_delete_totals AFTER DELETE ON members BEGIN
+    UPDATE guilds SET nword_count = nword_count - OLD.nword_count,
+        member_count = member_count - 1 WHERE guild_id = OLD.guild_id;
+END;
+CREATE TRIGGER IF NOT EXISTS guilds_update_totals AFTER UPDATE OF nword_count ON guilds BEGIN
+    UPDATE totals SET nword_count = nword_count + NEW.nword_count - OLD.nword_count;
+END;
+CREATE TRIGGER IF NOT EXISTS guilds_delete_totals AFTER DELETE ON guilds BEGIN
+    UPDATE totals SET nword_count = nword_count - OLD.nword_count;
+END;
+"""
+
+MEMBER_COLUMNS = "member_id, name, nword_count, is_black, has_pass, passes"
+
+
+class SQLiteStorage(StorageBackend):
+    """SQLite storage in WAL mode
+
+    All queries run on a single dedicated thread that owns the connection,
+    so the event loop never blocks on disk. Leaderboards push ORDER BY and
+    LIMIT down to SQLite, backed by indexes on n-word counts, and partial
+    indexes cover just the members with is_black or has_pass set. Guild and
+    global totals are kept by triggers instead of summing members. Ranks
+    are looked up in a RankIndex per guild and a global CountHistogram,
+    read through the same count indexes on first use and kept in step by
+    every write; only the database thread touches them.
+    """
+    name = "sqlite"
+    recovery = "committed writes are recovered from the WAL on the next start"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="database-io")
+        self._conn: sqlite3.Connection | None = None
+        self._lock = asyncio.Lock()
+        self._guild_ranks: dict[int, RankIndex] = {}
+        self._global_counts: CountHistogram | None = None
+
+    async def _run(self, func, *args):
+        """Run a blocking query function on the database thread"""
+        if self._conn is None:
+            await self.load()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _connect(self) -> bool:
+        """Open connection and create schema, return True if file is new (DB thread)"""
+        is_new = not os.path.exists(self.path)
+        self._conn = sqlite3.connect(self.path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+        # Databases created before the maintained totals get the columns
+        # added and filled in once.
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(guilds)")}
+        if "nword_count" not in columns:
+            self._conn.execute(
+                "ALTER TABLE guilds ADD COLUMN nword_count INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute(
+                "ALTER TABLE guilds ADD COLUMN member_count INTEGER NOT NULL DEFAULT 0")
+            self._check_aggregates()
+        self._conn.executescript(AGGREGATE_SCHEMA)
+        return is_new
+
+    async def load(self) -> None:
+        """Open the database, importing an existing JSON database on first run"""
+        if self._conn is not None:
+            return
+        async with self._lock:
+            if self._conn is not None:
+                return
+            loop = asyncio.get_running_loop()
+            is_new = await loop.run_in_executor(self._executor, self._connect)
+            json_path = os.path.splitext(self.path)[0] + ".json"
+            if is_new and os.path.exists(json_path):
+                json_store = JSONStorage(json_path)
+                await json_store.load()
+                data = json_store._snapshot_copy()
+                await json_store.close()
+                await loop.run_in_executor(self._executor, self._import, data)
+                logging.info(f"Imported {len(data['guilds'])} guilds from {json_path}")
+
+    def _import(self, data: dict) -> None:
+        """Insert every guild, member and vote of a JSON database (DB thread)"""
+        with self._transaction():
+            for guild in data.get("guilds", []):
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO guilds (guild_id, guild_name, settings) VALUES (?, ?, ?)",
+                    (guild["guild_id"], guild["guild_name"], json.dumps(guild.get("settings", []))))
+                for member in guild.get("members", []):
+                    self._conn.execute(
+                        f"INSERT OR IGNORE INTO members (guild_id, {MEMBER_COLUMNS}) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (guild["guild_id"], member["id"], member["name"],
+                         member.get("nword_count", 0), member.get("is_black", False),
+                         member.get("has_pass", False), member.get("passes", 0)))
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO voters VALUES (?, ?, ?)",
+                        [(guild["guild_id"], member["id"], voter_id)
+                         for voter_id in member.get("voters", [])])
+
+    @contextmanager
+    def _transaction(self):
+        """Wrap statements in a write transaction, rolling back on error"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _execute(self, query: str, params: tuple = ()) -> None:
+        """Run a single statement (DB thread)"""
+        self._conn.execute(query, params)
+
+    async def maintenance(self) -> None:
+        """Let SQLite checkpoint the WAL without blocking writers"""
+        await self._run(self._execute, "PRAGMA wal_checkpoint(PASSIVE)")
+
+    async def flush(self) -> None:
+        """Checkpoint the WAL into the main database file"""
+        await self._run(self._execute, "PRAGMA wal_checkpoint(TRUNCATE)")
+
+    async def drain(self) -> None:
+        # Every write is committed before it returns.
+        return None
+
+    async def close(self) -> None:
+        """Checkpoint, close connection and stop the database thread"""
+        if self._conn is not None:
+            await self.flush()
+            await self._run(self._conn.close)
+            self._conn = None
+        self._executor.shutdown()
+
+    def _fetch_member(self, guild_id: int, member_id: int) -> dict | None:
+        """Return member dict with voters list (DB thread)"""
+        row = self._conn.execute(
+            f"SELECT {MEMBER_COLUMNS} FROM members WHERE guild_id = ? AND member_id = ?",
+            (guild_id, member_id)).fetchone()
+        if row is None:
+            return None
+        voters = {
+            voter_id for (voter_id,) in self._conn.execute(
+                "SELECT voter_id FROM voters WHERE guild_id = ? AND member_id = ?",
+                (guild_id, member_id))
+        }
+        return {
+            "id": row[0],
+            "name": row[1],
+            "nword_count": row[2],
+            "is_black": bool(row[3]),
+            "has_pass": bool(row[4]),
+            "passes": row[5],
+            "voters": voters
+        }
+
+    def _fetch_settings(self, guild_id: int) -> list:
+        """Return guild settings list (DB thread)"""
+        row = self._conn.execute(
+            "SELECT settings FROM guilds WHERE guild_id = ?", (guild_id,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def _insert_guild(self, guild_id: int, guild_name: str) -> bool:
+        """Insert guild if missing, return True if inserted (DB thread)"""
+        cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO guilds (guild_id, guild_name) VALUES (?, ?)",
+            (guild_id, guild_name))
+        return cursor.rowcount > 0
+
+    def _insert_member(self, guild_id: int, member_id: int, member_name: str) -> bool:
+        """Insert member if the guild exists and member is missing, return True if inserted
+
+        The caller indexes the new member's rank once the insert is
+        committed (DB thread).
+        """
+        cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO members (guild_id, member_id, name) "
+            "SELECT guild_id, ?, ? FROM guilds WHERE guild_id = ?",
+            (member_id, member_name, guild_id))
+        return cursor.rowcount > 0
+
+    def _create_member(self, guild_id: int, member_id: int, member_name: str) -> None:
+        """Insert member and index its rank (DB thread)"""
+        if self._insert_member(guild_id, member_id, member_name):
+            self._move_rank(guild_id, member_id, None, 0)
+
+    def _move_rank(self, guild_id: int, member_id: int, old: int | None, new: int) -> None:
+        """Update the rank indexes built so far with a committed count (DB thread)"""
+        ranks = self._guild_ranks.get(guild_id)
+        if ranks is not None:
+            ranks.set(member_id, new)
+        if self._global_counts is not None:
+            if old is not None:
+                self._global_counts.add(old, -1)
+            self._global_counts.add(new)
+
+    def _guild_rank_index(self, guild_id: int) -> RankIndex:
+        """Return the guild's rank index, reading it on first use (DB thread)"""
+        ranks = self._guild_ranks.get(guild_id)
+        if ranks is None:
+            ranks = self._guild_ranks[guild_id] = RankIndex.from_items(self._conn.execute(
+                "SELECT member_id, nword_count FROM members WHERE guild_id = ?", (guild_id,)))
+        return ranks
+
+    def _global_count_index(self) -> CountHistogram:
+        """Return the histogram of every member's count, reading it on first use (DB thread)"""
+        if self._global_counts is None:
+            self._global_counts = CountHistogram.from_counts(dict(self._conn.execute(
+                "SELECT nword_count, COUNT(*) FROM members GROUP BY nword_count")))
+        return self._global_counts
+
+    def _record_message(
+        self, guild_id: int, guild_name: str, member_id: int, member_name: str
+    ) -> tuple[dict, list]:
+        """Upsert guild and member, return member and settings (DB thread)"""
+        member = self._fetch_member(guild_id, member_id)
+        if member is None:
+            with self._transaction():
+                self._insert_guild(guild_id, guild_name)
+                inserted = self._insert_member(guild_id, member_id, member_name)
+            if inserted:
+                self._move_rank(guild_id, member_id, None, 0)
+            member = self._fetch_member(guild_id, member_id)
+        return member, self._fetch_settings(guild_id)
+
+    def _apply_increments(self, deltas: list[tuple[int, int, int]]) -> None:
+        """Apply a batch of n-word deltas in one transaction (DB thread)"""
+        moves = []
+        with self._transaction():
+            if self._guild_ranks or self._global_counts is not None:
+                moves = self._count_moves(deltas)
+            self._conn.executemany(
+                "UPDATE members SET nword_count = nword_count + ? "
+                "WHERE guild_id = ? AND member_id = ?",
+                [(count, guild_id, member_id) for guild_id, member_id, count in deltas])
+        for guild_id, member_id, old, new in moves:
+            self._move_rank(guild_id, member_id, old, new)
+
+    def _count_moves(self, deltas: list[tuple[int, int, int]]) -> list[tuple[int, int, int, int]]:
+        """Return (guild_id, member_id, old, new) counts of members deltas change (DB thread)"""
+        totals: dict[tuple[int, int], int] = {}
+        for guild_id, member_id, count in deltas:
+            totals[(guild_id, member_id)] = totals.get((guild_id, member_id), 0) + count
+        moves = []
+        for (guild_id, member_id), count in totals.items():
+            row = self._conn.execute(
+                "SELECT nword_count FROM members WHERE guild_id = ? AND member_id = ?",
+                (guild_id, member_id)).fetchone()
+            if row is not None:
+                moves.append((guild_id, member_id, row[0], row[0] + count))
+        return moves
+
+    def _cast_vote(
+        self, type: str, guild_id: int, vote_threshold: int,
+        voter_id: int, votee_id: int
+    ) -> dict | None:
+        """Add or remove a vote and update verification (DB thread)"""
+        with self._transaction():
+            if self._fetch_member(guild_id, votee_id) is None:
+                return None
+            if type == "vote":
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO voters VALUES (?, ?, ?)",
+                    (guild_id, votee_id, voter_id))
+            else:  # unvote
+                self._conn.execute(
+                    "DELETE FROM voters WHERE guild_id = ? AND member_id = ? AND voter_id = ?",
+                    (guild_id, votee_id, voter_id))
+
+            self._update_verification(guild_id, votee_id, vote_threshold)
+        return self._fetch_member(guild_id, votee_id)
+
+    def _update_verification(self, guild_id: int, member_id: int, vote_threshold: int) -> None:
+        """Set is_black from the member's vote count (DB thread)"""
+        # Check if enough votes
+        self._conn.execute(
+            "UPDATE members SET is_black = ("
+            "SELECT COUNT(*) FROM voters WHERE guild_id = ? AND member_id = ?) >= ? "
+            "WHERE guild_id = ? AND member_id = ?",
+            (guild_id, member_id, vote_threshold, guild_id, member_id))
+
+    def _purge_votes(self, guild_id: int, voter_id: int, vote_threshold: int) -> int:
+        """Delete every vote voter_id cast in a guild (DB thread)"""
+        with self._transaction():
+            votees = [
+                member_id for (member_id,) in self._conn.execute(
+                    "SELECT member_id FROM voters WHERE guild_id = ? AND voter_id = ?",
+                    (guild_id, voter_id))
+            ]
+            self._conn.execute(
+                "DELETE FROM voters WHERE guild_id = ? AND voter_id = ?", (guild_id, voter_id))
+            for member_id in votees:
+                self._update_verification(guild_id, member_id, vote_threshold)
+        return len(votees)
+
+    def _scalar(self, query: str, params: tuple = ()) -> int:
+        """Return first column of first row (DB thread)"""
+        return self._conn.execute(query, params).fetchone()[0]
+
+    def _check_aggregates(self) -> bool:
+        """Recompute maintained totals, return True if they matched (DB thread)"""
+        with self._transaction():
+            stale = self._scalar(
+                "SELECT COUNT(*) FROM guilds g LEFT JOIN ("
+                "SELECT guild_id, SUM(nword_count) AS total, COUNT(*) AS members "
+                "FROM members GROUP BY guild_id) m ON m.guild_id = g.guild_id "
+                "WHERE g.nword_count != COALESCE(m.total, 0) "
+                "OR g.member_count != COALESCE(m.members, 0)")
+            stale += self._scalar(
+                "SELECT COUNT(*) FROM totals WHERE nword_count != "
+                "(SELECT COALESCE(SUM(nword_count), 0) FROM guilds)")
+            if stale:
+                self._conn.execute(
+                    "UPDATE guilds SET "
+                    "nword_count = (SELECT COALESCE(SUM(nword_count), 0) FROM members m "
+                    "WHERE m.guild_id = guilds.guild_id), "
+                    "member_count = (SELECT COUNT(*) FROM members m "
+                    "WHERE m.guild_id = guilds.guild_id)")
+                self._conn.execute(
+                    "UPDATE totals SET nword_count = "
+                    "(SELECT COALESCE(SUM(nword_count), 0) FROM guilds)")
+        # Rank indexes are read again from the members table on next use.
+        self._guild_ranks = {}
+        self._global_counts = None
+        return stale == 0
+
+    def _member_rank(self, guild_id: int, member_id: int, global_rank: bool) -> int | None:
+        """Return 1 plus the number of members with a higher count (DB thread)"""
+        row = self._conn.execute(
+            "SELECT nword_count FROM members WHERE guild_id = ? AND member_id = ?",
+            (guild_id, member_id)).fetchone()
+        if row is None:
+            return None
+        if global_rank:
+            return self._global_count_index().rank_of_count(row[0])
+        return self._guild_rank_index(guild_id).rank(member_id)
+
+    def _members_around_rank(self, guild_id: int, rank: int, radius: int) -> list:
+        """Return guild members at positions around rank (DB thread)"""
+        around = self._guild_rank_index(guild_id).around(rank, radius)
+        if not around:
+            return []
+        # The index ranks negative counts as zero, report the real one.
+        rows = {
+            member_id: (name, count) for member_id, name, count in self._conn.execute(
+                "SELECT member_id, name, nword_count FROM members "
+                f"WHERE guild_id = ? AND member_id IN ({', '.join('?' * len(around))})",
+                (guild_id, *(member_id for _, member_id, _ in around)))
+        }
+        return [
+            {"rank": member_rank, "name": rows[member_id][0], "nword_count": rows[member_id][1]}
+            for member_rank, member_id, _ in around
+        ]
+
+    def _all_time_servers(self, limit: int) -> list:
+        """Return top guilds by maintained n-word total (DB thread)"""
+        rows = self._conn.execute(
+            "SELECT guild_id, guild_name, nword_count FROM guilds "
+            "ORDER BY nword_count DESC LIMIT ?", (limit,))
+        return [
+            {"_id": {"guild_id": guild_id, "guild_name": guild_name}, "nword_count": total}
+            for guild_id, guild_name, total in rows
+        ]
+
+    def _all_time_counts(self, limit: int) -> list:
+        """Return top members out of all guilds (DB thread)"""
+        rows = self._conn.execute(
+            "SELECT name, nword_count FROM members ORDER BY nword_count DESC LIMIT ?",
+            (limit,))
+        return [{"member": name, "nword_count": count} for name, count in rows]
+
+    def _member_list(
+            self, guild_id: int, limit: int | None, offset: int,
+            is_black: bool | None, has_pass: bool | None) -> list:
+        """Return guild members ranked by n-word count (DB thread)"""
+        conditions = ["guild_id = ?"]
+        for column, value in (("is_black", is_black), ("has_pass", has_pass)):
+            if value is not None:
+                # A literal lets SQLite match the partial flag indexes.
+                conditions.append(f"{column} = {int(value)}")
+        rows = self._conn.execute(
+            "SELECT name, is_black, has_pass, nword_count FROM members "
+            f"WHERE {' AND '.join(conditions)} ORDER BY nword_count DESC LIMIT ? OFFSET ?",
+            (guild_id, -1 if limit is None else limit, offset))
+        return [
+            {
+                "name": name,
+                "is_black": bool(is_black),
+                "has_pass": bool(has_pass),
+                "nword_count": count
+            }
+            for name, is_black, has_pass, count in rows
+        ]
+
+    async def guild_exists(self, guild_id: int) -> bool:
+        return await self._run(
+            self._scalar, "SELECT COUNT(*) FROM guilds WHERE guild_id = ?", (guild_id,)) > 0
+
+    async def create_guild(self, guild_id: int, guild_name: str) -> bool:
+        return await self._run(self._insert_guild, guild_id, guild_name)
+
+    async def update_guilds(self) -> None:
+        # Every row has a settings column already.
+        return None
+
+    async def get_settings(self, guild_id: int) -> list:
+        return await self._run(self._fetch_settings, guild_id)
+
+    async def set_settings(self, guild_id: int, settings: list) -> None:
+        await self._run(
+            self._execute, "UPDATE guilds SET settings = ? WHERE guild_id = ?",
+            (json.dumps(settings), guild_id))
+
+    async def get_member(self, guild_id: int, member_id: int) -> dict | None:
+        return await self._run(self._fetch_member, guild_id, member_id)
+
+    async def create_member(self, guild_id: int, member_id: int, member_name: str) -> None:
+        await self._run(self._create_member, guild_id, member_id, member_name)
+
+    async def record_message(
+        self, guild_id: int, guild_name: str, member_id: int, member_name: str
+    ) -> tuple[dict, list]:
+        return await self._run(
+            self._record_message, guild_id, guild_name, member_id, member_name)
+
+    async def apply_increments(self, deltas: list[tuple[int, int, int]]) -> None:
+        await self._run(self._apply_increments, deltas)
+
+    async def increment_passes(self, guild_id: int, member_id: int, count: int) -> None:
+        await self._run(
+            self._execute,
+            "UPDATE members SET passes = passes + ? WHERE guild_id = ? AND member_id = ?",
+            (count, guild_id, member_id))
+
+    async def cast_vote(
+        self, type: str, guild_id: int, vote_threshold: int,
+        voter_id: int, votee_id: int
+    ) -> dict | None:
+        return await self._run(
+            self._cast_vote, type, guild_id, vote_threshold, voter_id, votee_id)
+
+    async def purge_votes(self, guild_id: int, voter_id: int, vote_threshold: int) -> int:
+        return await self._run(self._purge_votes, guild_id, voter_id, vote_threshold)
+
+    async def get_total_documents(self) -> int:
+        return await self._run(self._scalar, "SELECT COUNT(*) FROM guilds")
+
+    async def get_guild_total(self, guild_id: int) -> int:
+        return await self._run(
+            self._scalar,
+            "SELECT COALESCE(MAX(nword_count), 0) FROM guilds WHERE guild_id = ?",
+            (guild_id,))
+
+    async def get_member_count(self, guild_id: int) -> int:
+        return await self._run(
+            self._scalar,
+            "SELECT COALESCE(MAX(member_count), 0) FROM guilds WHERE guild_id = ?",
+            (guild_id,))
+
+    async def get_global_total(self) -> int:
+        return await self._run(self._scalar, "SELECT nword_count FROM totals")
+
+    async def check_aggregates(self) -> bool:
+        return await self._run(self._check_aggregates)
+
+    async def get_member_rank(self, guild_id: int, member_id: int) -> int | None:
+        return await self._run(self._member_rank, guild_id, member_id, False)
+
+    async def get_global_rank(self, guild_id: int, member_id: int) -> int | None:
+        return await self._run(self._member_rank, guild_id, member_id, True)
+
+    async def get_members_around_rank(self, guild_id: int, rank: int, radius: int) -> list:
+        return await self._run(self._members_around_rank, guild_id, rank, radius)
+
+    async def get_all_time_servers(self, limit: int) -> list:
+        return await self._run(self._all_time_servers, limit)
+
+    async def get_all_time_counts(self, limit: int) -> list:
+        return await self._run(self._all_time_counts, limit)
+
+    async def get_member_list(
+            self, guild_id: int, limit: int | None = None, offset: int = 0,
+            is_black: bool | None = None, has_pass: bool | None = None) -> list:
+        return await self._run(self._member_list, guild_id, limit, offset, is_black, has_pass)
+
@@ -0,0 +1,61 @@
+"""Words that excuse an n-word match, reloaded when whitelist.txt changes"""
+import os
+import time
+import logging
+
+# Seconds between checks of the whitelist file's modification time
+DEFAULT_CHECK_INTERVAL = 2
+
+
+class Whitelist:
+    """Whitelisted words read once and kept in memory
+
+    The file's modification time is checked at most once per
+    check_interval seconds when the words are read, and the file is read
+    again only when it changed. A reload swaps the whole tuple in one
+    assignment, so a reader sees either the old words or the new ones.
+    """
+
+    def __init__(self, path: str, check_interval: float = DEFAULT_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        # Bumped on every reload so derived caches know to start over.
+        self.version = 0
+        self._words: tuple[str, ...] = ()
+        self._mtime: int | None = None
+        self._checked_at = time.monotonic()
+        self.reload()
+
+    @property
+    def words(self) -> tuple[str, ...]:
+        """Return the whitelisted words, picking up changes to the file"""
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            self.refresh()
+        return self._words
+
+    def refresh(self) -> bool:
+        """Reload the file if it changed since the last read, return True if it did"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self._mtime:
+                return False
+            self.reload()
+        except OSError as e:
+            # Keep serving the words we have, e.g. while an editor replaces the file.
+            logging.warning(f"Could not reload whitelist {self.path}: {e}")
+            return False
+        return True
+
+    def reload(self) -> int:
+        """Read the file again and swap in its words, return how many there are"""
+        # Taken before reading so a write during the read is picked up next time.
+        mtime = os.stat(self.path).st_mtime_ns
+        with open(self.path, "r") as f:
+            words = tuple(f.read().splitlines())
+        self._words = words
+        self._mtime = mtime
+        self.version += 1
+        logging.info(f"Loaded {len(words)} whitelisted words from {self.path}")
+        return len(words)